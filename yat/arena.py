@@ -0,0 +1,332 @@
+from array import array
+
+from yat.model import *
+from yat.traversal import postorder, DESCEND
+
+
+(NUMBER, LARGE_NUMBER, REFERENCE, READ, PRINT, UNARY, BINARY, EXPRLIST,
+ FUNCTION, DEFINITION, CONDITIONAL, CALL) = range(12)
+
+OPS = ['+', '-', '*', '/', '%', '==', '!=', '<', '>', '<=', '>=', '&&', '||', '!']
+
+OP_CODES = {op: code for code, op in enumerate(OPS)}
+
+SMALL = 2 ** 31
+
+
+class View:
+    """
+        mixin of the nodes of an Arena: each reads its fields from the
+        arena's columns when asked, so it holds nothing but its index
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return _plain, (self.arena.tree(self.index),)
+
+
+def _plain(node):
+    """
+        an unpickled view comes back as the plain tree it stood for
+    """
+    return node
+
+
+def _child(self, index):
+    arena = self.arena
+    node = arena.views.get(index)
+    if node is None:
+        node = arena.view(index)
+    return node
+
+
+def _first(self):
+    return _child(self, self.arena.first[self.index])
+
+
+def _second(self):
+    return _child(self, self.arena.second[self.index])
+
+
+def _third(self):
+    return _child(self, self.arena.third[self.index])
+
+
+def _name(self):
+    arena = self.arena
+    return arena.names[arena.first[self.index]]
+
+
+def _children(first, count):
+    def children(self):
+        arena = self.arena
+        index = self.index
+        length = getattr(arena, count)[index]
+        if length < 0:
+            return None
+        start = getattr(arena, first)[index]
+        return [_child(self, child) for child in arena.lists[start:start + length]]
+    return property(children)
+
+
+def _op(self):
+    return OPS[self.arena.ops[self.index]]
+
+
+def _value(self):
+    arena = self.arena
+    if arena.kinds[self.index] == NUMBER:
+        return arena.first[self.index]
+    return arena.large[arena.first[self.index]]
+
+
+def _args(self):
+    arena = self.arena
+    first = arena.first[self.index]
+    names = arena.names
+    return [names[name] for name in arena.lists[first:first + arena.second[self.index]]]
+
+
+def _view_class(cls, fields):
+    fields['__slots__'] = ('arena', 'index')
+    return type(cls.__name__ + 'View', (View, cls), fields)
+
+
+first, second, third = property(_first), property(_second), property(_third)
+
+NumberView = _view_class(Number, {'value': property(_value)})
+ReferenceView = _view_class(Reference, {'name': property(_name)})
+ReadView = _view_class(Read, {'name': property(_name)})
+PrintView = _view_class(Print, {'expr': first})
+UnaryView = _view_class(UnaryOperation, {'op': property(_op), 'expr': first})
+BinaryView = _view_class(BinaryOperation, {'lhs': first, 'op': property(_op), 'rhs': second})
+ExprListView = _view_class(ExprList, {'exprs': _children('first', 'second')})
+FunctionView = _view_class(Function, {'args': property(_args), 'body': third})
+DefinitionView = _view_class(FunctionDefinition, {'name': property(_name), 'function': second})
+ConditionalView = _view_class(Conditional, {'condition': first, 'if_true': second,
+                                            'if_false': third})
+CallView = _view_class(FunctionCall, {'fun_expr': first, 'args': _children('second', 'third')})
+
+VIEWS = [NumberView, NumberView, ReferenceView, ReadView, PrintView, UnaryView,
+         BinaryView, ExprListView, FunctionView, DefinitionView, ConditionalView,
+         CallView]
+
+
+class Arena:
+    """
+        a forest of yat nodes stored in parallel columns instead of one
+        object per node. Node i has kind kinds[i], operator ops[i] and
+        up to three fields first[i], second[i] and third[i]: indices of
+        children, a small int value, a name from names, or a range of
+        lists, which holds the children of lists and calls and the
+        argument names of functions. Ints beyond 32 bits go to large.
+
+        Nodes are added with the same builders as NodeFactory, taking
+        and returning indices, or copied from a tree with add(). view(i)
+        gives an object of a subclass of the node's model class, so
+        visitors, evaluate() and isinstance checks work unchanged. Views
+        are kept until release(), so a child is the same object each
+        time it is asked for and ConstantFolder can tell what it left
+        unchanged.
+    """
+    def __init__(self):
+        self.kinds = array('B')
+        self.ops = array('B')
+        self.first = array('i')
+        self.second = array('i')
+        self.third = array('i')
+        self.lists = array('i')
+        self.large = []
+        self.names = []
+        self.name_ids = dict()
+        self.views = dict()
+        self.functions = dict()
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def nbytes(self):
+        """
+            bytes taken by the columns, the names and the large ints
+        """
+        columns = [self.kinds, self.ops, self.first, self.second, self.third, self.lists]
+        total = sum(column.itemsize * len(column) for column in columns)
+        total += sum(len(name) for name in self.names)
+        return total + sum(value.bit_length() // 8 + 1 for value in self.large)
+
+    def node(self, kind, first=0, second=0, third=0, op=0):
+        self.kinds.append(kind)
+        self.ops.append(op)
+        self.first.append(first)
+        self.second.append(second)
+        self.third.append(third)
+        return len(self.kinds) - 1
+
+    def name(self, name):
+        index = self.name_ids.get(name)
+        if index is None:
+            index = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def range(self, items):
+        start = len(self.lists)
+        self.lists.extend(items)
+        return start
+
+    def number(self, value):
+        if -SMALL <= value < SMALL:
+            return self.node(NUMBER, value)
+        self.large.append(value)
+        return self.node(LARGE_NUMBER, len(self.large) - 1)
+
+    def reference(self, name):
+        return self.node(REFERENCE, self.name(name))
+
+    def read(self, name):
+        return self.node(READ, self.name(name))
+
+    def print(self, expr):
+        return self.node(PRINT, expr)
+
+    def unary(self, op, expr):
+        return self.node(UNARY, expr, op=OP_CODES[op])
+
+    def binary(self, lhs, op, rhs):
+        return self.node(BINARY, lhs, rhs, op=OP_CODES[op])
+
+    def exprlist(self, exprs):
+        if exprs is None:
+            return self.node(EXPRLIST, 0, -1)
+        return self.node(EXPRLIST, self.range(exprs), len(exprs))
+
+    def function(self, args, body):
+        names = [self.name(arg) for arg in args]
+        return self.node(FUNCTION, self.range(names), len(names), self.exprlist(body))
+
+    def definition(self, name, function):
+        return self.node(DEFINITION, self.name(name), function)
+
+    def conditional(self, condition, if_true, if_false=None):
+        return self.node(CONDITIONAL, condition, self.exprlist(if_true), self.exprlist(if_false))
+
+    def call(self, fun_expr, args):
+        return self.node(CALL, fun_expr, self.range(args), len(args))
+
+    def view(self, index):
+        node = self.views.get(index)
+        if node is None:
+            node = object.__new__(VIEWS[self.kinds[index]])
+            node.arena = self
+            node.index = index
+            self.views[index] = node
+        return node
+
+    def release(self):
+        """
+            drops the cached views, which are made again when asked for
+        """
+        self.views = dict()
+
+    def add(self, tree):
+        """
+            copies a tree of any depth into the arena, returns the index
+            of its root; a Function shared in the tree is stored once
+        """
+        self.functions = dict()
+        try:
+            return postorder(self, tree)
+        finally:
+            self.functions = dict()
+
+    def load(self, tree):
+        """
+            the view of tree copied into the arena
+        """
+        return self.view(self.add(tree))
+
+    def tree(self, index):
+        """
+            node index and all below it as plain model objects
+        """
+        return postorder(Copy(), self.view(index))
+
+    def visit_number(self, num):
+        return self.number(num.value)
+
+    def visit_reference(self, ref):
+        return self.reference(ref.name)
+
+    def visit_read(self, rd):
+        return self.read(rd.name)
+
+    def visit_print(self, prnt, expr):
+        return self.print(expr)
+
+    def visit_unary(self, un_op, expr):
+        return self.unary(un_op.op, expr)
+
+    def visit_binary(self, bin_op, lhs, rhs):
+        return self.binary(lhs, bin_op.op, rhs)
+
+    def visit_exprlist(self, expr_list, exprs):
+        return self.exprlist(exprs if expr_list.list_exists() else None)
+
+    def enter_function(self, function):
+        cached = self.functions.get(id(function))
+        if cached is not None and cached[0] is function:
+            return cached[1]
+        return DESCEND
+
+    def visit_function(self, function, body):
+        index = self.node(FUNCTION, self.range(self.name(arg) for arg in function.args),
+                          len(function.args), body)
+        self.functions[id(function)] = (function, index)
+        return index
+
+    def visit_definition(self, f_def, function):
+        return self.definition(f_def.name, function)
+
+    def visit_conditional(self, cond, condition, if_true, if_false):
+        return self.node(CONDITIONAL, condition, if_true, if_false)
+
+    def visit_call(self, call, fun_expr, args):
+        return self.call(fun_expr, args)
+
+
+class Copy:
+    """
+        rebuilds a tree from plain model objects
+    """
+    def visit_number(self, num):
+        return Number(num.value)
+
+    def visit_reference(self, ref):
+        return Reference(ref.name)
+
+    def visit_read(self, rd):
+        return Read(rd.name)
+
+    def visit_print(self, prnt, expr):
+        return Print(expr)
+
+    def visit_unary(self, un_op, expr):
+        return UnaryOperation(un_op.op, expr)
+
+    def visit_binary(self, bin_op, lhs, rhs):
+        return BinaryOperation(lhs, bin_op.op, rhs)
+
+    def visit_exprlist(self, expr_list, exprs):
+        return ExprList(exprs if expr_list.list_exists() else None)
+
+    def visit_function(self, function, body):
+        return Function(list(function.args), body.exprs)
+
+    def visit_definition(self, f_def, function):
+        return FunctionDefinition(f_def.name, function)
+
+    def visit_conditional(self, cond, condition, if_true, if_false):
+        return Conditional(condition, if_true.exprs, if_false.exprs)
+
+    def visit_call(self, call, fun_expr, args):
+        return FunctionCall(fun_expr, args)
@@ -0,0 +1,249 @@
+from yat.model import *
+from yat.compiler import BINARY_OPS, UNARY_OPS, compile_tree
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+COMPARISONS = {'==', '!=', '<', '>', '<=', '>='}
+
+
+class ListColumns:
+    """
+        columns as Python lists: exact yat semantics for any int size
+    """
+    def column(self, values):
+        return list(values)
+
+    def const(self, value, n):
+        return [value] * n
+
+    def binary(self, op, lhs, rhs):
+        values = map(BINARY_OPS[op], lhs, rhs)
+        if op in COMPARISONS:
+            return list(map(int, values))
+        return list(values)
+
+    def unary(self, op, expr):
+        return list(map(int, map(UNARY_OPS[op], expr)))
+
+    def split(self, condition):
+        rows = [], []
+        for i, value in enumerate(condition):
+            rows[not value].append(i)
+        return rows
+
+    def count(self, rows):
+        return len(rows)
+
+    def take(self, column, rows):
+        return [column[i] for i in rows]
+
+    def merge(self, n, true_rows, if_true, false_rows, if_false):
+        out = [0] * n
+        for i, value in zip(true_rows, if_true):
+            out[i] = value
+        for i, value in zip(false_rows, if_false):
+            out[i] = value
+        return out
+
+
+class NumpyColumns:
+    """
+        columns as int64 arrays, operations as ufuncs over whole arrays;
+        values must fit in 64 bits
+    """
+    binary_ops = {'+': 'add', '-': 'subtract', '*': 'multiply',
+                  '/': 'floor_divide', '%': 'remainder',
+                  '==': 'equal', '!=': 'not_equal', '<': 'less',
+                  '>': 'greater', '<=': 'less_equal', '>=': 'greater_equal'}
+
+    def column(self, values):
+        return np.asarray(values, dtype=np.int64)
+
+    def const(self, value, n):
+        return np.full(n, value, dtype=np.int64)
+
+    def binary(self, op, lhs, rhs):
+        if op == '&&':
+            return np.where(lhs != 0, rhs, lhs)
+        if op == '||':
+            return np.where(lhs != 0, lhs, rhs)
+        if op in ('/', '%') and not rhs.all():
+            raise ZeroDivisionError("integer division or modulo by zero")
+        values = getattr(np, self.binary_ops[op])(lhs, rhs)
+        if op in COMPARISONS:
+            return values.astype(np.int64)
+        return values
+
+    def unary(self, op, expr):
+        if op == '!':
+            return (expr == 0).astype(np.int64)
+        return np.negative(expr)
+
+    def split(self, condition):
+        mask = condition != 0
+        return mask, ~mask
+
+    def count(self, rows):
+        return np.count_nonzero(rows)
+
+    def take(self, column, rows):
+        return column[rows]
+
+    def merge(self, n, true_rows, if_true, false_rows, if_false):
+        out = np.empty(n, dtype=np.int64)
+        out[true_rows] = if_true
+        out[false_rows] = if_false
+        return out
+
+
+class BatchCompiler:
+    """
+        compiles an expression into a function of a dict of columns,
+        one value per row, returning the column of its values. Arithmetic,
+        comparisons, logic and conditionals with one expression per branch
+        work on whole columns; each branch only sees the rows selecting it.
+        Other subtrees, calls in particular, are evaluated row by row in
+        a Scope made of scope and the row's values.
+    """
+    def __init__(self, scope=None, columns=None):
+        self.scope = scope if scope is not None else Scope()
+        if columns is None:
+            columns = NumpyColumns() if np is not None else ListColumns()
+        self.columns = columns
+
+    def visit(self, obj):
+        return obj.access(self)
+
+    def rows(self, node):
+        """
+            fallback: the subtree compiled once, run once per row
+        """
+        run = compile_tree(node)
+        scope = self.scope
+        columns = self.columns
+
+        def batch(cols, n):
+            values = []
+            for i in range(n):
+                row = Scope(scope)
+                for name, column in cols.items():
+                    row[name] = box(int(column[i]))
+                result = run(row)
+                if not isinstance(result, Number):
+                    raise ValueError("expression has no value in row {}".format(i))
+                values.append(result.value)
+            return columns.column(values)
+        return batch
+
+    def visit_number(self, num):
+        value = num.value
+        const = self.columns.const
+        return lambda cols, n: const(value, n)
+
+    def visit_reference(self, ref):
+        name = ref.name
+        scope = self.scope
+        const = self.columns.const
+
+        def batch(cols, n):
+            if name in cols:
+                return cols[name]
+            return const(scope[name].value, n)
+        return batch
+
+    def visit_binary(self, bin_op):
+        op = bin_op.op
+        lhs = bin_op.lhs.access(self)
+        rhs = bin_op.rhs.access(self)
+        binary = self.columns.binary
+        cheap = isinstance(bin_op.rhs, (Number, Reference))
+        if op not in ('&&', '||') or cheap or not short_circuit():
+            # both operands over all rows and one select for the logic
+            return lambda cols, n: binary(op, lhs(cols, n), rhs(cols, n))
+        columns = self.columns
+
+        def batch(cols, n):
+            left = lhs(cols, n)
+            true_rows, false_rows = columns.split(left)
+            if op == '||':
+                true_rows, false_rows = false_rows, true_rows
+            # the right operand only runs on the rows the left leaves open
+            count = columns.count(true_rows)
+            if count == 0:
+                return left
+            if count == n:
+                return rhs(cols, n)
+            open_cols = {name: columns.take(col, true_rows) for name, col in cols.items()}
+            return columns.merge(n, true_rows, rhs(open_cols, count),
+                                 false_rows, columns.take(left, false_rows))
+        return batch
+
+    def visit_unary(self, un_op):
+        op = un_op.op
+        expr = un_op.expr.access(self)
+        unary = self.columns.unary
+        return lambda cols, n: unary(op, expr(cols, n))
+
+    def visit_conditional(self, cond):
+        branches = [cond.if_true.exprs, cond.if_false.exprs]
+        if any(not exprs or len(exprs) != 1 for exprs in branches):
+            return self.rows(cond)
+        condition = cond.condition.access(self)
+        if_true = branches[0][0].access(self)
+        if_false = branches[1][0].access(self)
+        columns = self.columns
+
+        def batch(cols, n):
+            true_rows, false_rows = columns.split(condition(cols, n))
+            count = columns.count(true_rows)
+            if count == n:
+                return if_true(cols, n)
+            if count == 0:
+                return if_false(cols, n)
+            true_cols = {name: columns.take(col, true_rows) for name, col in cols.items()}
+            false_cols = {name: columns.take(col, false_rows) for name, col in cols.items()}
+            return columns.merge(n, true_rows, if_true(true_cols, count),
+                                 false_rows, if_false(false_cols, n - count))
+        return batch
+
+    def visit_exprlist(self, expr_list):
+        if expr_list.exprs and len(expr_list.exprs) == 1:
+            return expr_list.exprs[0].access(self)
+        return self.rows(expr_list)
+
+    def visit_call(self, call):
+        return self.rows(call)
+
+    visit_function = rows
+    visit_definition = rows
+    visit_print = rows
+    visit_read = rows
+
+
+def compile_batch(expr, scope=None, columns=None):
+    """
+        returns a function taking a dict of equally long columns
+        and returning the column of expr's values
+    """
+    batch = BatchCompiler(scope, columns)
+    run = expr.access(batch)
+
+    def evaluate(cols):
+        cols = {name: batch.columns.column(values) for name, values in cols.items()}
+        lengths = set(len(values) for values in cols.values())
+        if len(lengths) > 1:
+            raise ValueError("columns differ in length: {}".format(sorted(lengths)))
+        return run(cols, lengths.pop() if lengths else 0)
+    return evaluate
+
+
+def evaluate_batch(expr, columns, scope=None):
+    """
+        the values of expr for every row of columns, a dict of name to
+        sequence; a NumPy int64 array when NumPy is installed, else a list
+    """
+    return compile_batch(expr, scope)(columns)
@@ -0,0 +1,898 @@
+#!/usr/bin/env python3
+
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from yat.model import *
+from yat.compiler import compile_tree
+from yat.stackeval import StackEvaluator
+from yat.vm import VM, CodeGenerator
+from yat.folder import ConstantFolder
+from yat.serialize import ProgramCache, dumps
+from yat.effects import MemoCache
+from yat.hashcons import NodeFactory
+from yat.cse import CommonSubexpressions
+from yat.streams import BufferedIO
+from yat.parallel import ParallelEvaluator
+from yat.batch import evaluate_batch, np
+from yat.incremental import IncrementalEvaluator, ReactiveScope
+from yat.printer import PrettyPrinter
+from yat.syntax import parse, tokenize
+from yat.arena import Arena
+from yat.lexical import compile_lexical
+from yat.typecheck import check
+from yat.session import Interpreter
+
+
+def fib_program(n):
+    """
+        def fib(n) { if (n < 2) { n; } else { fib(n - 1) + fib(n - 2); }; };
+        fib(n);
+    """
+    fib = Function(['n'],
+                   [Conditional(BinaryOperation(Reference('n'), '<', Number(2)),
+                                [Reference('n')],
+                                [BinaryOperation(
+                                    FunctionCall(Reference('fib'),
+                                                 [BinaryOperation(Reference('n'), '-', Number(1))]),
+                                    '+',
+                                    FunctionCall(Reference('fib'),
+                                                 [BinaryOperation(Reference('n'), '-', Number(2))]))])])
+    return ExprList([FunctionDefinition('fib', fib),
+                     FunctionCall(Reference('fib'), [Number(n)])])
+
+
+def loop_program(n):
+    """
+        def loop(i, acc) { if (i == 0) { acc; } else { loop(i - 1, acc + i); }; };
+        loop(n, 0);
+    """
+    loop = Function(['i', 'acc'],
+                    [Conditional(BinaryOperation(Reference('i'), '==', Number(0)),
+                                 [Reference('acc')],
+                                 [FunctionCall(Reference('loop'),
+                                               [BinaryOperation(Reference('i'), '-', Number(1)),
+                                                BinaryOperation(Reference('acc'), '+', Reference('i'))])])])
+    return ExprList([FunctionDefinition('loop', loop),
+                     FunctionCall(Reference('loop'), [Number(n), Number(0)])])
+
+
+def sum_program(n):
+    """
+        def sum(n) { if (n == 0) { 0; } else { n + sum(n - 1); }; };
+        sum(n);
+    """
+    total = Function(['n'],
+                     [Conditional(BinaryOperation(Reference('n'), '==', Number(0)),
+                                  [Number(0)],
+                                  [BinaryOperation(
+                                      Reference('n'), '+',
+                                      FunctionCall(Reference('sum'),
+                                                   [BinaryOperation(Reference('n'), '-', Number(1))]))])])
+    return ExprList([FunctionDefinition('sum', total),
+                     FunctionCall(Reference('sum'), [Number(n)])])
+
+
+def wide_program(n):
+    """
+        n definitions with foldable constants, followed by calls:
+        def f_i(x) { if (x < 2 * i + 1) { x * (3 + 4); } else { f_i(x - (10 - 9)); }; };
+    """
+    exprs = []
+    for i in range(n):
+        name = 'f_{}'.format(i)
+        body = Conditional(BinaryOperation(Reference('x'), '<',
+                                           BinaryOperation(BinaryOperation(Number(2), '*', Number(i)),
+                                                           '+', Number(1))),
+                           [BinaryOperation(Reference('x'), '*',
+                                            BinaryOperation(Number(3), '+', Number(4)))],
+                           [FunctionCall(Reference(name),
+                                         [BinaryOperation(Reference('x'), '-',
+                                                          BinaryOperation(Number(10), '-', Number(9)))])])
+        exprs.append(FunctionDefinition(name, Function(['x'], [body])))
+    for i in range(n):
+        exprs.append(Print(FunctionCall(Reference('f_{}'.format(i)), [Number(i)])))
+    return ExprList(exprs)
+
+
+def helper_program(n):
+    """
+        def sq(x) { x * x; }; def scale(x) { (x + 0) * 1; };
+        def loop(i, acc) {
+            if (debug) { print acc; };
+            if (i == 0) { acc; } else { loop(i - 1, acc + sq(scale(i)) % (100 - 3)); };
+        };
+        loop(n, 0);
+    """
+    sq = Function(['x'], [BinaryOperation(Reference('x'), '*', Reference('x'))])
+    scale = Function(['x'], [BinaryOperation(BinaryOperation(Reference('x'), '+', Number(0)),
+                                             '*', Number(1))])
+    step = BinaryOperation(FunctionCall(Reference('sq'),
+                                        [FunctionCall(Reference('scale'), [Reference('i')])]),
+                           '%', BinaryOperation(Number(100), '-', Number(3)))
+    loop = Function(['i', 'acc'],
+                    [Conditional(Reference('debug'), [Print(Reference('acc'))], []),
+                     Conditional(BinaryOperation(Reference('i'), '==', Number(0)),
+                                 [Reference('acc')],
+                                 [FunctionCall(Reference('loop'),
+                                               [BinaryOperation(Reference('i'), '-', Number(1)),
+                                                BinaryOperation(Reference('acc'), '+', step)])])])
+    return ExprList([FunctionDefinition('sq', sq),
+                     FunctionDefinition('scale', scale),
+                     FunctionDefinition('loop', loop),
+                     FunctionCall(Reference('loop'), [Number(n), Number(0)])])
+
+
+def generated_program(seed, statements=6, calls=5):
+    """
+        def f(a, b, c) { ... }; followed by calls of f, where the body
+        combines a small pool of random subexpressions the way
+        generated code tends to repeat itself
+    """
+    rnd = random.Random(seed)
+    leaves = [Reference('a'), Reference('b'), Reference('c'), Number(2), Number(3)]
+
+    def expr(depth):
+        if depth == 0:
+            return rnd.choice(leaves)
+        return BinaryOperation(expr(depth - 1), rnd.choice('+-*'), expr(depth - 1))
+    pool = [expr(rnd.randint(1, 3)) for _ in range(4)]
+    body = []
+    for _ in range(statements):
+        node = BinaryOperation(rnd.choice(pool), rnd.choice('+-*'), rnd.choice(pool))
+        body.append(Print(node) if rnd.random() < 0.3 else node)
+    exprs = [FunctionDefinition('f', Function(['a', 'b', 'c'], body))]
+    for _ in range(calls):
+        exprs.append(FunctionCall(Reference('f'), [Number(rnd.randint(-9, 9)) for _ in range(3)]))
+    return ExprList(exprs)
+
+
+def count_evaluations(run):
+    """
+        runs once, returns how many times evaluate() was called on a node
+    """
+    calls = [0]
+    originals = dict()
+
+    def counting(evaluate):
+        def run_counted(self, scope=None):
+            calls[0] += 1
+            return evaluate(self, scope)
+        return run_counted
+    for cls in [Number, ExprList, Function, FunctionDefinition, Conditional, Print,
+                Read, FunctionCall, Reference, BinaryOperation, UnaryOperation]:
+        originals[cls] = cls.evaluate
+        cls.evaluate = counting(cls.evaluate)
+    try:
+        run()
+    finally:
+        for cls, evaluate in originals.items():
+            cls.evaluate = evaluate
+    return calls[0]
+
+
+def echo_program(n):
+    """
+        def echo(i) { if (i > 0) { read x; print x; echo(i - 1); }; };
+        echo(n);
+    """
+    echo = Function(['i'],
+                    [Conditional(BinaryOperation(Reference('i'), '>', Number(0)),
+                                 [Read('x'), Print(Reference('x')),
+                                  FunctionCall(Reference('echo'),
+                                               [BinaryOperation(Reference('i'), '-', Number(1))])])])
+    return ExprList([FunctionDefinition('echo', echo),
+                     FunctionCall(Reference('echo'), [Number(n)])])
+
+
+def split_program(n):
+    """
+        def add(x, y) { x + y; };
+        def fib(n) { if (n < 2) { n; } else { add(fib(n - 1), fib(n - 2)); }; };
+        fib(n);
+    """
+    add = Function(['x', 'y'], [BinaryOperation(Reference('x'), '+', Reference('y'))])
+    fib = Function(['n'],
+                   [Conditional(BinaryOperation(Reference('n'), '<', Number(2)),
+                                [Reference('n')],
+                                [FunctionCall(Reference('add'),
+                                              [FunctionCall(Reference('fib'),
+                                                            [BinaryOperation(Reference('n'), '-', Number(1))]),
+                                               FunctionCall(Reference('fib'),
+                                                            [BinaryOperation(Reference('n'), '-', Number(2))])])])])
+    return ExprList([FunctionDefinition('add', add),
+                     FunctionDefinition('fib', fib),
+                     FunctionCall(Reference('fib'), [Number(n)])])
+
+
+def report_program(n):
+    """
+        def sq(x) { x * x; };
+        sq(k_0 + 1) * 3 - k_0; ... sq(k_{n-1} + 1) * 3 - k_{n-1};
+        every statement reads one binding of the scope it runs in
+    """
+    sq = Function(['x'], [BinaryOperation(Reference('x'), '*', Reference('x'))])
+    exprs = [FunctionDefinition('sq', sq)]
+    for i in range(n):
+        name = 'k_{}'.format(i)
+        exprs.append(BinaryOperation(
+            BinaryOperation(FunctionCall(Reference('sq'),
+                                         [BinaryOperation(Reference(name), '+', Number(1))]),
+                            '*', Number(3)),
+            '-', Reference(name)))
+    return ExprList(exprs)
+
+
+def nested_program(depth, statements):
+    """
+        if (c) { x + 0; ...; if (c) { x + 1; ... } else { x; }; } else { x; };
+        depth conditionals inside each other, statements sums in each
+    """
+    body = []
+    for level in reversed(range(depth)):
+        exprs = [BinaryOperation(Reference('x'), '+', Number(level * statements + i))
+                 for i in range(statements)]
+        body = [Conditional(Reference('c'), exprs + body, [Reference('x')])]
+    return ExprList(body)
+
+
+def chain_program(n):
+    """
+        x + 0 * 0 + 1 * 1 + 2 * 0 + ...: n sums nested to the left
+    """
+    expr = Reference('x')
+    for i in range(n):
+        expr = BinaryOperation(expr, '+', BinaryOperation(Number(i % 3), '*', Number(i % 2)))
+    return ExprList([expr])
+
+
+def compose_program(n):
+    """
+        def compose(f, g) { def h(x) { f(g(x)); }; h; };
+        def twice(f) { compose(f, f); };
+        def inc(x) { x + 1; };
+        def repeat(f, i, acc) { if (i == 0) { acc; } else { repeat(f, i - 1, f(acc)); }; };
+        repeat(twice(twice(inc)), n, 0);
+    """
+    compose = Function(['f', 'g'],
+                       [FunctionDefinition('h', Function(['x'], [
+                           FunctionCall(Reference('f'),
+                                        [FunctionCall(Reference('g'), [Reference('x')])])])),
+                        Reference('h')])
+    twice = Function(['f'], [FunctionCall(Reference('compose'), [Reference('f'), Reference('f')])])
+    inc = Function(['x'], [BinaryOperation(Reference('x'), '+', Number(1))])
+    repeat = Function(['f', 'i', 'acc'],
+                      [Conditional(BinaryOperation(Reference('i'), '==', Number(0)),
+                                   [Reference('acc')],
+                                   [FunctionCall(Reference('repeat'),
+                                                 [Reference('f'),
+                                                  BinaryOperation(Reference('i'), '-', Number(1)),
+                                                  FunctionCall(Reference('f'), [Reference('acc')])])])])
+    quadruple = FunctionCall(Reference('twice'),
+                             [FunctionCall(Reference('twice'), [Reference('inc')])])
+    return ExprList([FunctionDefinition('compose', compose),
+                     FunctionDefinition('twice', twice),
+                     FunctionDefinition('inc', inc),
+                     FunctionDefinition('repeat', repeat),
+                     FunctionCall(Reference('repeat'), [quadruple, Number(n), Number(0)])])
+
+
+def global_program(n):
+    """
+        def sum(n) { if (n == 0) { 0; } else { step + sum(n - 1); }; };
+        sum(n);
+        step is global, read at every depth of the recursion
+    """
+    total = Function(['n'],
+                     [Conditional(BinaryOperation(Reference('n'), '==', Number(0)),
+                                  [Number(0)],
+                                  [BinaryOperation(
+                                      Reference('step'), '+',
+                                      FunctionCall(Reference('sum'),
+                                                   [BinaryOperation(Reference('n'), '-', Number(1))]))])])
+    return ExprList([FunctionDefinition('sum', total),
+                     FunctionCall(Reference('sum'), [Number(n)])])
+
+
+def guard_program(n, cost=20):
+    """
+        def slow(k) { if (k == 0) { 1; } else { slow(k - 1); }; };
+        def count(i, acc) {
+            if (i == 0) { acc; }
+            else { count(i - 1, acc + (i % 8 == 0 && slow(cost)) + (i % 2 || slow(cost))); };
+        };
+        count(n, 0);
+    """
+    slow = Function(['k'],
+                    [Conditional(BinaryOperation(Reference('k'), '==', Number(0)),
+                                 [Number(1)],
+                                 [FunctionCall(Reference('slow'),
+                                               [BinaryOperation(Reference('k'), '-', Number(1))])])])
+    guard = BinaryOperation(
+        BinaryOperation(BinaryOperation(Reference('i'), '%', Number(8)), '==', Number(0)),
+        '&&', FunctionCall(Reference('slow'), [Number(cost)]))
+    other = BinaryOperation(BinaryOperation(Reference('i'), '%', Number(2)),
+                            '||', FunctionCall(Reference('slow'), [Number(cost)]))
+    count = Function(['i', 'acc'],
+                     [Conditional(BinaryOperation(Reference('i'), '==', Number(0)),
+                                  [Reference('acc')],
+                                  [FunctionCall(Reference('count'),
+                                                [BinaryOperation(Reference('i'), '-', Number(1)),
+                                                 BinaryOperation(BinaryOperation(Reference('acc'), '+',
+                                                                                 guard),
+                                                                 '+', other)])])])
+    return ExprList([FunctionDefinition('slow', slow),
+                     FunctionDefinition('count', count),
+                     FunctionCall(Reference('count'), [Number(n), Number(0)])])
+
+
+def measure(run, repeat=5, number=1):
+    return min(timeit.repeat(run, repeat=repeat, number=number))
+
+
+def bench_compile():
+    """
+        tree-walking evaluate() against closures from compile_tree()
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    for name, program in [('fib(18)', fib_program(18)),
+                          ('loop(1000)', loop_program(1000))]:
+        compiled = compile_tree(program)
+        assert compiled(Scope()).value == program.evaluate(Scope()).value
+        walk = measure(lambda: program.evaluate(Scope()))
+        closures = measure(lambda: compiled(Scope()))
+        print("{:<12} evaluate {:8.4f}s  compiled {:8.4f}s  x{:.2f}".format(
+            name, walk, closures, walk / closures))
+
+
+def count_numbers(run):
+    """
+        runs once under tracemalloc, returns (Numbers created, peak bytes)
+    """
+    created = [0]
+    init = Number.__init__
+
+    def counting_init(self, value):
+        created[0] += 1
+        init(self, value)
+    Number.__init__ = counting_init
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        Number.__init__ = init
+    return created[0], peak
+
+
+def bench_numbers():
+    """
+        allocations of the boxing tree-walker against unboxed closures
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    for name, program in [('fib(18)', fib_program(18)),
+                          ('loop(1000)', loop_program(1000))]:
+        compiled = compile_tree(program)
+        for cache in [(0, -1), (-5, 256)]:
+            set_small_int_range(*cache)
+            for mode, run in [('evaluate', lambda: program.evaluate(Scope())),
+                              ('compiled', lambda: compiled(Scope()))]:
+                numbers, peak = count_numbers(run)
+                print("{:<12} {:<9} cache {:<10} {:8.4f}s  {:>8} Numbers  {:>9} bytes peak".format(
+                    name, mode, str(cache), measure(run), numbers, peak))
+
+
+def bench_deep():
+    """
+        10^6 deep recursion under the default recursion limit: a tail
+        recursive loop on the trampoline and a non-tail sum on the stack
+        evaluator
+    """
+    n = 10 ** 6
+    compiled = compile_tree(loop_program(n))
+    print("loop({}) compiled   {:8.4f}s".format(
+        n, measure(lambda: compiled(Scope()), repeat=1)))
+    program = sum_program(n)
+    print("sum({})  stackeval  {:8.4f}s".format(
+        n, measure(lambda: StackEvaluator().evaluate(program, Scope()), repeat=1)))
+
+
+def bench_vm():
+    """
+        tree-walking, closures and the bytecode VM side by side
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    for name, program in [('fib(18)', fib_program(18)),
+                          ('loop(1000)', loop_program(1000)),
+                          ('sum(1000)', sum_program(1000))]:
+        compiled = compile_tree(program)
+        code = CodeGenerator().code(program)
+        vm = VM()
+        assert vm.execute(code, Scope()).value == program.evaluate(Scope()).value
+        walk = measure(lambda: program.evaluate(Scope()))
+        closures = measure(lambda: compiled(Scope()))
+        bytecode = measure(lambda: vm.execute(code, Scope()))
+        print("{:<12} evaluate {:8.4f}s  compiled {:8.4f}s  vm {:8.4f}s  x{:.2f}".format(
+            name, walk, closures, bytecode, walk / bytecode))
+
+
+def bench_cache():
+    """
+        start-up cost of building and folding a program against
+        loading the folded program from the on-disk cache
+    """
+    n = 5000
+    source = ("wide_program", n)
+    key = repr(source).encode()
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ProgramCache(directory)
+        cache.get(key, lambda: ConstantFolder().visit(wide_program(n)))
+        cold = measure(lambda: ConstantFolder().visit(wide_program(n)), repeat=3)
+        cached = measure(lambda: cache.get(key, None), repeat=3)
+        size = len(dumps(cache.get(key, None)))
+    print("wide({}) build+fold {:8.4f}s  cache load {:8.4f}s  x{:.2f}  {} bytes".format(
+        n, cold, cached, cold / cached, size))
+
+
+def bench_memo():
+    """
+        recursive fib with and without the memo cache of pure calls
+    """
+    for n in [20, 25, 30]:
+        program = compile_tree(fib_program(n))
+        plain = measure(lambda: program(Scope()), repeat=1) if n < 30 else None
+        memo = MemoCache(maxsize=1024)
+        memoized = compile_tree(fib_program(n), memo)
+        fast = measure(lambda: memoized(Scope()), repeat=1)
+        print("fib({})  compiled {}  memoized {:8.4f}s  hits {} misses {}".format(
+            n, "{:8.4f}s".format(plain) if plain is not None else "  (skip) ",
+            fast, memo.hits, memo.misses))
+
+
+def bench_fold():
+    """
+        size and running time of a program before and after folding
+        with the value of its debug flag known
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    n = 1000
+    program = helper_program(n)
+    scope = Scope()
+    scope['debug'] = Number(0)
+    folded = ConstantFolder(scope).visit(program)
+    for name, tree in [('original', program), ('folded', folded)]:
+        compiled = compile_tree(tree)
+        assert compiled(Scope(scope)).value == program.evaluate(Scope(scope)).value
+        walk = measure(lambda: tree.evaluate(Scope(scope)))
+        closures = measure(lambda: compiled(Scope(scope)))
+        print("{:<9} {:5} bytes  evaluate {:8.4f}s  compiled {:8.4f}s".format(
+            name, len(dumps(tree)), walk, closures))
+
+
+def bench_intern():
+    """
+        memory of a generated program with many equal subtrees,
+        built plainly and through the hash-consing factory
+    """
+    n = 2000
+    for name, build in [('plain', lambda: wide_program(n)),
+                        ('interned', lambda: NodeFactory().visit(wide_program(n)))]:
+        tracemalloc.start()
+        try:
+            program = build()
+            size = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        elapsed = measure(build, repeat=3)
+        print("{:<9} {:10} bytes kept  build {:8.4f}s".format(name, size, elapsed))
+        del program
+    factory = NodeFactory()
+    lhs, rhs = factory.visit(wide_program(n)), factory.visit(wide_program(n))
+    print("equal by identity: {}  nodes in table: {}".format(lhs is rhs, len(factory.table)))
+
+
+def bench_cse():
+    """
+        node evaluations of a corpus of generated programs before and
+        after common-subexpression elimination
+    """
+    before = after = 0
+    for seed in range(50):
+        program = generated_program(seed)
+        optimized = CommonSubexpressions().visit(program)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            before += count_evaluations(lambda: program.evaluate(Scope()))
+            expected = out.getvalue()
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            after += count_evaluations(lambda: optimized.evaluate(Scope()))
+            assert out.getvalue() == expected
+    print("50 programs: {} evaluations before, {} after, {:.1f}% saved".format(
+        before, after, 100 * (before - after) / before))
+
+
+def bench_io():
+    """
+        a compiled program echoing numbers from a file to a file
+        with print()/input() and with BufferedIO
+    """
+    n = 200000
+    program = compile_tree(echo_program(n))
+    with tempfile.TemporaryDirectory() as directory:
+        source = directory + '/in.txt'
+        with open(source, 'w') as f:
+            f.write(''.join('{}\n'.format(i * 7919 % 100003) for i in range(n)))
+        results = []
+        for name in ['console', 'buffered']:
+            target = '{}/{}.txt'.format(directory, name)
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                stdin, stdout = sys.stdin, sys.stdout
+                sys.stdin = io.TextIOWrapper(src)
+                sys.stdout = io.TextIOWrapper(dst)
+                start = timeit.default_timer()
+                try:
+                    if name == 'buffered':
+                        with BufferedIO():
+                            program(Scope())
+                    else:
+                        program(Scope())
+                    sys.stdout.flush()
+                finally:
+                    sys.stdin, sys.stdout = stdin, stdout
+                results.append(timeit.default_timer() - start)
+            with open(target, 'rb') as f:
+                results.append(f.read())
+    assert results[1] == results[3]
+    print("echo({}) print/input {:8.4f}s  buffered {:8.4f}s  x{:.2f}".format(
+        n, results[0], results[2], results[0] / results[2]))
+
+
+def bench_parallel():
+    """
+        divide and conquer fib with its calls' arguments split
+        over 4 to 16 worker processes, against compiled closures
+    """
+    n = 25
+    program = split_program(n)
+    compiled = compile_tree(program)
+    expected = compiled(Scope()).value
+    serial = measure(lambda: compiled(Scope()), repeat=1)
+    print("fib({}) on {} cpus: compiled {:8.4f}s".format(n, os.cpu_count(), serial))
+    for workers in [4, 8, 16]:
+        evaluator = ParallelEvaluator(workers)
+        result = []
+        elapsed = measure(lambda: result.append(evaluator.evaluate(program, Scope())), repeat=1)
+        assert result[0].value == expected
+        print("  {:>2} workers {:8.4f}s  x{:.2f}  {} tasks".format(
+            workers, elapsed, serial / elapsed, evaluator.dispatched))
+
+
+def bench_batch():
+    """
+        a scoring formula over many rows: compiled closures with a Scope
+        per row against evaluate_batch over whole columns
+    """
+    n = 200000
+    rnd = random.Random(1)
+    columns = {'x': [rnd.randint(-1000, 1000) for _ in range(n)],
+               'y': [rnd.randint(1, 1000) for _ in range(n)]}
+    # if (x > 0) { x * 3 / y; } else { -x % 7 + y; } + (x < y && y - x)
+    formula = BinaryOperation(
+        Conditional(BinaryOperation(Reference('x'), '>', Number(0)),
+                    [BinaryOperation(BinaryOperation(Reference('x'), '*', Number(3)), '/', Reference('y'))],
+                    [BinaryOperation(BinaryOperation(UnaryOperation('-', Reference('x')), '%', Number(7)),
+                                     '+', Reference('y'))]),
+        '+',
+        BinaryOperation(BinaryOperation(Reference('x'), '<', Reference('y')), '&&',
+                        BinaryOperation(Reference('y'), '-', Reference('x'))))
+    compiled = compile_tree(formula)
+
+    def per_row():
+        values = []
+        for x, y in zip(columns['x'], columns['y']):
+            scope = Scope()
+            scope['x'] = box(x)
+            scope['y'] = box(y)
+            values.append(compiled(scope).value)
+        return values
+    expected = per_row()
+    assert list(evaluate_batch(formula, columns)) == expected
+    rows = measure(per_row, repeat=3)
+    batch = measure(lambda: evaluate_batch(formula, columns), repeat=3)
+    print("{} rows, {}: per row {:8.4f}s  batch {:8.4f}s  x{:.2f}".format(
+        n, "numpy" if np is not None else "lists", rows, batch, rows / batch))
+
+
+def bench_closures():
+    """
+        a higher-order program on the lexical compiler, which it needs,
+        and a global read under deep recursion, where evaluate() walks
+        the dynamic scope chain and the lexical frames do not
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    n = 10000
+    program = compile_lexical(compose_program(n))
+    assert program(Scope()).value == 4 * n
+    print("{:<12} lexical  {:8.4f}s".format('compose', measure(lambda: program(Scope()))))
+    for depth in [100, 1000]:
+        program = global_program(depth)
+        scope = Scope()
+        scope['step'] = Number(1)
+        compiled = compile_tree(program)
+        lexical = compile_lexical(program)
+        assert lexical(Scope(scope)).value == program.evaluate(Scope(scope)).value == depth
+        print("{:<12} evaluate {:8.4f}s  compiled {:8.4f}s  lexical {:8.4f}s".format(
+            'global({})'.format(depth), measure(lambda: program.evaluate(Scope(scope))),
+            measure(lambda: compiled(Scope(scope))), measure(lambda: lexical(Scope(scope)))))
+
+
+def bench_logic():
+    """
+        guard-heavy recursion with && and || evaluating both operands
+        against short-circuit, on the tree-walker and the backends
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    n = 500
+    program = guard_program(n)
+
+    def prepare(name):
+        # compiled backends take the setting in force when compiling
+        if name == 'compiled':
+            compiled = compile_tree(program)
+            return lambda: compiled(Scope())
+        if name == 'vm':
+            code = CodeGenerator().code(program)
+            return lambda: VM().execute(code, Scope())
+        if name == 'stackeval':
+            return lambda: StackEvaluator().evaluate(program, Scope())
+        return lambda: program.evaluate(Scope())
+    for name in ['evaluate', 'compiled', 'vm', 'stackeval']:
+        times = []
+        for enabled in [False, True]:
+            previous = set_short_circuit(enabled)
+            try:
+                run = prepare(name)
+                assert run().value == n + n // 8
+                times.append(measure(run, repeat=3))
+            finally:
+                set_short_circuit(previous)
+        print("{:<10} eager {:8.4f}s  short-circuit {:8.4f}s  x{:.2f}".format(
+            name, times[0], times[1], times[0] / times[1]))
+
+
+def bench_verify():
+    """
+        how much of a corpus of programs the type checker verifies,
+        and closures from compile_tree() against unboxed ones from
+        the verified programs
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    scope = Scope()
+    for name in ['debug', 'step', 'c', 'x'] + ['k_{}'.format(i) for i in range(100)]:
+        scope[name] = Number(1)
+    corpus = [('fib(18)', fib_program(18)), ('loop(1000)', loop_program(1000)),
+              ('sum(1000)', sum_program(1000)), ('split(15)', split_program(15)),
+              ('helper(1000)', helper_program(1000)), ('wide(50)', wide_program(50)),
+              ('compose(100)', compose_program(100)), ('guard(500)', guard_program(500)),
+              ('global(1000)', global_program(1000)), ('report(100)', report_program(100)),
+              ('nested(50)', nested_program(50, 3)), ('echo(5)', echo_program(5))]
+    corpus += [('generated({})'.format(seed), generated_program(seed)) for seed in range(50)]
+    verified = []
+    for name, program in corpus:
+        try:
+            verified.append((name, program, check(program, scope).compile()))
+        except TypeError as error:
+            print("{:<14} rejected: {}".format(name, error))
+    print("{} of {} programs verified".format(len(verified), len(corpus)))
+    output = io.StringIO()
+    with BufferedIO(io.StringIO('1 ' * 10), output):
+        for name, program, unboxed in verified[:10]:
+            compiled = compile_tree(program)
+            result = compiled(Scope(scope))
+            assert getattr(unboxed(Scope(scope)), 'value', None) == getattr(result, 'value', None)
+            boxed = measure(lambda: compiled(Scope(scope)))
+            plain = measure(lambda: unboxed(Scope(scope)))
+            print("{:<14} compiled {:8.4f}s  verified {:8.4f}s  x{:.2f}".format(
+                name, boxed, plain, boxed / plain))
+
+
+def bench_sessions():
+    """
+        1000 sessions on one event loop, each reading its n and running
+        a loop of n iterations: the time of all of them, and the longest
+        a task sharing the loop had to wait for its turn
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    program = parse("read n; def loop(i, acc) { if (i > n) { acc; } else"
+                    " { loop(i + 1, acc + i); }; }; print loop(1, 0);")
+    count = 1000
+
+    async def main(every):
+        sessions = [Interpreter(io.StringIO(str(100 + index % 100)), every=every)
+                    for index in range(count)]
+        running = asyncio.gather(*[session.evaluate_async(program) for session in sessions])
+        start = last = time.perf_counter()
+        wait = 0
+        while not running.done():
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            wait, last = max(wait, now - last), now
+        await running
+        for index, session in enumerate(sessions):
+            n = 100 + index % 100
+            assert session.output.getvalue() == '{}\n'.format(n * (n + 1) // 2)
+        return last - start, wait
+
+    start = time.perf_counter()
+    for index in range(count):
+        Interpreter(io.StringIO(str(100 + index % 100))).evaluate(program)
+    print("{} sessions one after another {:8.4f}s".format(count, time.perf_counter() - start))
+    for every in [100, 1000, 10 ** 9]:
+        total, wait = asyncio.run(main(every))
+        print("{} sessions, every {:>10} steps {:8.4f}s  longest wait {:8.4f}s".format(
+            count, every, total, wait))
+
+
+def bench_fuel():
+    """
+        runs outside any Fuel, which only test for one, against runs
+        that burn fuel and stop at a checkpoint every 1000 steps
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    for name, program in [('fib(18)', fib_program(18)), ('loop(1000)', loop_program(1000))]:
+        for backend, run in [('evaluate', program.evaluate), ('compiled', compile_tree(program)),
+                             ('lexical', compile_lexical(program)),
+                             ('stackeval', lambda scope: StackEvaluator().evaluate(program, scope)),
+                             ('vm', lambda scope: VM().evaluate(program, scope))]:
+            checkpoints = []
+
+            def fueled():
+                with Fuel(checkpoint=checkpoints.append):
+                    return run(Scope())
+            assert fueled().value == run(Scope()).value and checkpoints
+            plain = measure(lambda: run(Scope()), repeat=7)
+            burnt = measure(fueled, repeat=7)
+            print("{:<10} {:<9} plain {:8.4f}s  fueled {:8.4f}s  {:+.1%}".format(
+                name, backend, plain, burnt, burnt / plain - 1))
+
+
+def bench_incremental():
+    """
+        re-running a program after changing one binding of a long-lived
+        scope: full evaluation against the incremental evaluator
+    """
+    n = 2000
+    program = report_program(n)
+    scope = ReactiveScope()
+    for i in range(n):
+        scope['k_{}'.format(i)] = Number(i)
+    evaluator = IncrementalEvaluator()
+    evaluator.evaluate(program, scope)
+    counter = [0]
+
+    def change():
+        counter[0] += 1
+        scope['k_{}'.format(counter[0] % n)] = Number(counter[0])
+    full = measure(lambda: (change(), program.evaluate(scope)))
+    incremental = measure(lambda: (change(), evaluator.evaluate(program, scope)))
+    unchanged = measure(lambda: evaluator.evaluate(program, scope))
+    assert evaluator.evaluate(program, scope).value == program.evaluate(scope).value
+    print("{} statements, one binding changed: full {:8.4f}s  incremental {:8.4f}s"
+          "  x{:.1f}  unchanged {:8.6f}s".format(n, full, incremental, full / incremental, unchanged))
+
+
+def bench_print():
+    """
+        pretty-printing 10^5 nodes as a flat list and nested 1000 deep
+    """
+    nodes = 10 ** 5
+    for depth in [1, 1000]:
+        program = nested_program(depth, nodes // depth // 3)
+        out = io.StringIO()
+        printer = PrettyPrinter(out)
+        printer.visit(program)
+        size = len(out.getvalue())
+        seconds = measure(lambda: printer.visit(program), repeat=3)
+        print("depth {:5}  {:8} chars  {:8.4f}s".format(depth, size, seconds))
+
+
+def bench_parse():
+    """
+        tokenizing and parsing printed programs of growing size,
+        and the round trip through PrettyPrinter
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    for n in [10 ** 4, 4 * 10 ** 4]:
+        exprs = []
+        for seed in range(n // 100):
+            exprs += generated_program(seed).exprs
+        program = ExprList(exprs + nested_program(500, n // 1500).exprs +
+                           report_program(n).exprs)
+        out = io.StringIO()
+        PrettyPrinter(out).visit(program)
+        text = out.getvalue()
+        out = io.StringIO()
+        PrettyPrinter(out).visit(parse(text))
+        assert out.getvalue() == text
+        lex = measure(lambda: tokenize(text), repeat=3)
+        full = measure(lambda: parse(text), repeat=3)
+        megabytes = len(text) / 2 ** 20
+        print("{:6.2f} MB  tokenize {:7.4f}s  parse {:7.4f}s  {:5.2f} MB/s".format(
+            megabytes, lex, full, megabytes / full))
+
+
+def bench_traverse():
+    """
+        folding and printing a 50000 term chain, which recursive
+        visitors cannot walk, and a wide shallow program
+    """
+    chain = chain_program(50000)
+    wide = wide_program(2000)
+    for name, program in [('chain', chain), ('wide', wide)]:
+        fold = measure(lambda: ConstantFolder().visit(program), repeat=3)
+        out = io.StringIO()
+        show = measure(lambda: PrettyPrinter(out).visit(program), repeat=3)
+        print("{:<6} fold {:8.4f}s  print {:8.4f}s".format(name, fold, show))
+
+
+def bench_arena():
+    """
+        bytes per node of a generated program as objects and in an
+        Arena, and the cost of folding and printing through its views
+    """
+    n = 5000
+    nodes = len(Arena().load(wide_program(n)).arena)
+    for name, build in [('objects', lambda: wide_program(n)),
+                        ('arena', lambda: Arena().load(wide_program(n)))]:
+        tracemalloc.start()
+        try:
+            program = build()
+            size = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        fold = measure(lambda: ConstantFolder().visit(program), repeat=3)
+        show = measure(lambda: PrettyPrinter(io.StringIO()).visit(program), repeat=3)
+        print("{:<8} {:6.1f} bytes/node  fold {:8.4f}s  print {:8.4f}s".format(
+            name, size / nodes, fold, show))
+        if name == 'arena':
+            print("columns alone {:.1f} bytes/node, {} nodes".format(
+                program.arena.nbytes() / nodes, nodes))
+        del program
+
+
+BENCHMARKS = {'compile': bench_compile,
+              'numbers': bench_numbers,
+              'deep': bench_deep,
+              'vm': bench_vm,
+              'cache': bench_cache,
+              'memo': bench_memo,
+              'fold': bench_fold,
+              'intern': bench_intern,
+              'cse': bench_cse,
+              'io': bench_io,
+              'parallel': bench_parallel,
+              'batch': bench_batch,
+              'incremental': bench_incremental,
+              'print': bench_print,
+              'parse': bench_parse,
+              'traverse': bench_traverse,
+              'arena': bench_arena,
+              'closures': bench_closures,
+              'logic': bench_logic,
+              'verify': bench_verify,
+              'sessions': bench_sessions,
+              'fuel': bench_fuel,
+              }
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
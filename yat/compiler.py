@@ -0,0 +1,336 @@
+import operator
+
+from yat.model import *
+from yat.model import _UNBOUND
+from yat.resolver import resolve, own_names, binds_names, lookup, tail_parent
+
+
+BINARY_OPS = {'+': operator.add,
+              '-': operator.sub,
+              '*': operator.mul,
+              '/': operator.floordiv,
+              '%': operator.mod,
+              '==': operator.eq,
+              '!=': operator.ne,
+              '<': operator.lt,
+              '>': operator.gt,
+              '<=': operator.le,
+              '>=': operator.ge,
+              '&&': lambda x, y: x and y,
+              '||': lambda x, y: x or y,
+              }
+# && and || with both operands evaluated: x is the raw left value, y the
+# right operand's node, whose value is read only when it is the result
+EAGER_LOGIC = {'&&': lambda x, y: x and y.value,
+               '||': lambda x, y: x or y.value,
+               }
+UNARY_OPS = {'!': operator.not_,
+             '-': operator.neg
+             }
+
+# what a MemoCache gives for a call it has no result of
+_MISSING = object()
+
+
+class _TailCall:
+    __slots__ = ('body', 'frame')
+
+    def __init__(self, body, frame):
+        self.body = body
+        self.frame = frame
+
+
+class Compiler:
+    """
+        turns a yat tree into nested Python closures once, so that
+        running it again does not walk the tree or look up operators.
+        Calls in tail position return to a trampoline in the nearest
+        call that is not, so yat loops run in constant Python stack.
+        Given a MemoCache, other calls of pure functions are memoized.
+    """
+    def __init__(self, memo=None):
+        self.functions = dict()
+        self.memo = memo
+        self.slots = None
+        self.own = None
+        self.tail = False
+
+    def visit(self, obj):
+        return obj.access(self)
+
+    def function_body(self, function):
+        """
+            returns the compiled body of a function value together with
+            its frame layout, compiling it on the first call only
+        """
+        cached = self.functions.get(id(function))
+        if cached is None or cached[0] is not function:
+            outer = self.slots, self.own, self.tail
+            self.slots = slots = resolve(function)
+            self.own = [(slots[name], name) for name in own_names(function)]
+            self.tail = True
+            try:
+                body = function.body.access(self)
+            finally:
+                self.slots, self.own, self.tail = outer
+            cached = (function, body, slots,
+                      [slots[arg] for arg in function.args],
+                      frozenset(function.args))
+            self.functions[id(function)] = cached
+        return cached[1:]
+
+    def store(self, name):
+        """
+            returns a setter binding name in the frame it is called with
+        """
+        depth, slot = lookup(self.slots, name)
+        if depth is None:
+            def run(scope, value):
+                scope[name] = value
+        else:
+            def run(frame, value):
+                frame.values[slot] = value
+        return run
+
+    def value(self, node):
+        """
+            compiles an operand to a closure returning a raw int (or bool),
+            so arithmetic nodes pass values to each other without boxing
+        """
+        self.tail = False
+        if isinstance(node, Number):
+            value = node.value
+            return lambda scope: value
+        if isinstance(node, BinaryOperation):
+            lhs = self.value(node.lhs)
+            if node.op in EAGER_LOGIC and not short_circuit():
+                op = EAGER_LOGIC[node.op]
+                rhs = node.rhs.access(self)
+                return lambda scope: op(lhs(scope), rhs(scope))
+            rhs = self.value(node.rhs)
+            if node.op == '&&' and short_circuit():
+                return lambda scope: lhs(scope) and rhs(scope)
+            if node.op == '||' and short_circuit():
+                return lambda scope: lhs(scope) or rhs(scope)
+            op = BINARY_OPS[node.op]
+            return lambda scope: op(lhs(scope), rhs(scope))
+        if isinstance(node, UnaryOperation):
+            op = UNARY_OPS[node.op]
+            expr = self.value(node.expr)
+            return lambda scope: op(expr(scope))
+        if isinstance(node, Reference):
+            name = node.name
+            depth, slot = lookup(self.slots, name)
+            if depth is not None:
+                def run(frame):
+                    value = frame.values[slot]
+                    if value is _UNBOUND:
+                        value = frame.values[slot] = frame.parent[name]
+                    return value.value
+                return run
+        expr = node.access(self)
+        return lambda scope: expr(scope).value
+
+    def visit_number(self, num):
+        return lambda scope: num
+
+    def visit_exprlist(self, expr_list):
+        if not expr_list.exprs:
+            return lambda scope: None
+        tail = self.tail
+        exprs = []
+        for expr in expr_list.exprs[:-1]:
+            self.tail = False
+            exprs.append(expr.access(self))
+        self.tail = tail
+        last = expr_list.exprs[-1].access(self)
+        if not exprs:
+            return last
+
+        def run(scope):
+            fuel = current_fuel()
+            if fuel is not None:
+                fuel.left -= 1
+                if fuel.left < 0:
+                    fuel.refill()
+            for expr in exprs:
+                expr(scope)
+            return last(scope)
+        return run
+
+    def visit_function(self, function):
+        # evaluating a Function node runs its body in the current scope
+        return function.body.access(self)
+
+    def visit_definition(self, f_def):
+        function = f_def.function
+        store = self.store(f_def.name)
+
+        def run(scope):
+            store(scope, function)
+            return function
+        return run
+
+    def visit_conditional(self, cond):
+        tail = self.tail
+        condition = self.value(cond.condition)
+        self.tail = tail
+        if_true = cond.if_true.access(self)
+        self.tail = tail
+        if_false = cond.if_false.access(self)
+
+        def run(scope):
+            if condition(scope):
+                return if_true(scope)
+            return if_false(scope)
+        return run
+
+    def visit_print(self, prnt):
+        self.tail = False
+        expr = prnt.expr.access(self)
+
+        def run(scope):
+            obj = expr(scope)
+            current_io().write(obj.value)
+            return obj
+        return run
+
+    def visit_read(self, rd):
+        store = self.store(rd.name)
+
+        def run(scope):
+            obj = box(current_io().read())
+            store(scope, obj)
+            return obj
+        return run
+
+    def visit_call(self, call):
+        tail, self.tail = self.tail, False
+        fun_expr = call.fun_expr.access(self)
+        function_body = self.function_body
+        if binds_names(call.args):
+            # a Read among the arguments binds into the callee frame,
+            # so they have to be evaluated there and looked up by name
+            outer, self.slots = self.slots, None
+            try:
+                args = [arg.access(self) for arg in call.args]
+            finally:
+                self.slots = outer
+
+            def run(scope):
+                fuel = current_fuel()
+                if fuel is not None:
+                    fuel.left -= 1
+                    if fuel.left < 0:
+                        fuel.refill()
+                func = fun_expr(scope)
+                body, slots, arg_slots, names = function_body(func)
+                frame = Frame(scope, slots)
+                values = frame.values
+                for slot, val in zip(arg_slots, [expr(frame) for expr in args]):
+                    values[slot] = val
+                if tail:
+                    return _TailCall(body, frame)
+                result = body(frame)
+                while type(result) is _TailCall:
+                    result = result.body(result.frame)
+                return result
+            return run
+
+        args = [arg.access(self) for arg in call.args]
+        memo = self.memo
+        if not tail and memo is not None:
+            def run(scope):
+                fuel = current_fuel()
+                if fuel is not None:
+                    fuel.left -= 1
+                    if fuel.left < 0:
+                        fuel.refill()
+                func = fun_expr(scope)
+                vals = [expr(scope) for expr in args]
+                key = memo.key(func, vals, scope)
+                if key is not None:
+                    result = memo.get(key, _MISSING)
+                    if result is not _MISSING:
+                        return result
+                body, slots, arg_slots, names = function_body(func)
+                frame = Frame(scope, slots)
+                values = frame.values
+                for slot, val in zip(arg_slots, vals):
+                    values[slot] = val
+                result = body(frame)
+                while type(result) is _TailCall:
+                    result = result.body(result.frame)
+                if key is not None:
+                    memo.put(key, result)
+                return result
+            return run
+        if not tail:
+            def run(scope):
+                fuel = current_fuel()
+                if fuel is not None:
+                    fuel.left -= 1
+                    if fuel.left < 0:
+                        fuel.refill()
+                func = fun_expr(scope)
+                body, slots, arg_slots, names = function_body(func)
+                frame = Frame(scope, slots)
+                values = frame.values
+                for slot, val in zip(arg_slots, [expr(scope) for expr in args]):
+                    values[slot] = val
+                result = body(frame)
+                while type(result) is _TailCall:
+                    result = result.body(result.frame)
+                return result
+            return run
+
+        own = self.own
+        count = len(args)
+
+        def run(frame):
+            fuel = current_fuel()
+            if fuel is not None:
+                fuel.left -= 1
+                if fuel.left < 0:
+                    fuel.refill()
+            func = fun_expr(frame)
+            body, slots, arg_slots, names = function_body(func)
+            vals = [expr(frame) for expr in args]
+            if count >= len(arg_slots):
+                frame = Frame(tail_parent(frame, own, names), slots)
+            else:
+                frame = Frame(frame, slots)
+            values = frame.values
+            for slot, val in zip(arg_slots, vals):
+                values[slot] = val
+            return _TailCall(body, frame)
+        return run
+
+    def visit_reference(self, ref):
+        name = ref.name
+        depth, slot = lookup(self.slots, name)
+        if depth is None:
+            return lambda scope: scope[name]
+
+        def run(frame):
+            value = frame.values[slot]
+            if value is _UNBOUND:
+                value = frame.values[slot] = frame.parent[name]
+            return value
+        return run
+
+    def visit_binary(self, bin_op):
+        value = self.value(bin_op)
+        return lambda scope: box(value(scope))
+
+    def visit_unary(self, un_op):
+        value = self.value(un_op)
+        return lambda scope: box(value(scope))
+
+
+def compile_tree(node, memo=None):
+    """
+        compiles a tree into a closure taking a scope
+        and returning what node.evaluate(scope) would
+    """
+    return Compiler(memo).visit(node)
@@ -0,0 +1,379 @@
+from yat.model import *
+from yat.hashcons import NodeFactory
+from yat.traversal import postorder, DESCEND
+
+
+class Names:
+    """
+        collects every name a tree mentions
+    """
+    def __init__(self):
+        self.names = set()
+
+    def visit(self, obj):
+        postorder(self, obj)
+        return self.names
+
+    def visit_number(self, num):
+        pass
+
+    def visit_reference(self, ref):
+        self.names.add(ref.name)
+
+    visit_read = visit_reference
+
+    def visit_function(self, function, body):
+        self.names.update(function.args)
+
+    def visit_definition(self, f_def, function):
+        self.names.add(f_def.name)
+
+    def skip(self, node, *results):
+        pass
+
+    visit_print = skip
+    visit_unary = skip
+    visit_binary = skip
+    visit_exprlist = skip
+    visit_conditional = skip
+    visit_call = skip
+
+
+class Window:
+    """
+        walks statements in evaluation order up to the first barrier:
+        a read, a print, a call, a definition, the branches of a
+        conditional or the right operand of a short-circuit && or ||.
+        Counts the side-effect free subexpressions met on the way by
+        structure, and replaces the ones in temporaries by references
+        to them.
+
+        Pending work is kept on a stack of (task, node, mark) triples
+        and results on a stack of their own, as in StackEvaluator, so
+        expressions may be of any depth.
+    """
+    def __init__(self, factory, temporaries=None):
+        self.factory = factory
+        self.temporaries = temporaries or dict()
+        self.counts = dict()
+        self.seen = []
+        self.stopped = False
+        self.todo = []
+        self.results = []
+
+    def walk(self, node):
+        """
+            returns (node, its interned copy or None when it is not pure)
+        """
+        todo = self.todo
+        todo.append((self.enter, node, None))
+        while todo:
+            task, node, mark = todo.pop()
+            task(node, mark)
+        return self.results.pop()
+
+    def enter(self, node, mark):
+        if self.stopped:
+            self.results.append((node, None))
+        else:
+            node.access(self)
+
+    def occurrence(self, node, canonical, mark):
+        name = self.temporaries.get(canonical)
+        if name is not None:
+            # what it contains is not evaluated here any more
+            for inner in self.seen[mark:]:
+                self.counts[inner] -= 1
+            del self.seen[mark:]
+            return Reference(name), canonical
+        self.counts[canonical] = self.counts.get(canonical, 0) + 1
+        self.seen.append(canonical)
+        return node, canonical
+
+    def visit_number(self, num):
+        self.results.append((num, self.factory.number(num.value)))
+
+    def visit_reference(self, ref):
+        self.results.append((ref, self.factory.reference(ref.name)))
+
+    def visit_binary(self, bin_op):
+        todo = self.todo
+        if bin_op.op in ('&&', '||') and short_circuit():
+            # the right operand may not run, like a branch
+            todo.append((self.logical, bin_op, None))
+        else:
+            todo.append((self.binary, bin_op, len(self.seen)))
+            todo.append((self.enter, bin_op.rhs, None))
+        todo.append((self.enter, bin_op.lhs, None))
+
+    def logical(self, bin_op, mark):
+        lhs, _ = self.results.pop()
+        self.stopped = True
+        if lhs is not bin_op.lhs:
+            bin_op = BinaryOperation(lhs, bin_op.op, bin_op.rhs)
+        self.results.append((bin_op, None))
+
+    def binary(self, bin_op, mark):
+        results = self.results
+        rhs, right = results.pop()
+        lhs, left = results.pop()
+        node = bin_op
+        if lhs is not bin_op.lhs or rhs is not bin_op.rhs:
+            node = BinaryOperation(lhs, bin_op.op, rhs)
+        if left is None or right is None:
+            results.append((node, None))
+        else:
+            results.append(self.occurrence(node, self.factory.binary(left, bin_op.op, right), mark))
+
+    def visit_unary(self, un_op):
+        self.todo.append((self.unary, un_op, len(self.seen)))
+        self.todo.append((self.enter, un_op.expr, None))
+
+    def unary(self, un_op, mark):
+        expr, canonical = self.results.pop()
+        node = un_op if expr is un_op.expr else UnaryOperation(un_op.op, expr)
+        if canonical is None:
+            self.results.append((node, None))
+        else:
+            self.results.append(self.occurrence(node, self.factory.unary(un_op.op, canonical), mark))
+
+    def visit_print(self, prnt):
+        self.todo.append((self.printed, prnt, None))
+        self.todo.append((self.enter, prnt.expr, None))
+
+    def printed(self, prnt, mark):
+        expr, _ = self.results.pop()
+        self.stopped = True
+        self.results.append(((prnt if expr is prnt.expr else Print(expr)), None))
+
+    def visit_conditional(self, cond):
+        self.todo.append((self.branch, cond, None))
+        self.todo.append((self.enter, cond.condition, None))
+
+    def branch(self, cond, mark):
+        condition, _ = self.results.pop()
+        self.stopped = True
+        if condition is not cond.condition:
+            cond = Conditional(condition, cond.if_true.exprs, cond.if_false.exprs)
+        self.results.append((cond, None))
+
+    def stop(self, node):
+        self.stopped = True
+        self.results.append((node, None))
+
+    visit_read = stop
+    visit_call = stop
+    visit_definition = stop
+    visit_function = stop
+    visit_exprlist = stop
+
+
+class Binds:
+    """
+        tells if evaluating a tree can bind a name in the current scope
+    """
+    def visit(self, obj):
+        return postorder(self, obj)
+
+    def visit_number(self, num):
+        return False
+
+    visit_reference = visit_number
+
+    def visit_read(self, rd):
+        return True
+
+    def enter_function(self, function):
+        return True
+
+    enter_definition = enter_function
+
+    def visit_print(self, prnt, expr):
+        return expr
+
+    visit_unary = visit_print
+
+    def visit_binary(self, bin_op, lhs, rhs):
+        return lhs or rhs
+
+    def visit_exprlist(self, expr_list, exprs):
+        return any(exprs)
+
+    def visit_conditional(self, cond, condition, if_true, if_false):
+        return condition or if_true or if_false
+
+    def visit_call(self, call, fun_expr, args):
+        # arguments bind into the callee's scope
+        return fun_expr
+
+
+class Sizes:
+    """
+        count_nodes of interned trees, remembered per node so that
+        sizing every subexpression of a tree takes linear time
+    """
+    def __init__(self):
+        self.sizes = dict()
+
+    def visit(self, node):
+        size = self.sizes.get(node)
+        return size if size is not None else postorder(self, node)
+
+    def enter(self, node):
+        size = self.sizes.get(node)
+        return size if size is not None else DESCEND
+
+    enter_binary = enter
+    enter_unary = enter
+
+    def visit_number(self, num):
+        return 1
+
+    visit_reference = visit_number
+
+    def visit_binary(self, bin_op, lhs, rhs):
+        self.sizes[bin_op] = size = 1 + lhs + rhs
+        return size
+
+    def visit_unary(self, un_op, expr):
+        self.sizes[un_op] = size = 1 + expr
+        return size
+
+
+class CommonSubexpressions:
+    """
+        hoists side-effect free subexpressions computed more than once
+        between two barriers of an expression list. yat has no
+        assignment, so the temporaries are the arguments of a fresh
+        function holding the rest of the list:
+
+            a * b + c; print a * b;
+        becomes
+            def __cse0(__t0) { __t0 + c; print __t0; }; __cse0(a * b);
+
+        The rest of the list then runs in a scope of its own. That is
+        only done where it cannot bind anything the code after the list
+        could see: in function bodies, or when the rest binds no names.
+        A hoist is made when it saves more evaluations than the call
+        costs; evaluations counts how many it saves per run of the list.
+    """
+    min_size = 3
+    call_cost = 4
+
+    def __init__(self):
+        self.factory = NodeFactory()
+        self.sizes = Sizes()
+        self.used = set()
+        self.counter = 0
+        self.functions = dict()
+        self.evaluations = 0
+
+    def visit(self, obj):
+        self.used = Names().visit(obj)
+        self.functions = dict()
+        return self.rewrite(obj, False)
+
+    def rewrite(self, obj, body):
+        if isinstance(obj, FunctionDefinition):
+            function = self.function(obj.function)
+            return obj if function is obj.function else FunctionDefinition(obj.name, function)
+        if isinstance(obj, ExprList):
+            if not obj.list_exists():
+                return obj
+            exprs = self.block([self.rewrite(expr, False) for expr in obj.exprs], body)
+            if all(new is old for new, old in zip(exprs, obj.exprs)) and \
+                    len(exprs) == len(obj.exprs):
+                return obj
+            return ExprList(exprs)
+        if isinstance(obj, Conditional):
+            if_true = self.rewrite(obj.if_true, False)
+            if_false = self.rewrite(obj.if_false, False)
+            if if_true is obj.if_true and if_false is obj.if_false:
+                return obj
+            return Conditional(obj.condition, if_true.exprs, if_false.exprs)
+        if isinstance(obj, Print):
+            expr = self.rewrite(obj.expr, False)
+            return obj if expr is obj.expr else Print(expr)
+        if isinstance(obj, FunctionCall):
+            args = [self.rewrite(arg, False) for arg in obj.args]
+            if all(new is old for new, old in zip(args, obj.args)):
+                return obj
+            return FunctionCall(obj.fun_expr, args)
+        return obj
+
+    def function(self, function):
+        cached = self.functions.get(id(function))
+        if cached is None or cached[0] is not function:
+            body = self.rewrite(function.body, True)
+            new = function if body is function.body else Function(function.args, body.exprs)
+            cached = (function, new)
+            self.functions[id(function)] = cached
+        return cached[1]
+
+    def fresh(self, prefix):
+        while True:
+            name = '__{}{}'.format(prefix, self.counter)
+            self.counter += 1
+            if name not in self.used:
+                self.used.add(name)
+                return name
+
+    def block(self, exprs, body):
+        start = 0
+        while start < len(exprs):
+            window = Window(self.factory)
+            end = start
+            while end < len(exprs) and not window.stopped:
+                window.walk(exprs[end])
+                end += 1
+            temporaries = self.choose(exprs[start:end])
+            if temporaries and (body or not any(Binds().visit(expr) for expr in exprs[start:])):
+                return exprs[:start] + self.hoist(exprs[start:], temporaries, body)
+            start = end
+        return exprs
+
+    def choose(self, exprs):
+        """
+            temporaries worth introducing for a window, with the
+            evaluations they save; larger subexpressions go first
+        """
+        temporaries = dict()
+        saved = 0
+        while True:
+            window = Window(self.factory, temporaries)
+            for expr in exprs:
+                window.walk(expr)
+            best = None
+            for canonical, count in window.counts.items():
+                size = self.sizes.visit(canonical)
+                if count > 1 and size >= self.min_size and \
+                        (best is None or size > best[1]):
+                    best = canonical, size, count
+            if best is None:
+                break
+            canonical, size, count = best
+            temporaries[canonical] = self.fresh('t')
+            saved += count * size - size - count
+        if saved <= self.call_cost:
+            return None
+        self.evaluations += saved - self.call_cost
+        return temporaries
+
+    def hoist(self, exprs, temporaries, body):
+        window = Window(self.factory, temporaries)
+        rest = []
+        for expr in exprs:
+            rest.append(window.walk(expr)[0])
+        name = self.fresh('cse')
+        args = list(temporaries.values())
+        values = list(temporaries.keys())
+        rest = self.block(rest, True)
+        return [FunctionDefinition(name, Function(args, rest)),
+                FunctionCall(Reference(name), values)]
+
+
+def eliminate(node):
+    """
+        returns node with common subexpressions hoisted
+    """
+    return CommonSubexpressions().visit(node)
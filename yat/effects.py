@@ -0,0 +1,179 @@
+from collections import OrderedDict
+
+from yat.model import *
+
+
+class EffectAnalyzer:
+    """
+        walks a function body and tells if it can be memoized: it must not
+        print, read or define anything, and must call functions only by
+        names it does not take as arguments. Collects the names it reads
+        from the calling frames and the names it calls.
+    """
+    def __init__(self, args):
+        self.args = set(args)
+        self.pure = True
+        self.free = []
+        self.callees = []
+
+    def visit(self, obj):
+        obj.access(self)
+        return self
+
+    def read(self, name):
+        if name not in self.args and name not in self.free:
+            self.free.append(name)
+
+    def visit_number(self, num):
+        pass
+
+    def visit_reference(self, ref):
+        self.read(ref.name)
+
+    def visit_function(self, function):
+        function.body.access(self)
+
+    def visit_exprlist(self, expr_list):
+        for expr in expr_list.exprs or []:
+            expr.access(self)
+
+    def visit_definition(self, f_def):
+        self.pure = False
+
+    def visit_read(self, rd):
+        self.pure = False
+
+    def visit_print(self, prnt):
+        self.pure = False
+
+    def visit_conditional(self, cond):
+        cond.condition.access(self)
+        cond.if_true.access(self)
+        cond.if_false.access(self)
+
+    def visit_call(self, call):
+        fun_expr = call.fun_expr
+        if not isinstance(fun_expr, Reference) or fun_expr.name in self.args:
+            self.pure = False
+        elif fun_expr.name not in self.callees:
+            self.callees.append(fun_expr.name)
+            self.read(fun_expr.name)
+        for arg in call.args:
+            arg.access(self)
+
+    def visit_binary(self, bin_op):
+        bin_op.lhs.access(self)
+        bin_op.rhs.access(self)
+
+    def visit_unary(self, un_op):
+        un_op.expr.access(self)
+
+
+class MemoCache:
+    """
+        opt-in LRU cache of results of pure functions. A key is the
+        function, its argument values and the values of every name it
+        or the functions it calls read from the calling frames.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.summaries = dict()
+        self.dependencies = dict()
+
+    def summary(self, function):
+        cached = self.summaries.get(id(function))
+        if cached is None or cached[0] is not function:
+            cached = (function,
+                      EffectAnalyzer(function.args).visit(function.body))
+            self.summaries[id(function)] = cached
+        return cached[1]
+
+    def is_pure(self, function):
+        return self.summary(function).pure
+
+    def depends(self, function, scope):
+        """
+            the names a call of function reads from scope, directly or
+            through the functions they are bound to, and those functions;
+            None when one of them is impure or a callee is not a function
+        """
+        names = []
+        callees = dict()
+        seen = set()
+        todo = [function]
+        while todo:
+            func = todo.pop()
+            if id(func) in seen:
+                continue
+            seen.add(id(func))
+            summary = self.summary(func)
+            if not summary.pure:
+                return None
+            for name in summary.free:
+                if name in names:
+                    continue
+                names.append(name)
+                value = scope[name]
+                if isinstance(value, Function):
+                    callees[len(names) - 1] = value
+                    todo.append(value)
+                elif name in summary.callees:
+                    return None
+        return names, callees
+
+    def key(self, function, args, scope):
+        """
+            memo key for calling function with args from scope, or None
+            when the call must not be memoized
+        """
+        if len(args) < len(function.args):
+            return None
+        for arg in args:
+            if not isinstance(arg, Number):
+                return None
+        try:
+            cached = self.dependencies.get(id(function))
+            if cached is None or cached[0] is not function:
+                cached = (function, self.depends(function, scope))
+                self.dependencies[id(function)] = cached
+            if cached[1] is None:
+                return None
+            names, callees = cached[1]
+            values = [scope[name] for name in names]
+            for index, value in enumerate(values):
+                if isinstance(value, Function) and callees.get(index) is not value:
+                    # a name is bound to another function here
+                    cached = (function, self.depends(function, scope))
+                    self.dependencies[id(function)] = cached
+                    if cached[1] is None:
+                        return None
+                    names = cached[1][0]
+                    values = [scope[name] for name in names]
+                    break
+        except (KeyError, TypeError):
+            return None
+        return (function, tuple(arg.value for arg in args),
+                tuple(value.value if isinstance(value, Number) else value
+                      for value in values))
+
+    def get(self, key, default=None):
+        """
+            the result cached for key, or default; a function may return
+            None, so callers that cache None pass a default of their own
+        """
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        entries = self.entries
+        entries[key] = value
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
@@ -1,72 +1,329 @@
 from yat.model import *
 from yat.printer import *
+from yat.traversal import postorder, children_first, DESCEND
+
+
+def is_pure(node):
+    """
+        tells if evaluating node has no effect besides its value
+    """
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, BinaryOperation):
+            todo.append(node.lhs)
+            todo.append(node.rhs)
+        elif isinstance(node, UnaryOperation):
+            todo.append(node.expr)
+        elif not isinstance(node, (Number, Reference)):
+            return False
+    return True
+
+
+def is_one(node):
+    return node.is_constant() and node.value == 1
+
+
+def substitute(node, args):
+    """
+        copy of a pure expression with references to args replaced
+    """
+    if isinstance(node, Reference):
+        return args.get(node.name, node)
+    if isinstance(node, BinaryOperation):
+        return BinaryOperation(substitute(node.lhs, args), node.op,
+                               substitute(node.rhs, args))
+    if isinstance(node, UnaryOperation):
+        return UnaryOperation(node.op, substitute(node.expr, args))
+    return node
+
+
+def operands(node):
+    """
+        node and the operands below it, down through arithmetic only
+    """
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        yield node
+        if isinstance(node, BinaryOperation):
+            todo.append(node.rhs)
+            todo.append(node.lhs)
+        elif isinstance(node, UnaryOperation):
+            todo.append(node.expr)
+
+
+def count_nodes(node):
+    return sum(1 for _ in operands(node))
+
+
+def count_references(node, name):
+    return sum(1 for operand in operands(node)
+               if isinstance(operand, Reference) and operand.name == name)
+
+
+class Bindings:
+    """
+        counts the places in a tree that bind each name:
+        function arguments, definitions and reads
+    """
+    def __init__(self):
+        self.count = dict()
+        self.seen = set()
+
+    def bind(self, name):
+        self.count[name] = self.count.get(name, 0) + 1
+
+    def visit(self, obj):
+        postorder(self, obj)
+        return self.count
+
+    def enter_function(self, function):
+        if id(function) in self.seen:
+            return None
+        self.seen.add(id(function))
+        return DESCEND
+
+    def visit_number(self, num):
+        pass
+
+    visit_reference = visit_number
+
+    def visit_function(self, function, body):
+        for arg in function.args:
+            self.bind(arg)
+
+    def visit_exprlist(self, expr_list, exprs):
+        pass
+
+    def visit_definition(self, f_def, function):
+        self.bind(f_def.name)
+
+    def visit_read(self, rd):
+        self.bind(rd.name)
+
+    def visit_conditional(self, cond, condition, if_true, if_false):
+        pass
+
+    def visit_print(self, pr, expr):
+        pass
+
+    def visit_call(self, call, fun_expr, args):
+        pass
+
+    def visit_binary(self, bin_op, lhs, rhs):
+        pass
+
+    def visit_unary(self, un_op, expr):
+        pass
 
 
 class ConstantFolder:
+    """
+        simplifies a tree until nothing changes. Besides folding constant
+        operations it drops identity elements, removes the dead branch
+        of a conditional with a constant condition, propagates the values
+        of names that are bound once for the whole program and inlines
+        calls of small functions made of arithmetic only. Unchanged
+        subtrees are shared with the input instead of copied.
+
+        Names are known when the program binds them nowhere else than in
+        the definitions it starts with, or, given a scope, when the
+        program does not bind them at all and the scope does.
+
+        Every pass is a postorder traversal, so trees of any depth fold.
+    """
+    inline_size = 16
+    max_passes = 32
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.known = dict()
+        self.bound = dict()
+        self.functions = dict()
+
     def simplify(self, obj):
-        try:
-            return obj.access(self)
-        except AttributeError:
-            return obj
+        return postorder(self, obj)
 
     def visit(self, obj):
-        return obj.access(self)
+        for _ in range(self.max_passes):
+            self.prepare(obj)
+            new = postorder(self, obj)
+            if new is obj:
+                break
+            obj = new
+        return obj
+
+    def prepare(self, obj):
+        self.bound = Bindings().visit(obj)
+        self.known = dict()
+        self.functions = dict()
+        exprs = obj.exprs or [] if isinstance(obj, ExprList) else [obj]
+        for expr in exprs:
+            if not isinstance(expr, FunctionDefinition):
+                break
+            if self.bound[expr.name] == 1:
+                self.known[expr.name] = expr.function
+
+    def lookup(self, name):
+        """
+            the Number or Function name is bound to while the program
+            runs, None when that is not known
+        """
+        if name in self.known:
+            return self.known[name]
+        if self.scope is None or name in self.bound:
+            return None
+        try:
+            value = self.scope[name]
+        except (KeyError, TypeError):
+            value = None
+        if not isinstance(value, (Number, Function)):
+            value = None
+        self.known[name] = value
+        return value
+
+    def enter_function(self, function):
+        cached = self.functions.get(id(function))
+        if cached is not None and cached[0] is function:
+            return cached[1]
+        return DESCEND
 
     def visit_number(self, num):
-        return Number(num.value)
-
-    def visit_binary(self, bin_op):
-        ret = BinaryOperation(self.simplify(bin_op.lhs),
-                              bin_op.op,
-                              self.simplify(bin_op.rhs))
-        if ret.lhs.is_constant() and ret.rhs.is_constant():
-            return ret.evaluate()
-        if ret.lhs.is_zero() or ret.rhs.is_zero():
-            if ret.op in ['*', '/', '&&', '%']:
-                return Number(0)
-        if ret.lhs.get_name() == ret.rhs.get_name() and ret.rhs.get_name():
-            if ret.op in ['-', '%', '!=', '<', '>']:
+        return num
+
+    @children_first
+    def visit_binary(self, bin_op, lhs, rhs):
+        op = bin_op.op
+        if lhs is bin_op.lhs and rhs is bin_op.rhs:
+            ret = bin_op
+        else:
+            ret = BinaryOperation(lhs, op, rhs)
+        if lhs.is_constant() and rhs.is_constant():
+            try:
+                return ret.evaluate()
+            except ZeroDivisionError:
+                return ret
+        if op in ['&&', '||'] and lhs.is_constant() and \
+                bool(lhs.value) == (op == '||') and short_circuit():
+            return lhs
+        if op in ['*', '&&'] and (lhs.is_zero() and is_pure(rhs) or
+                                  rhs.is_zero() and is_pure(lhs)):
+            return Number(0)
+        if op in ['/', '%'] and lhs.is_zero() and is_pure(rhs):
+            return Number(0)
+        if lhs.get_name() == rhs.get_name() and rhs.get_name():
+            if op in ['-', '%', '!=', '<', '>']:
                 return Number(0)
-            if ret.op in ['/', '==', '<=', '>=']:
+            if op in ['/', '==', '<=', '>=']:
                 return Number(1)
+        if op in ['+', '||'] and lhs.is_zero() or op == '*' and is_one(lhs):
+            return rhs
+        if op in ['+', '-', '||'] and rhs.is_zero() or op in ['*', '/'] and is_one(rhs):
+            return lhs
+        if op == '&&' and lhs.is_constant() and lhs.value:
+            return rhs
         return ret
 
-    def visit_unary(self, un_op):
-        ret = UnaryOperation(un_op.op, self.simplify(un_op.expr))
-        if ret.expr.is_constant():
-            ret = ret.evaluate()
+    @children_first
+    def visit_unary(self, un_op, expr):
+        if expr.is_constant():
+            return UnaryOperation(un_op.op, expr).evaluate()
+        if un_op.op == '-' and isinstance(expr, UnaryOperation) and expr.op == '-':
+            return expr.expr
+        if expr is un_op.expr:
+            return un_op
+        return UnaryOperation(un_op.op, expr)
+
+    @children_first
+    def visit_call(self, call, fun_expr, args):
+        inlined = self.inline(fun_expr, args)
+        if inlined is not None:
+            return inlined
+        if fun_expr is call.fun_expr and all(new is old for new, old in zip(args, call.args)):
+            return call
+        return FunctionCall(fun_expr, args)
+
+    def inline(self, fun_expr, args):
+        """
+            the body of a small arithmetic function with the arguments
+            in place of its parameters, or None when that is not possible
+        """
+        if not isinstance(fun_expr, Reference):
+            return None
+        function = self.lookup(fun_expr.name)
+        if not isinstance(function, Function):
+            return None
+        params = list(function.args)
+        exprs = function.body.exprs or []
+        if len(exprs) != 1 or len(params) != len(args) or len(set(params)) != len(params):
+            return None
+        body = exprs[0]
+        if not is_pure(body) or count_nodes(body) > self.inline_size:
+            return None
+        for param, arg in zip(params, args):
+            if not is_pure(arg):
+                return None
+            if not isinstance(arg, (Number, Reference)) and count_references(body, param) > 1:
+                return None
+        return substitute(body, dict(zip(params, args)))
+
+    @children_first
+    def visit_function(self, function, body):
+        ret = function if body is function.body else Function(function.args, body.exprs)
+        self.functions[id(function)] = (function, ret)
         return ret
 
-    def visit_call(self, call):
-        return FunctionCall(self.simplify(call.fun_expr),
-                            list(map(self.simplify, call.args)))
-
-    def visit_function(self, function):
-        return Function(list(map(self.simplify, function.args)),
-                        self.simplify(function.body).exprs)
-
-    def visit_definition(self, f_def):
-        return FunctionDefinition(self.simplify(f_def.name), self.simplify(f_def.function))
-
-    def visit_exprlist(self, expr_list):
-        if expr_list.list_exists():
-            return ExprList(list(map(self.simplify, expr_list.exprs)))
-        return ExprList(None)
-
-    def visit_conditional(self, cond):
-        return Conditional(self.simplify(cond.condition),
-                           self.simplify(cond.if_true).exprs,
-                           self.simplify(cond.if_false).exprs
-                           )
+    @children_first
+    def visit_definition(self, f_def, function):
+        if function is f_def.function:
+            return f_def
+        return FunctionDefinition(f_def.name, function)
+
+    @children_first
+    def visit_exprlist(self, expr_list, folded):
+        if not expr_list.list_exists():
+            return expr_list
+        exprs = []
+        changed = False
+        last = len(expr_list.exprs) - 1
+        for i, (expr, new) in enumerate(zip(expr_list.exprs, folded)):
+            changed = changed or new is not expr
+            if isinstance(new, Conditional) and new.condition.is_constant():
+                branch = new.if_true if new.condition.value else new.if_false
+                if branch.exprs or i != last:
+                    exprs += branch.exprs or []
+                    changed = True
+                    continue
+            exprs.append(new)
+        if not changed:
+            return expr_list
+        return ExprList(exprs)
+
+    @children_first
+    def visit_conditional(self, cond, condition, if_true, if_false):
+        if condition.is_constant():
+            branch = if_true if condition.value else if_false
+            if branch.exprs and len(branch.exprs) == 1:
+                return branch.exprs[0]
+        if condition is cond.condition and if_true is cond.if_true and if_false is cond.if_false:
+            return cond
+        return Conditional(condition, if_true.exprs, if_false.exprs)
 
     def visit_read(self, read):
-        return Read(read.name)
+        return read
 
-    def visit_print(self, pr):
-        return Print(pr.expr.access(self))
+    @children_first
+    def visit_print(self, pr, expr):
+        if expr is pr.expr:
+            return pr
+        return Print(expr)
 
     def visit_reference(self, ref):
-        return Reference(ref.name)
+        value = self.lookup(ref.name)
+        if isinstance(value, Number):
+            return value
+        return ref
 
 
 def example():
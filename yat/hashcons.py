@@ -0,0 +1,192 @@
+from weakref import WeakValueDictionary
+
+from yat.model import *
+from yat.traversal import postorder, children_first, DESCEND
+
+
+class Frozen:
+    """
+        mixin of interned nodes: they are shared, so they must not change
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("interned {} is immutable".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("interned {} is immutable".format(type(self).__name__))
+
+    def __reduce__(self):
+        fields = dict()
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if name != '__weakref__' and hasattr(self, name):
+                    fields[name] = getattr(self, name)
+        return _thaw, (type(self).__bases__[1], fields)
+
+
+def _thaw(cls, fields):
+    """
+        rebuilds an unpickled interned node; it belongs to no factory
+    """
+    node = object.__new__(FROZEN[cls])
+    for name, value in fields.items():
+        object.__setattr__(node, name, value)
+    return node
+
+
+NODE_CLASSES = [Number, ExprList, Function, FunctionDefinition, Conditional,
+                Print, Read, FunctionCall, Reference, BinaryOperation,
+                UnaryOperation]
+
+FROZEN = {cls: type('Interned' + cls.__name__, (Frozen, cls),
+                    {'__slots__': ('__weakref__',)})
+          for cls in NODE_CLASSES}
+
+
+class NodeFactory:
+    """
+        builds yat nodes with hash-consing: asking twice for the same
+        structure gives the same immutable object, so structurally equal
+        trees are equal by identity and can be used as dictionary keys.
+        Children are interned first, which makes a key the node's class,
+        its own fields and the identities of its children. A node lives
+        in the table as long as something else refers to it.
+
+        It is also a visitor: visit(tree) returns the interned copy of a
+        tree built with the plain constructors, walked children first
+        so that it may be of any depth.
+    """
+    def __init__(self):
+        self.table = WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def intern(self, cls, key, **fields):
+        node = self.table.get(key)
+        if node is not None:
+            self.hits += 1
+            return node
+        self.misses += 1
+        node = object.__new__(FROZEN[cls])
+        for name, value in fields.items():
+            object.__setattr__(node, name, value)
+        self.table[key] = node
+        return node
+
+    def share(self, node):
+        if isinstance(node, Frozen):
+            return node
+        return self.visit(node)
+
+    def number(self, value):
+        value = value if type(value) is int else int(value)
+        return self.intern(Number, (Number, value), value=value)
+
+    def reference(self, name):
+        return self.intern(Reference, (Reference, name), name=name)
+
+    def read(self, name):
+        return self.intern(Read, (Read, name), name=name)
+
+    def print(self, expr):
+        expr = self.share(expr)
+        return self.intern(Print, (Print, expr), expr=expr)
+
+    def unary(self, op, expr):
+        expr = self.share(expr)
+        return self.intern(UnaryOperation, (UnaryOperation, op, expr),
+                           op=op, expr=expr)
+
+    def binary(self, lhs, op, rhs):
+        lhs = self.share(lhs)
+        rhs = self.share(rhs)
+        return self.intern(BinaryOperation, (BinaryOperation, lhs, op, rhs),
+                           lhs=lhs, op=op, rhs=rhs)
+
+    def exprlist(self, exprs):
+        if exprs is not None:
+            exprs = tuple(self.share(expr) for expr in exprs)
+        return self.intern(ExprList, (ExprList, exprs), exprs=exprs)
+
+    def function(self, args, body):
+        args = tuple(args)
+        body = self.exprlist(body)
+        return self.intern(Function, (Function, args, body), args=args, body=body)
+
+    def definition(self, name, function):
+        function = self.share(function)
+        return self.intern(FunctionDefinition, (FunctionDefinition, name, function),
+                           name=name, function=function)
+
+    def conditional(self, condition, if_true, if_false=None):
+        condition = self.share(condition)
+        if_true = self.exprlist(if_true)
+        if_false = self.exprlist(if_false)
+        return self.intern(Conditional, (Conditional, condition, if_true, if_false),
+                           condition=condition, if_true=if_true, if_false=if_false)
+
+    def call(self, fun_expr, args):
+        fun_expr = self.share(fun_expr)
+        args = tuple(self.share(arg) for arg in args)
+        return self.intern(FunctionCall, (FunctionCall, fun_expr, args),
+                           fun_expr=fun_expr, args=args)
+
+    def visit(self, obj):
+        if isinstance(obj, Frozen):
+            return obj
+        return postorder(self, obj)
+
+    def enter(self, node):
+        # interned subtrees are shared as they are
+        return node if isinstance(node, Frozen) else DESCEND
+
+    enter_print = enter
+    enter_unary = enter
+    enter_binary = enter
+    enter_exprlist = enter
+    enter_function = enter
+    enter_definition = enter
+    enter_conditional = enter
+    enter_call = enter
+
+    def visit_number(self, num):
+        return self.number(num.value)
+
+    def visit_reference(self, ref):
+        return self.reference(ref.name)
+
+    def visit_read(self, rd):
+        return self.read(rd.name)
+
+    @children_first
+    def visit_print(self, prnt, expr):
+        return self.print(expr)
+
+    @children_first
+    def visit_unary(self, un_op, expr):
+        return self.unary(un_op.op, expr)
+
+    @children_first
+    def visit_binary(self, bin_op, lhs, rhs):
+        return self.binary(lhs, bin_op.op, rhs)
+
+    @children_first
+    def visit_exprlist(self, expr_list, exprs):
+        return self.exprlist(exprs if expr_list.exprs is not None else None)
+
+    @children_first
+    def visit_function(self, function, body):
+        return self.function(function.args, body.exprs)
+
+    @children_first
+    def visit_definition(self, f_def, function):
+        return self.definition(f_def.name, function)
+
+    @children_first
+    def visit_conditional(self, cond, condition, if_true, if_false):
+        return self.conditional(condition, if_true.exprs, if_false.exprs)
+
+    @children_first
+    def visit_call(self, call, fun_expr, args):
+        return self.call(fun_expr, args)
@@ -0,0 +1,201 @@
+from yat.model import *
+from yat.compiler import BINARY_OPS, EAGER_LOGIC, UNARY_OPS
+
+
+class ReactiveScope(Scope):
+    """
+        a Scope counting its changes on a clock shared by all of them.
+        While no ReactiveScope changed, IncrementalEvaluator trusts its
+        cached results without looking anything up.
+    """
+    __slots__ = ('tracked',)
+    clock = 0
+
+    def __init__(self, parent=None):
+        Scope.__init__(self, parent)
+        self.tracked = parent is None or getattr(parent, 'tracked', False)
+
+    def __setitem__(self, key, value):
+        Scope.__setitem__(self, key, value)
+        ReactiveScope.clock += 1
+
+
+class CallScope:
+    """
+        scope of a call made by IncrementalEvaluator; it lives for the
+        call only, so nothing evaluated in it is cached
+    """
+    __slots__ = ('parent', 'bindings')
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.bindings = dict()
+
+    def __setitem__(self, key, value):
+        self.bindings[key] = value
+
+
+class Recording:
+    """
+        what evaluating a node did to the scope: the names it read with
+        their values, the functions it defined, whether it had effects
+    """
+    __slots__ = ('reads', 'writes', 'effects')
+
+    def __init__(self):
+        self.reads = dict()
+        self.writes = []
+        self.effects = False
+
+    def merge(self, other):
+        for name, value in other.reads.items():
+            self.reads.setdefault(name, value)
+        self.writes += other.writes
+        self.effects = self.effects or other.effects
+
+
+class Entry:
+    __slots__ = ('node', 'scope', 'value', 'recording', 'clock')
+
+    def __init__(self, node, scope, value, recording, clock):
+        self.node = node
+        self.scope = scope
+        self.value = value
+        self.recording = recording
+        self.clock = clock
+
+
+def same(old, new):
+    return old is new or \
+        isinstance(old, Number) and isinstance(new, Number) and old.value == new.value
+
+
+def bound(scope, name):
+    try:
+        return scope[name]
+    except (KeyError, TypeError):
+        return None
+
+
+class IncrementalEvaluator:
+    """
+        evaluates like Operator.evaluate and remembers the result of every
+        node evaluated directly in a long-lived scope, with the names it
+        read from that scope, its calls included, and their values.
+        Evaluating the same tree in the same scope again recomputes only
+        the nodes whose names now have other values, looked up through
+        the whole parent chain, so a binding added to a child scope
+        invalidates what read the parent's. The functions a cached node
+        defined are defined again when its result is reused. Nodes that
+        print or read are always evaluated again, though their
+        side-effect free parts still come from the cache.
+    """
+    def __init__(self):
+        self.entries = dict()
+        self.recordings = []
+        self.hits = 0
+        self.misses = 0
+
+    def valid(self, entry):
+        scope = entry.scope
+        if entry.clock == ReactiveScope.clock and getattr(scope, 'tracked', False):
+            return True
+        for name, value in entry.recording.reads.items():
+            if not same(value, bound(scope, name)):
+                return False
+        entry.clock = ReactiveScope.clock
+        return True
+
+    def lookup(self, scope, name):
+        while type(scope) is CallScope:
+            if name in scope.bindings:
+                return scope.bindings[name]
+            scope = scope.parent
+        value = scope[name]
+        if self.recordings:
+            self.recordings[-1].reads.setdefault(name, value)
+        return value
+
+    def evaluate(self, node, scope):
+        if isinstance(node, Number):
+            return node
+        if isinstance(node, Reference):
+            return self.lookup(scope, node.name)
+        if type(scope) is CallScope:
+            return self.compute(node, scope)
+        entry = self.entries.get((id(node), id(scope)))
+        if entry is not None and entry.node is node and entry.scope is scope and self.valid(entry):
+            self.hits += 1
+            for name, function in entry.recording.writes:
+                if bound(scope, name) is not function:
+                    scope[name] = function
+            if self.recordings:
+                self.recordings[-1].merge(entry.recording)
+            return entry.value
+        self.misses += 1
+        recording = Recording()
+        self.recordings.append(recording)
+        # the clock before computing: a node that rebinds a name it read
+        # changes the clock itself, and must be checked again next time
+        clock = ReactiveScope.clock
+        try:
+            value = self.compute(node, scope)
+        finally:
+            self.recordings.pop()
+        if self.recordings:
+            self.recordings[-1].merge(recording)
+        if not recording.effects:
+            self.entries[(id(node), id(scope))] = Entry(node, scope, value, recording, clock)
+        return value
+
+    def effect(self):
+        if self.recordings:
+            self.recordings[-1].effects = True
+
+    def compute(self, node, scope):
+        evaluate = self.evaluate
+        if isinstance(node, BinaryOperation):
+            lhs = evaluate(node.lhs, scope)
+            if (node.op == '&&' or node.op == '||') and short_circuit():
+                if bool(lhs.value) == (node.op == '||'):
+                    return box(lhs.value)
+                return box(evaluate(node.rhs, scope).value)
+            rhs = evaluate(node.rhs, scope)
+            if node.op in EAGER_LOGIC:
+                return box(EAGER_LOGIC[node.op](lhs.value, rhs))
+            return box(BINARY_OPS[node.op](lhs.value, rhs.value))
+        if isinstance(node, UnaryOperation):
+            return box(UNARY_OPS[node.op](evaluate(node.expr, scope).value))
+        if isinstance(node, FunctionCall):
+            func = evaluate(node.fun_expr, scope)
+            f_scope = CallScope(scope)
+            for arg, val in zip(func.args, [evaluate(expr, f_scope) for expr in node.args]):
+                f_scope[arg] = val
+            return evaluate(func.body, f_scope)
+        if isinstance(node, ExprList):
+            cur = None
+            for expr in node.exprs or []:
+                cur = evaluate(expr, scope)
+            return cur
+        if isinstance(node, Conditional):
+            if evaluate(node.condition, scope).value:
+                return evaluate(node.if_true, scope)
+            return evaluate(node.if_false, scope)
+        if isinstance(node, Function):
+            return evaluate(node.body, scope)
+        if isinstance(node, FunctionDefinition):
+            scope[node.name] = node.function
+            # a definition in a call is gone with it, others are
+            # repeated when the cached result is used again
+            if type(scope) is not CallScope and self.recordings:
+                self.recordings[-1].writes.append((node.name, node.function))
+            return node.function
+        self.effect()
+        if isinstance(node, Print):
+            obj = evaluate(node.expr, scope)
+            current_io().write(obj.value)
+            return obj
+        if isinstance(node, Read):
+            scope[node.name] = value = box(current_io().read())
+            return value
+        raise TypeError("cannot evaluate {}".format(type(node).__name__))
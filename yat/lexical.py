@@ -0,0 +1,387 @@
+from yat.model import *
+from yat.model import _UNBOUND
+from yat.compiler import BINARY_OPS, EAGER_LOGIC, UNARY_OPS, _TailCall
+
+
+class Cell:
+    """
+        a variable of a frame that functions made in the frame read:
+        they keep the cell, so they see what is bound to it later on
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value=_UNBOUND):
+        self.value = value
+
+
+class Closure(Function):
+    """
+        a function value: the Function it was made from, its compiled
+        body, the cells of the free names it captured and the global
+        scope it was made in
+    """
+    __slots__ = ('code', 'cells', 'scope')
+
+    def __init__(self, function, code, cells, scope):
+        self.args = function.args
+        self.body = function.body
+        self.code = code
+        self.cells = cells
+        self.scope = scope
+
+
+class Code:
+    """
+        compiled body of a function with its frame layout: the unbound
+        slots to start its own names with, the (slot, is cell) of every argument
+        and the slots of its own names that are cells
+    """
+    __slots__ = ('body', 'blank', 'args', 'cells')
+
+    def __init__(self, body, blank, args, cells):
+        self.body = body
+        self.blank = blank
+        self.args = args
+        self.cells = cells
+
+
+class Scanner:
+    """
+        the names a function body binds, the names it reads and the
+        functions made in it, whose bodies are scopes of their own
+    """
+    def __init__(self, args):
+        self.own = dict.fromkeys(args)
+        self.reads = set()
+        self.nested = []
+
+    def visit(self, obj):
+        obj.access(self)
+        return self
+
+    def visit_number(self, num):
+        pass
+
+    def visit_reference(self, ref):
+        self.reads.add(ref.name)
+
+    def visit_read(self, rd):
+        self.own.setdefault(rd.name)
+
+    def visit_function(self, function):
+        self.nested.append(function)
+
+    def visit_definition(self, f_def):
+        self.own.setdefault(f_def.name)
+        f_def.function.access(self)
+
+    def visit_exprlist(self, expr_list):
+        for expr in expr_list.exprs or []:
+            expr.access(self)
+
+    def visit_conditional(self, cond):
+        cond.condition.access(self)
+        cond.if_true.access(self)
+        cond.if_false.access(self)
+
+    def visit_print(self, prnt):
+        prnt.expr.access(self)
+
+    def visit_call(self, call):
+        call.fun_expr.access(self)
+        for arg in call.args:
+            arg.access(self)
+
+    def visit_binary(self, bin_op):
+        bin_op.lhs.access(self)
+        bin_op.rhs.access(self)
+
+    def visit_unary(self, un_op):
+        un_op.expr.access(self)
+
+
+class Layout:
+    """
+        frame of a function made inside the function outer is the layout
+        of, or at top level when outer is None. Slot 0 holds the global
+        scope, then come the names the function binds itself and the
+        cells of the free names outer can give it; any other name is
+        global. Own names read by functions made in this one live in
+        cells too.
+    """
+    def __init__(self, own, free, inner, outer):
+        self.slots = {name: slot for slot, name in enumerate(own, 1)}
+        self.size = len(self.slots) + 1
+        self.captured = [name for name in sorted(free)
+                         if outer is not None and name in outer.slots]
+        for name in self.captured:
+            self.slots[name] = len(self.slots) + 1
+        self.cells = {name for name in own if name in inner}.union(self.captured)
+
+
+class LexicalCompiler:
+    """
+        compiles a tree into closures like Compiler, but with lexical
+        scoping: a function body sees its arguments, what it binds itself
+        and the names bound where it was made, whatever calls it. Call
+        arguments are evaluated by the caller.
+
+        Frames are flat lists laid out at compile time, and a function
+        value captures only the cells of its free names, so every name is
+        found in one step however deep the calls go. Names bound in no
+        enclosing function are global and looked up in the scope given
+        to the compiled program. Tail calls return to a trampoline as
+        in Compiler.
+    """
+    def __init__(self):
+        self.layout = None
+        self.tail = False
+        self.scans = dict()
+        self.adopted = dict()
+
+    def visit(self, obj):
+        return obj.access(self)
+
+    def scan(self, function):
+        """
+            (own names in slot order, free names, names read by the
+            functions made in the body) of a function
+        """
+        cached = self.scans.get(id(function))
+        if cached is None or cached[0] is not function:
+            scanner = Scanner(function.args).visit(function.body)
+            inner = set()
+            for nested in scanner.nested:
+                inner |= self.scan(nested)[1]
+            own = list(scanner.own)
+            free = (scanner.reads | inner).difference(own)
+            cached = self.scans[id(function)] = (function, own, free, inner)
+        return cached[1:]
+
+    def code(self, function):
+        """
+            compiles a function made in the current layout, returns its
+            Code and the slots of the cells it captures there
+        """
+        own, free, inner = self.scan(function)
+        layout = Layout(own, free, inner, self.layout)
+        outer = self.layout, self.tail
+        self.layout, self.tail = layout, True
+        try:
+            body = function.body.access(self)
+        finally:
+            self.layout, self.tail = outer
+        slots = layout.slots
+        code = Code(body, [_UNBOUND] * (layout.size - 1),
+                    [(slots[arg], arg in layout.cells) for arg in function.args],
+                    [slots[name] for name in own if name in layout.cells])
+        capture = [outer[0].slots[name] for name in layout.captured]
+        return code, capture
+
+    def adopt(self, function, scope):
+        """
+            a Closure for a plain Function put into the scope from
+            outside: it captures nothing, its free names are global
+        """
+        cached = self.adopted.get(id(function))
+        if cached is None or cached[0] is not function:
+            outer, self.layout = self.layout, None
+            try:
+                code = self.code(function)[0]
+            finally:
+                self.layout = outer
+            cached = self.adopted[id(function)] = (function, code)
+        return Closure(function, cached[1], [], scope)
+
+    def store(self, name):
+        """
+            returns a setter binding name in the frame it is called with
+        """
+        if self.layout is None:
+            def run(scope, value):
+                scope[name] = value
+            return run
+        slot = self.layout.slots[name]
+        if name in self.layout.cells:
+            def run(frame, value):
+                frame[slot].value = value
+        else:
+            def run(frame, value):
+                frame[slot] = value
+        return run
+
+    def value(self, node):
+        """
+            compiles an operand to a closure returning a raw int
+        """
+        self.tail = False
+        if isinstance(node, Number):
+            value = node.value
+            return lambda frame: value
+        if isinstance(node, BinaryOperation):
+            lhs = self.value(node.lhs)
+            if node.op in EAGER_LOGIC and not short_circuit():
+                op = EAGER_LOGIC[node.op]
+                rhs = node.rhs.access(self)
+                return lambda frame: op(lhs(frame), rhs(frame))
+            rhs = self.value(node.rhs)
+            if node.op == '&&' and short_circuit():
+                return lambda frame: lhs(frame) and rhs(frame)
+            if node.op == '||' and short_circuit():
+                return lambda frame: lhs(frame) or rhs(frame)
+            op = BINARY_OPS[node.op]
+            return lambda frame: op(lhs(frame), rhs(frame))
+        if isinstance(node, UnaryOperation):
+            op = UNARY_OPS[node.op]
+            expr = self.value(node.expr)
+            return lambda frame: op(expr(frame))
+        expr = node.access(self)
+        return lambda frame: expr(frame).value
+
+    def visit_number(self, num):
+        return lambda frame: num
+
+    def visit_reference(self, ref):
+        name = ref.name
+        if self.layout is None:
+            return lambda scope: scope[name]
+        slot = self.layout.slots.get(name)
+        if slot is None:
+            return lambda frame: frame[0][name]
+        if name in self.layout.cells:
+            def run(frame):
+                value = frame[slot].value
+                if value is _UNBOUND:
+                    raise NameError("name {!r} is not bound yet".format(name))
+                return value
+        else:
+            def run(frame):
+                value = frame[slot]
+                if value is _UNBOUND:
+                    raise NameError("name {!r} is not bound yet".format(name))
+                return value
+        return run
+
+    def visit_exprlist(self, expr_list):
+        if not expr_list.exprs:
+            return lambda frame: None
+        tail = self.tail
+        exprs = []
+        for expr in expr_list.exprs[:-1]:
+            self.tail = False
+            exprs.append(expr.access(self))
+        self.tail = tail
+        last = expr_list.exprs[-1].access(self)
+        if not exprs:
+            return last
+
+        def run(frame):
+            fuel = current_fuel()
+            if fuel is not None:
+                fuel.left -= 1
+                if fuel.left < 0:
+                    fuel.refill()
+            for expr in exprs:
+                expr(frame)
+            return last(frame)
+        return run
+
+    def visit_function(self, function):
+        # evaluating a Function node makes a function value
+        code, capture = self.code(function)
+        if self.layout is None:
+            return lambda scope: Closure(function, code, [], scope)
+        return lambda frame: Closure(function, code, [frame[slot] for slot in capture], frame[0])
+
+    def visit_definition(self, f_def):
+        make = f_def.function.access(self)
+        store = self.store(f_def.name)
+
+        def run(frame):
+            closure = make(frame)
+            store(frame, closure)
+            return closure
+        return run
+
+    def visit_conditional(self, cond):
+        tail = self.tail
+        condition = self.value(cond.condition)
+        self.tail = tail
+        if_true = cond.if_true.access(self)
+        self.tail = tail
+        if_false = cond.if_false.access(self)
+
+        def run(frame):
+            if condition(frame):
+                return if_true(frame)
+            return if_false(frame)
+        return run
+
+    def visit_print(self, prnt):
+        self.tail = False
+        expr = prnt.expr.access(self)
+
+        def run(frame):
+            obj = expr(frame)
+            current_io().write(obj.value)
+            return obj
+        return run
+
+    def visit_read(self, rd):
+        store = self.store(rd.name)
+
+        def run(frame):
+            obj = box(current_io().read())
+            store(frame, obj)
+            return obj
+        return run
+
+    def visit_call(self, call):
+        tail, self.tail = self.tail, False
+        fun_expr = call.fun_expr.access(self)
+        args = [arg.access(self) for arg in call.args]
+        adopt = self.adopt
+        top = self.layout is None
+
+        def run(frame):
+            fuel = current_fuel()
+            if fuel is not None:
+                fuel.left -= 1
+                if fuel.left < 0:
+                    fuel.refill()
+            func = fun_expr(frame)
+            vals = [expr(frame) for expr in args]
+            if type(func) is not Closure:
+                func = adopt(func, frame if top else frame[0])
+            code = func.code
+            new = [func.scope, *code.blank, *func.cells]
+            for slot in code.cells:
+                new[slot] = Cell()
+            for (slot, cell), val in zip(code.args, vals):
+                if cell:
+                    new[slot].value = val
+                else:
+                    new[slot] = val
+            if tail:
+                return _TailCall(code.body, new)
+            result = code.body(new)
+            while type(result) is _TailCall:
+                result = result.body(result.frame)
+            return result
+        return run
+
+    def visit_binary(self, bin_op):
+        value = self.value(bin_op)
+        return lambda frame: box(value(frame))
+
+    def visit_unary(self, un_op):
+        value = self.value(un_op)
+        return lambda frame: box(value(frame))
+
+
+def compile_lexical(node):
+    """
+        compiles a tree with lexical scoping into a closure taking the
+        global scope; Function nodes evaluate to Closures there
+    """
+    return LexicalCompiler().visit(node)
@@ -3,8 +3,13 @@
 # Шаблон для домашнѣго задания
 # Рѣализуйте мѣтоды с raise NotImplementedError
 
+import threading
+from contextvars import ContextVar
+
 
 class Operator:
+    __slots__ = ()
+
     def access(self, visitor):
         raise NotImplementedError
 
@@ -25,6 +30,8 @@ class Operator:
 
 
 class Scope:
+    __slots__ = ('__field', '__parent')
+
     def __getitem__(self, item):
         if item in self.__field:
             return self.__field[item]
@@ -38,9 +45,58 @@ class Scope:
         self.__parent = parent
 
 
+# what the slots of a Frame hold until their name is bound: None is
+# a value of its own, that of an empty body or a missing else branch
+_UNBOUND = object()
+
+
+class Frame(Scope):
+    """
+        scope of a compiled function call: names found by the resolver
+        live in a flat list of slots, everything else goes to extra
+    """
+    __slots__ = ('parent', 'slots', 'values', 'extra')
+
+    def __getitem__(self, item):
+        scope = self
+        while isinstance(scope, Frame):
+            slot = scope.slots.get(item)
+            if slot is not None and scope.values[slot] is not _UNBOUND:
+                value = scope.values[slot]
+                break
+            if scope.extra is not None and item in scope.extra:
+                return scope.extra[item]
+            scope = scope.parent
+        else:
+            value = scope[item]
+        # calling frames do not change while this one is alive,
+        # so the slot keeps what was found for the next lookups
+        slot = self.slots.get(item)
+        if slot is not None:
+            self.values[slot] = value
+        return value
+
+    def __setitem__(self, key, value):
+        slot = self.slots.get(key)
+        if slot is not None:
+            self.values[slot] = value
+        else:
+            if self.extra is None:
+                self.extra = dict()
+            self.extra[key] = value
+
+    def __init__(self, parent, slots):
+        self.parent = parent
+        self.slots = slots
+        self.values = [_UNBOUND] * len(slots)
+        self.extra = None
+
+
 class Number(Operator):
+    __slots__ = ('value',)
+
     def __init__(self, value):
-        self.value = int(value)
+        self.value = value if type(value) is int else int(value)
 
     def evaluate(self, scope=None):
         return self
@@ -58,11 +114,170 @@ class Number(Operator):
         return visitor.visit_number(self)
 
 
+_small_numbers = dict()
+
+
+def set_small_int_range(low, high):
+    """
+        makes box() share one Number for every value in [low, high]
+    """
+    global _small_numbers
+    _small_numbers = {value: Number(value) for value in range(low, high + 1)}
+
+
+def box(value):
+    """
+        Number for an int or bool result, shared for small values
+    """
+    number = _small_numbers.get(value)
+    if number is None:
+        return Number(value)
+    return number
+
+
+set_small_int_range(-5, 256)
+
+
+class ConsoleIO:
+    """
+        what Print and Read use by default: print() and input()
+    """
+    def write(self, value):
+        print(value)
+
+    def read(self):
+        return int(input())
+
+    def flush(self):
+        pass
+
+
+_io = ContextVar('yat_io', default=ConsoleIO())
+
+
+def set_io(stream):
+    """
+        makes Print and Read go through stream, returns the previous one.
+        The setting is local to the thread, or to the asyncio task, that
+        makes it; new threads start with ConsoleIO.
+    """
+    previous = _io.get()
+    _io.set(stream)
+    return previous
+
+
+def current_io():
+    return _io.get()
+
+
+_short_circuit = True
+
+
+def set_short_circuit(enabled):
+    """
+        with True, the default, && and || skip their right operand when
+        the left one decides the result; False evaluates both, for code
+        that relies on the side effects of the right one. Compiled code
+        keeps the setting it was compiled with. Returns the previous one.
+    """
+    global _short_circuit
+    previous, _short_circuit = _short_circuit, enabled
+    return previous
+
+
+def short_circuit():
+    return _short_circuit
+
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+
+class Fuel:
+    """
+        steps the runs made inside a with block may take, in the thread
+        or asyncio task that entered it:
+
+            with Fuel(10 ** 6):
+                program.evaluate(scope)
+
+        Every FunctionCall and every ExprList evaluated burns one step,
+        in evaluate(), in the compiled code of compile_tree() and
+        compile_lexical() and in StackEvaluator; the VM burns one per
+        call. After each `every` steps the checkpoint, if
+        any, is called with the fuel: a scheduler may wait there to
+        suspend the run and return to resume it, or raise to cancel it.
+        Past `limit` steps BudgetExceeded is raised. Runs outside any
+        Fuel burn nothing.
+    """
+    __slots__ = ('limit', 'checkpoint', 'every', 'used', 'stretch', 'left', 'token')
+
+    def __init__(self, limit=None, checkpoint=None, every=1000):
+        self.limit = limit
+        self.checkpoint = checkpoint
+        self.every = every
+        self.used = 0
+        self.stretch = self.left = self.next_stretch()
+        self.token = None
+
+    def __enter__(self):
+        global _fuels
+        with _fuels_lock:
+            _fuels += 1
+        self.token = _fuel.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        global _fuels
+        _fuel.reset(self.token)
+        with _fuels_lock:
+            _fuels -= 1
+        return False
+
+    def next_stretch(self):
+        if self.limit is None:
+            return self.every
+        return min(self.every, self.limit - self.used)
+
+    def spent(self):
+        return self.used + self.stretch - max(self.left, 0)
+
+    def refill(self):
+        """
+            called by the step that finds left below zero
+        """
+        self.used += self.stretch
+        self.stretch = self.left = 0
+        if self.limit is not None and self.used >= self.limit:
+            raise BudgetExceeded("run took more than {} steps".format(self.limit))
+        if self.checkpoint is not None:
+            self.checkpoint(self)
+        self.stretch = self.next_stretch()
+        self.left = self.stretch - 1
+
+
+_fuel = ContextVar('yat_fuel', default=None)
+# Fuels in force in any thread, so that evaluate() skips the lookup
+# of its own while there are none
+_fuels = 0
+_fuels_lock = threading.Lock()
+# the Fuel in force, or None; a builtin method, so cheap to call
+current_fuel = _fuel.get
+
+
 class ExprList(Operator):
+    __slots__ = ('exprs',)
+
     def __init__(self, exprs):
         self.exprs = exprs
 
     def evaluate(self, scope=None):
+        if _fuels:
+            fuel = _fuel.get()
+            if fuel is not None:
+                fuel.left -= 1
+                if fuel.left < 0:
+                    fuel.refill()
         cur = None
         if self.exprs:
             for expr in self.exprs:
@@ -77,6 +292,8 @@ class ExprList(Operator):
 
 
 class Function(Operator):
+    __slots__ = ('args', 'body')
+
     def __init__(self, args, body):
         self.args = args
         self.body = ExprList(body)
@@ -89,6 +306,8 @@ class Function(Operator):
 
 
 class FunctionDefinition(Operator):
+    __slots__ = ('name', 'function')
+
     def __init__(self, name, function):
         self.name = name
         self.function = function
@@ -102,6 +321,8 @@ class FunctionDefinition(Operator):
 
 
 class Conditional(Operator):
+    __slots__ = ('condition', 'if_true', 'if_false')
+
     def __init__(self, condition, if_true, if_false=None):
         self.condition = condition
         self.if_true = ExprList(if_true)
@@ -118,12 +339,14 @@ class Conditional(Operator):
 
 
 class Print(Operator):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
 
     def evaluate(self, scope=None):
         obj = self.expr.evaluate(scope)
-        print(obj.value)
+        _io.get().write(obj.value)
         return obj
 
     def access(self, visitor):
@@ -131,11 +354,13 @@ class Print(Operator):
 
 
 class Read(Operator):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
     def evaluate(self, scope=None):
-        scope[self.name] = Number(int(input()))
+        scope[self.name] = box(_io.get().read())
         return scope[self.name]
 
     def access(self, visitor):
@@ -143,11 +368,19 @@ class Read(Operator):
 
 
 class FunctionCall(Operator):
+    __slots__ = ('fun_expr', 'args')
+
     def __init__(self, fun_expr, args):
         self.fun_expr = fun_expr
         self.args = args
 
     def evaluate(self, scope=None):
+        if _fuels:
+            fuel = _fuel.get()
+            if fuel is not None:
+                fuel.left -= 1
+                if fuel.left < 0:
+                    fuel.refill()
         func = self.fun_expr.evaluate(scope)
         f_scope = Scope(scope)
         for arg, val in zip(func.args,
@@ -160,6 +393,8 @@ class FunctionCall(Operator):
 
 
 class Reference(Operator):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
@@ -177,19 +412,21 @@ class Reference(Operator):
 
 
 class BinaryOperation(Operator):
-    __ops = {'+': lambda x, y: Number(x.value + y.value),
-             '-': lambda x, y: Number(x.value - y.value),
-             '*': lambda x, y: Number(x.value * y.value),
-             '/': lambda x, y: Number(x.value // y.value),
-             '%': lambda x, y: Number(x.value % y.value),
-             '==': lambda x, y: Number(x.value == y.value),
-             '!=': lambda x, y: Number(x.value != y.value),
-             '<': lambda x, y: Number(x.value < y.value),
-             '>': lambda x, y: Number(x.value > y.value),
-             '<=': lambda x, y: Number(x.value <= y.value),
-             '>=': lambda x, y: Number(x.value >= y.value),
-             '&&': lambda x, y: Number(x.value and y.value),
-             '||': lambda x, y: Number(x.value or y.value),
+    __slots__ = ('lhs', 'rhs', 'op')
+
+    __ops = {'+': lambda x, y: box(x.value + y.value),
+             '-': lambda x, y: box(x.value - y.value),
+             '*': lambda x, y: box(x.value * y.value),
+             '/': lambda x, y: box(x.value // y.value),
+             '%': lambda x, y: box(x.value % y.value),
+             '==': lambda x, y: box(x.value == y.value),
+             '!=': lambda x, y: box(x.value != y.value),
+             '<': lambda x, y: box(x.value < y.value),
+             '>': lambda x, y: box(x.value > y.value),
+             '<=': lambda x, y: box(x.value <= y.value),
+             '>=': lambda x, y: box(x.value >= y.value),
+             '&&': lambda x, y: box(x.value and y.value),
+             '||': lambda x, y: box(x.value or y.value),
              }
 
     def __init__(self, lhs, op, rhs):
@@ -198,16 +435,24 @@ class BinaryOperation(Operator):
         self.op = op
 
     def evaluate(self, scope=None):
-        return self.__ops[self.op](self.lhs.evaluate(scope),
-                                   self.rhs.evaluate(scope))
+        op = self.op
+        if (op == '&&' or op == '||') and _short_circuit:
+            lhs = self.lhs.evaluate(scope)
+            if bool(lhs.value) == (op == '||'):
+                return box(lhs.value)
+            return box(self.rhs.evaluate(scope).value)
+        return self.__ops[op](self.lhs.evaluate(scope),
+                              self.rhs.evaluate(scope))
 
     def access(self, visitor):
         return visitor.visit_binary(self)
 
 
 class UnaryOperation(Operator):
-    __ops = {'!': lambda x: Number(not x.value),
-             '-': lambda x: Number(-x.value)
+    __slots__ = ('op', 'expr')
+
+    __ops = {'!': lambda x: box(not x.value),
+             '-': lambda x: box(-x.value)
              }
 
     def __init__(self, op, expr):
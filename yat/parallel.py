@@ -0,0 +1,201 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from yat.model import *
+from yat.compiler import BINARY_OPS, EAGER_LOGIC, UNARY_OPS, compile_tree
+from yat.effects import MemoCache
+from yat.folder import count_nodes
+from yat.resolver import binds_names
+
+
+def _evaluate_remote(expr, bindings):
+    """
+        runs in a worker process: evaluates a pure argument
+        in a scope holding only the names it reads. The result goes
+        back as it is, a Number, a Function or None
+    """
+    scope = Scope()
+    for name, value in bindings.items():
+        scope[name] = value
+    return compile_tree(expr)(scope)
+
+
+def _run_threads(jobs):
+    """
+        runs each job in a thread of its own, returns their results
+        in order or raises the first exception one of them raised
+    """
+    results = [None] * len(jobs)
+    errors = []
+
+    def run(index, job):
+        try:
+            results[index] = job()
+        except BaseException as error:
+            errors.append(error)
+    # each thread runs in a copy of the caller's context, so it sees
+    # the I/O the caller set
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(run, index, job))
+               for index, job in enumerate(jobs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class ParallelEvaluator:
+    """
+        evaluates a tree like Operator.evaluate, except that the
+        side-effect free arguments of a call that are estimated to cost
+        more than threshold run concurrently. The first levels of such
+        calls are split further in threads of this process, deeper ones
+        go to worker processes, which get the argument and the values of
+        the names it reads, and nothing else of the scope.
+
+        An argument costs its size plus call_cost for every function it
+        may call, and recursive_cost more if one of them can recurse.
+        Arguments are not split when one of them binds a name.
+    """
+    call_cost = 100
+    recursive_cost = 10 ** 6
+
+    def __init__(self, workers=None, threshold=10 ** 4, depth=None, executor=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold = threshold
+        if depth is None:
+            depth = (self.workers - 1).bit_length()
+        self.depth = depth
+        self.executor = executor
+        self.memo = MemoCache()
+        self.wrappers = dict()
+        self.dispatched = 0
+        self.lock = threading.Lock()
+
+    def evaluate(self, node, scope):
+        if self.executor is not None:
+            return self.eval(node, scope, 0)
+        with ProcessPoolExecutor(self.workers) as self.executor:
+            # start the workers before any thread of ours runs
+            self.executor.submit(int).result()
+            try:
+                return self.eval(node, scope, 0)
+            finally:
+                self.executor = None
+
+    def wrapper(self, expr):
+        cached = self.wrappers.get(id(expr))
+        if cached is None or cached[0] is not expr:
+            cached = (expr, Function([], [expr]))
+            self.wrappers[id(expr)] = cached
+        return cached[1]
+
+    def bindings(self, expr, scope):
+        """
+            the names a pure argument reads with their values when it is
+            worth running elsewhere, None otherwise
+        """
+        if isinstance(expr, (Number, Reference)):
+            return None
+        try:
+            depends = self.memo.depends(self.wrapper(expr), scope)
+        except (KeyError, TypeError):
+            return None
+        if depends is None:
+            return None
+        names, callees = depends
+        functions = {names[index]: function for index, function in callees.items()}
+        if self.cost(expr, functions) < self.threshold:
+            return None
+        return {name: scope[name] for name in names}
+
+    def cost(self, expr, functions):
+        """
+            functions maps the names the argument may call to their values
+        """
+        total = count_nodes(expr) + self.call_cost * len(functions)
+        for function in functions.values():
+            if self.recursive(function, functions):
+                return total + self.recursive_cost
+        return total
+
+    def recursive(self, function, functions):
+        seen = set()
+        todo = [function]
+        while todo:
+            for name in self.memo.summary(todo.pop()).callees:
+                callee = functions.get(name)
+                if callee is function:
+                    return True
+                if callee is not None and name not in seen:
+                    seen.add(name)
+                    todo.append(callee)
+        return False
+
+    def arguments(self, args, scope, level):
+        remote = [None] * len(args)
+        if not binds_names(args):
+            remote = [self.bindings(arg, scope) for arg in args]
+        heavy = [i for i, bindings in enumerate(remote) if bindings is not None]
+        if not heavy:
+            return [self.eval(arg, scope, level) for arg in args]
+        values = [None] * len(args)
+        if len(heavy) > 1 and level < self.depth:
+            results = _run_threads([lambda arg=args[i]: self.eval(arg, scope, level + 1)
+                                    for i in heavy])
+        else:
+            with self.lock:
+                self.dispatched += len(heavy)
+            futures = [self.executor.submit(_evaluate_remote, args[i], remote[i])
+                       for i in heavy]
+            results = [future.result() for future in futures]
+        for i, value in zip(heavy, results):
+            values[i] = value
+        for i, arg in enumerate(args):
+            if remote[i] is None:
+                values[i] = self.eval(arg, scope, level)
+        return values
+
+    def eval(self, node, scope, level):
+        if isinstance(node, Number):
+            return node
+        if isinstance(node, Reference):
+            return scope[node.name]
+        if isinstance(node, BinaryOperation):
+            lhs = self.eval(node.lhs, scope, level)
+            if (node.op == '&&' or node.op == '||') and short_circuit():
+                if bool(lhs.value) == (node.op == '||'):
+                    return box(lhs.value)
+                return box(self.eval(node.rhs, scope, level).value)
+            rhs = self.eval(node.rhs, scope, level)
+            if node.op in EAGER_LOGIC:
+                return box(EAGER_LOGIC[node.op](lhs.value, rhs))
+            return box(BINARY_OPS[node.op](lhs.value, rhs.value))
+        if isinstance(node, UnaryOperation):
+            return box(UNARY_OPS[node.op](self.eval(node.expr, scope, level).value))
+        if isinstance(node, FunctionCall):
+            func = self.eval(node.fun_expr, scope, level)
+            f_scope = Scope(scope)
+            for arg, val in zip(func.args, self.arguments(node.args, f_scope, level)):
+                f_scope[arg] = val
+            return self.eval(func.body, f_scope, level)
+        if isinstance(node, ExprList):
+            cur = None
+            for expr in node.exprs or []:
+                cur = self.eval(expr, scope, level)
+            return cur
+        if isinstance(node, Conditional):
+            if self.eval(node.condition, scope, level).value:
+                return self.eval(node.if_true, scope, level)
+            return self.eval(node.if_false, scope, level)
+        if isinstance(node, Function):
+            return self.eval(node.body, scope, level)
+        if isinstance(node, Print):
+            obj = self.eval(node.expr, scope, level)
+            current_io().write(obj.value)
+            return obj
+        return node.evaluate(scope)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+
+from yat.model import *
+from yat.folder import ConstantFolder
+from yat.printer import PrettyPrinter
+from yat.streams import BufferedIO
+from yat.traversal import children
+
+
+class ProgramGenerator:
+    """
+        random programs built from the model classes, the same for the
+        same seed: deep arithmetic, wide conditionals, recursive calls
+        and deep chains of scopes. Values stay small, products are
+        taken modulo a prime and nothing divides by zero, so every
+        program runs to the end.
+    """
+    modulus = 1009
+
+    def __init__(self, seed):
+        self.rnd = random.Random(seed)
+
+    def leaf(self, names):
+        if names and self.rnd.random() < 0.6:
+            return Reference(self.rnd.choice(names))
+        return Number(self.rnd.randint(-9, 9))
+
+    def grow(self, node, names):
+        """
+            node under one more operation, with a leaf on the other side
+        """
+        rnd = self.rnd
+        op = rnd.choice(['+', '-', '*', '%', '/', '==', '<', '>=', '&&', '||', '!', '-x'])
+        if op == '!':
+            return UnaryOperation('!', node)
+        if op == '-x':
+            return UnaryOperation('-', node)
+        if op == '*':
+            return BinaryOperation(BinaryOperation(node, '*', self.leaf(names)),
+                                   '%', Number(self.modulus))
+        if op == '%' or op == '/':
+            return BinaryOperation(node, op, Number(rnd.randint(2, 9)))
+        if rnd.random() < 0.5:
+            return BinaryOperation(self.leaf(names), op, node)
+        return BinaryOperation(node, op, self.leaf(names))
+
+    def expr(self, depth, names):
+        node = self.leaf(names)
+        for _ in range(depth):
+            node = self.grow(node, names)
+        return node
+
+    def arithmetic(self, depth):
+        """
+            def f(x, y, z) { <expression nested depth deep> }; and calls of f
+        """
+        names = ['x', 'y', 'z']
+        body = self.expr(depth, names)
+        exprs = [FunctionDefinition('f', Function(names, [body]))]
+        for _ in range(5):
+            exprs.append(FunctionCall(Reference('f'), [self.leaf([]) for _ in names]))
+        return ExprList(exprs)
+
+    def conditionals(self, width):
+        """
+            def pick(x) { if (x < k) { ... } else { ... }; ... }; with width
+            conditionals, and calls of pick over a range of x
+        """
+        names = ['x']
+        body = []
+        for k in range(width):
+            cond = BinaryOperation(Reference('x'), self.rnd.choice(['<', '==', '>=']), Number(k))
+            branches = [[self.expr(self.rnd.randint(1, 4), names)] for _ in range(2)]
+            if self.rnd.random() < 0.1:
+                branches[0].insert(0, Print(Reference('x')))
+            body.append(Conditional(cond, *branches))
+        exprs = [FunctionDefinition('pick', Function(names, body))]
+        for x in range(-1, width + 1, max(1, width // 16)):
+            exprs.append(FunctionCall(Reference('pick'), [Number(x)]))
+        return ExprList(exprs)
+
+    def recursion(self, n):
+        """
+            a tail-recursive loop of n steps and a tree recursion, both
+            folding random arithmetic of their arguments into the result
+        """
+        step = BinaryOperation(self.expr(3, ['n', 'acc']), '%', Number(self.modulus))
+        loop = Function(['n', 'acc'],
+                        [Conditional(BinaryOperation(Reference('n'), '<', Number(1)),
+                                     [Reference('acc')],
+                                     [FunctionCall(Reference('loop'),
+                                                   [BinaryOperation(Reference('n'), '-', Number(1)),
+                                                    step])])])
+        leaf = self.expr(2, ['n'])
+
+        def tree_call(less):
+            return FunctionCall(Reference('tree'),
+                                [BinaryOperation(Reference('n'), '-', Number(less))])
+        tree = Function(['n'],
+                        [Conditional(BinaryOperation(Reference('n'), '<', Number(2)),
+                                     [leaf],
+                                     [BinaryOperation(
+                                         BinaryOperation(tree_call(1), '+', tree_call(2)),
+                                         '%', Number(self.modulus))])])
+        size = max(2, n.bit_length() + 2)
+        return ExprList([FunctionDefinition('loop', loop),
+                         FunctionDefinition('tree', tree),
+                         BinaryOperation(FunctionCall(Reference('loop'), [Number(n), Number(0)]),
+                                         '+', FunctionCall(Reference('tree'), [Number(size)]))])
+
+    def scopes(self, depth):
+        """
+            depth functions each defined in the body of the one before,
+            each called with an argument of its own, the innermost
+            reading names from all of the scopes above it
+        """
+        names = ['a{}'.format(level) for level in range(depth)]
+        body = [self.expr(4, [self.rnd.choice(names) for _ in range(8)])]
+        for level in reversed(range(depth)):
+            name = names[level]
+            inner = 'level{}'.format(level)
+            call = FunctionCall(Reference(inner),
+                                [self.expr(1, names[:level]) if level else self.leaf([])])
+            body = [FunctionDefinition(inner, Function([name], body)), call]
+        return ExprList(body)
+
+
+def generate(seed, scale=1):
+    """
+        {shape: program} of a seed; scale multiplies their sizes
+    """
+    generator = ProgramGenerator(seed)
+    return {'arithmetic': generator.arithmetic(200 * scale),
+            'conditionals': generator.conditionals(100 * scale),
+            'recursion': generator.recursion(200 * scale),
+            'scopes': generator.scopes(50 * scale)}
+
+
+def count_tree_nodes(node):
+    """
+        every node of a program, statements and functions included, as
+        reached through traversal.children; folder.count_nodes counts
+        only a node and the arithmetic operands below it
+    """
+    count = 0
+    todo = [node]
+    while todo:
+        count += 1
+        todo.extend(children(todo.pop()))
+    return count
+
+
+def evaluate(program):
+    with BufferedIO(io.StringIO(), io.StringIO()):
+        return program.evaluate(Scope())
+
+
+def fold(program):
+    return ConstantFolder().visit(program)
+
+
+def pretty_print(program):
+    PrettyPrinter(io.StringIO()).visit(program)
+
+
+TASKS = {'evaluate': evaluate,
+         'fold': fold,
+         'print': pretty_print}
+
+
+def run_suite(seed=0, scale=1, repeat=5, number=None):
+    """
+        a report of the best time of each task on each generated
+        program, and its throughput in nodes of the program per second.
+        Each time is of `number` runs, by default of as many as take
+        0.2 seconds, divided by their number.
+    """
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    results = dict()
+    for shape, program in generate(seed, scale).items():
+        nodes = count_tree_nodes(program)
+        for task, run in TASKS.items():
+            timer = timeit.Timer(lambda: run(program))
+            runs = number if number is not None else timer.autorange()[0]
+            seconds = min(timer.repeat(repeat=repeat, number=runs)) / runs
+            results['{}/{}'.format(task, shape)] = {'nodes': nodes,
+                                                    'seconds': seconds,
+                                                    'throughput': nodes / seconds}
+    return {'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'seed': seed,
+            'scale': scale,
+            'results': results}
+
+
+def load(path):
+    """
+        the reports kept in a history file, oldest first
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as stream:
+        return json.load(stream)
+
+
+def record(report, path):
+    """
+        appends a report to a history file
+    """
+    history = load(path)
+    history.append(report)
+    with open(path, 'w') as stream:
+        json.dump(history, stream, indent=1, sort_keys=True)
+    return history
+
+
+def compare(baseline, report, tolerance=0.1):
+    """
+        [(benchmark, old throughput, new throughput)] of the benchmarks
+        that got slower than baseline by more than tolerance. Reports of
+        other seeds or scales run other programs and are not comparable.
+    """
+    if (baseline['seed'], baseline['scale']) != (report['seed'], report['scale']):
+        raise ValueError("reports of seed {} scale {} and seed {} scale {} differ".format(
+            baseline['seed'], baseline['scale'], report['seed'], report['scale']))
+    slower = []
+    for name, result in sorted(report['results'].items()):
+        old = baseline['results'].get(name)
+        if old is not None and result['throughput'] < old['throughput'] * (1 - tolerance):
+            slower.append((name, old['throughput'], result['throughput']))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="throughput of evaluation, folding and "
+                                                 "pretty-printing on generated programs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, help="runs per timing, "
+                                                   "by default as many as take 0.2 seconds")
+    parser.add_argument('--history', help="JSON file to append the report to")
+    parser.add_argument('--compare', help="JSON history whose last report of the same "
+                                          "seed and scale is the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.seed, args.scale, args.repeat, args.number)
+    for name, result in sorted(report['results'].items()):
+        print("{:<20} {:7} nodes  {:9.5f}s  {:12.0f} nodes/s".format(
+            name, result['nodes'], result['seconds'], result['throughput']))
+    slower = []
+    if args.compare:
+        baselines = [old for old in load(args.compare)
+                     if (old['seed'], old['scale']) == (args.seed, args.scale)]
+        if baselines:
+            slower = compare(baselines[-1], report, args.tolerance)
+            for name, old, new in slower:
+                print("slower: {:<20} {:12.0f} -> {:12.0f} nodes/s".format(name, old, new))
+        else:
+            print("no baseline of seed {} scale {} in {}".format(args.seed, args.scale,
+                                                                 args.compare))
+    if args.history:
+        record(report, args.history)
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
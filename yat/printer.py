@@ -1,9 +1,25 @@
+import sys
+
 from yat.model import *
+from yat.traversal import Postorder, children_first, flatten
 
 
 class ExpressionTerm:
+    """
+        an expression as text, made from a rope of strings in nested
+        tuples built children first, so the depth of the expression
+        does not matter
+    """
+    def __init__(self):
+        self.walker = Postorder(self)
+
     def visit(self, obj):
-        return obj.access(self)
+        return flatten(self.walker.visit(obj))
+
+    def operand(self, expr, text):
+        if expr.is_below_zero():
+            return "(", text, ")"
+        return text
 
     def visit_number(self, num):
         return str(num.value)
@@ -11,80 +27,105 @@ class ExpressionTerm:
     def visit_reference(self, ref):
         return ref.name
 
-    def visit_unary(self, unary):
-        ret = unary.op + unary.expr.access(self)
+    @children_first
+    def visit_unary(self, unary, expr):
+        if unary.op == '-' and unary.expr.is_constant() and not unary.expr.is_below_zero():
+            # -3 reads back as a literal, not as an operation on one
+            expr = "(", expr, ")"
+        ret = unary.op, self.operand(unary.expr, expr)
         if unary.op == '-' or unary.expr.is_below_zero():
-            ret = "(" + ret + ")"
-        return ret
-
-    def visit_binary(self, binary):
-        left = binary.lhs.access(self)
-        right = binary.rhs.access(self)
-        if binary.lhs.is_below_zero():
-            left = "(" + left + ")"
-        if binary.rhs.is_below_zero():
-            right = "(" + right + ")"
-
-        return left + " " + binary.op + " " + right
-
-    def visit_call(self, call):
-        ret = call.fun_expr.access(self) + "(" + \
-              ", ".join(arg.access(self) for arg in call.args) + ")"
+            ret = "(", ret, ")"
         return ret
 
-    def visit_print(self, prnt):
-        return "print " + prnt.expr.access(self)
+    @children_first
+    def visit_binary(self, binary, lhs, rhs):
+        return (self.operand(binary.lhs, lhs), " " + binary.op + " ",
+                self.operand(binary.rhs, rhs))
+
+    @children_first
+    def visit_call(self, call, fun_expr, args):
+        ret = [fun_expr, "("]
+        for i, arg in enumerate(args):
+            if i:
+                ret.append(", ")
+            ret.append(arg)
+        ret.append(")")
+        return tuple(ret)
+
+    @children_first
+    def visit_print(self, prnt, expr):
+        return "print ", expr
 
     def visit_read(self, rd):
         return "read " + rd.name
 
 
 class PrettyPrinter:
-    expTrm = ExpressionTerm()
+    """
+        writes a tree to stream, sys.stdout by default, line by line.
+        Statements are walked with a stack of their own and carry their
+        depth, so nesting costs neither recursion nor copies of the
+        lines already made.
+    """
+    def __init__(self, stream=None):
+        self.expTrm = ExpressionTerm()
+        self.stream = stream
+        self.write = None
+        self.todo = []
+        self.depth = 0
+        self.indents = [""]
 
     def visit(self, obj):
-        for line in obj.access(self):
-            print(line)
-
-    def visit_number(self, num):
-        return [self.expTrm.visit(num) + ";"]
-
-    def visit_print(self, prnt):
-        return [self.expTrm.visit(prnt) + ";"]
-
-    def visit_read(self, rd):
-        return [self.expTrm.visit(rd) + ';']
+        stream = self.stream if self.stream is not None else sys.stdout
+        self.write = stream.write
+        self.walk(obj)
+
+    def walk(self, obj):
+        self.todo = [(0, obj)]
+        while self.todo:
+            self.depth, item = self.todo.pop()
+            if isinstance(item, str):
+                self.line(None, item)
+            else:
+                item.access(self)
+
+    def indent(self):
+        depth = self.depth
+        while len(self.indents) <= depth:
+            self.indents.append(self.indents[-1] + "\t")
+        return self.indents[depth]
+
+    def line(self, node, text):
+        self.write(self.indent() + text + "\n")
+
+    def expression(self, node):
+        self.write(self.indent() + self.expTrm.visit(node) + ";\n")
+
+    visit_number = expression
+    visit_print = expression
+    visit_read = expression
+    visit_reference = expression
+    visit_binary = expression
+    visit_unary = expression
+    visit_call = expression
 
     def visit_conditional(self, cond):
-        ret = ["if (" + self.expTrm.visit(cond.condition) + ") {"] + \
-              cond.if_true.access(self)
+        depth = self.depth
+        self.line(cond, "if (" + self.expTrm.visit(cond.condition) + ") {")
+        self.todo.append((depth, "};"))
         if cond.if_false.list_exists():
-            ret += ["} else {"] + cond.if_false.access(self)
-        ret += ["};"]
-        return ret
+            self.todo.append((depth, cond.if_false))
+            self.todo.append((depth, "} else {"))
+        self.todo.append((depth, cond.if_true))
 
     def visit_definition(self, defin):
-        ret = ["def " + defin.name + "("
-               + ", ".join(defin.function.args)
-               + ") {"]
-        ret += defin.function.body.access(self) + ["};"]
-        return ret
+        depth = self.depth
+        self.line(defin, "def " + defin.name + "("
+                  + ", ".join(defin.function.args) + ") {")
+        self.todo.append((depth, "};"))
+        self.todo.append((depth, defin.function.body))
 
     def visit_exprlist(self, exprlist):
-        ret = []
-        for line in exprlist.exprs:
-            ret += line.access(self)
-        return ["\t" + line for line in ret]
-
-    def visit_reference(self, ref):
-        return [self.expTrm.visit(ref) + ";"]
-
-    def visit_binary(self, binary):
-        return [self.expTrm.visit(binary) + ";"]
-
-    def visit_unary(self, unary):
-        return [self.expTrm.visit(unary) + ';']
-
-    def visit_call(self, call):
-        return [self.expTrm.visit(call) + ";"]
-
+        depth = self.depth + 1
+        for expr in reversed(exprlist.exprs or []):
+            self.todo.append((depth, expr))
@@ -0,0 +1,229 @@
+import time
+
+from yat.model import *
+from yat.printer import PrettyPrinter
+
+
+NODE_CLASSES = [Number, ExprList, Function, FunctionDefinition, Conditional,
+                Print, Read, FunctionCall, Reference, BinaryOperation,
+                UnaryOperation]
+
+ROOT = 'yat'
+
+
+class Stats:
+    """
+        counters of a node or of a named function; time and allocations
+        include everything evaluated inside, counted once for recursion
+    """
+    __slots__ = ('key', 'calls', 'time', 'self_time', 'allocations', 'active')
+
+    def __init__(self, key):
+        self.key = key
+        self.calls = 0
+        self.time = 0.0
+        self.self_time = 0.0
+        self.allocations = 0
+        self.active = 0
+
+
+class Profiler:
+    """
+        instruments evaluate() of every node class while enabled and
+        records calls, time and Numbers allocated per node and per
+        function called by name. Disabled, the classes are left exactly
+        as they were, so it costs nothing:
+
+            with Profiler() as profiler:
+                program.evaluate(scope)
+            profiler.write_collapsed(open('yat.folded', 'w'))
+            print('\\n'.join(profiler.annotate(program)))
+
+        Only the tree walker is instrumented; compiled closures and the
+        VM are not.
+    """
+    active = None
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.nodes = dict()
+        self.functions = dict()
+        self.stacks = dict()
+        self.frames = []
+        self.calls = []
+        self.allocations = 0
+        self.originals = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+        return False
+
+    def enable(self):
+        if Profiler.active is not None:
+            raise RuntimeError("another Profiler is enabled")
+        Profiler.active = self
+        self.originals = {cls: cls.evaluate for cls in NODE_CLASSES}
+        self.originals[None] = Number.__init__
+        for cls in NODE_CLASSES:
+            cls.evaluate = self.wrap(cls.evaluate, cls)
+        init = Number.__init__
+
+        def counting_init(number, value):
+            self.allocations += 1
+            init(number, value)
+        Number.__init__ = counting_init
+
+    def disable(self):
+        if Profiler.active is not self:
+            return
+        for cls, evaluate in self.originals.items():
+            if cls is not None:
+                cls.evaluate = evaluate
+        Number.__init__ = self.originals[None]
+        self.originals = None
+        Profiler.active = None
+
+    def stats(self, table, key, obj):
+        entry = table.get(key)
+        if entry is None or entry.key is not obj:
+            entry = table[key] = Stats(obj)
+        return entry
+
+    def wrap(self, evaluate, cls):
+        profiler = self
+        clock = self.clock
+        frames = self.frames
+        calls = self.calls
+        nodes = self.nodes
+
+        def profiled(node, scope=None):
+            stats = profiler.stats(nodes, id(node), node)
+            stats.calls += 1
+            stats.active += 1
+            name = None
+            if not frames:
+                name = ROOT
+            elif cls is Function and calls and not calls[-1][1]:
+                # the body of the call whose arguments are evaluated
+                calls[-1][1] = True
+                name = calls[-1][0]
+            if cls is FunctionCall:
+                fun_expr = node.fun_expr
+                calls.append([fun_expr.name if isinstance(fun_expr, Reference)
+                              else '<anonymous>', False])
+            function = None
+            if name is not None:
+                function = profiler.stats(profiler.functions, name, name)
+                function.calls += 1
+                function.active += 1
+                frames.append([name, 0.0])
+            allocated = profiler.allocations
+            start = clock()
+            try:
+                return evaluate(node, scope)
+            finally:
+                elapsed = clock() - start
+                allocations = profiler.allocations - allocated
+                stats.active -= 1
+                if not stats.active:
+                    stats.time += elapsed
+                    stats.allocations += allocations
+                if cls is FunctionCall:
+                    calls.pop()
+                if function is not None:
+                    profiler.leave(function, elapsed, allocations)
+        return profiled
+
+    def leave(self, function, elapsed, allocations):
+        frames = self.frames
+        stack = ';'.join(frame[0] for frame in frames)
+        own = elapsed - frames.pop()[1]
+        if frames:
+            frames[-1][1] += elapsed
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + own
+        function.self_time += own
+        function.active -= 1
+        if not function.active:
+            function.time += elapsed
+            function.allocations += allocations
+
+    def write_collapsed(self, stream):
+        """
+            writes one 'frame;frame;frame microseconds' line per stack,
+            the input format of flamegraph.pl and speedscope
+        """
+        for stack, own in sorted(self.stacks.items()):
+            micros = int(round(own * 1e6))
+            if micros:
+                stream.write("{} {}\n".format(stack, micros))
+
+    def report(self, limit=20):
+        """
+            the named functions by time, as lines of text
+        """
+        lines = ["{:<20} {:>9} {:>11} {:>11} {:>9}".format(
+            "function", "calls", "total ms", "self ms", "numbers")]
+        entries = sorted(self.functions.values(), key=lambda entry: -entry.time)
+        for entry in entries[:limit]:
+            lines.append("{:<20} {:>9} {:>11.3f} {:>11.3f} {:>9}".format(
+                entry.key, entry.calls, entry.time * 1e3, entry.self_time * 1e3,
+                entry.allocations))
+        return lines
+
+    def annotate(self, node, hot=0.05):
+        """
+            node printed like PrettyPrinter, each line prefixed by the
+            calls and time of the node it starts; lines taking at least
+            hot of the total time are marked with '>'
+        """
+        root = self.functions.get(ROOT)
+        total = root.time if root is not None and root.time else None
+        lines = []
+        for stats, text in Annotator(self.nodes).visit(node):
+            if stats is None or not stats.calls:
+                lines.append("{:>10} {:>11} {:>6}   {}".format("", "", "", text))
+                continue
+            share = stats.time / total if total else 0.0
+            lines.append("{:>10} {:>9.3f}ms {:>5.1f}% {} {}".format(
+                stats.calls, stats.time * 1e3, share * 100,
+                '>' if share >= hot else ' ', text))
+        return lines
+
+
+class Annotator(PrettyPrinter):
+    """
+        PrettyPrinter layout as (stats of the node, text) pairs
+    """
+    def __init__(self, nodes):
+        PrettyPrinter.__init__(self)
+        self.nodes = nodes
+        self.lines = []
+
+    def visit(self, obj):
+        self.lines = []
+        self.walk(obj)
+        return self.lines
+
+    def line(self, node, text):
+        stats = self.nodes.get(id(node))
+        if stats is not None and stats.key is not node:
+            stats = None
+        self.lines.append((stats, self.indent() + text))
+
+    def expression(self, node):
+        self.line(node, self.expTrm.visit(node) + ";")
+
+    visit_number = expression
+    visit_print = expression
+    visit_read = expression
+    visit_reference = expression
+    visit_binary = expression
+    visit_unary = expression
+    visit_call = expression
+
+    def visit_function(self, function):
+        self.todo.append((self.depth, function.body))
@@ -0,0 +1,122 @@
+from yat.model import *
+from yat.model import _UNBOUND
+
+
+class Resolver:
+    """
+        maps the names used by a function body to slots of its frame:
+        the arguments first, then every name bound by a FunctionDefinition
+        or Read or referenced directly in the body
+    """
+    def __init__(self, args=(), references=True):
+        self.slots = dict()
+        self.references = references
+        for arg in args:
+            self.bind(arg)
+
+    def bind(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.slots)
+
+    def visit(self, obj):
+        obj.access(self)
+        return self.slots
+
+    def visit_number(self, num):
+        pass
+
+    def visit_reference(self, ref):
+        if self.references:
+            self.bind(ref.name)
+
+    def visit_function(self, function):
+        # evaluating a Function node runs its body in the current frame
+        function.body.access(self)
+
+    def visit_exprlist(self, expr_list):
+        for expr in expr_list.exprs or []:
+            expr.access(self)
+
+    def visit_definition(self, f_def):
+        self.bind(f_def.name)
+
+    def visit_read(self, rd):
+        self.bind(rd.name)
+
+    def visit_conditional(self, cond):
+        cond.condition.access(self)
+        cond.if_true.access(self)
+        cond.if_false.access(self)
+
+    def visit_print(self, prnt):
+        prnt.expr.access(self)
+
+    def visit_call(self, call):
+        call.fun_expr.access(self)
+        # arguments are evaluated in the frame of the callee, which is
+        # the same as evaluating them here unless they bind a name
+        if not binds_names(call.args):
+            for arg in call.args:
+                arg.access(self)
+
+    def visit_binary(self, bin_op):
+        bin_op.lhs.access(self)
+        bin_op.rhs.access(self)
+
+    def visit_unary(self, un_op):
+        un_op.expr.access(self)
+
+
+def resolve(function):
+    """
+        returns the slot layout of a function frame as a dict name -> slot
+    """
+    return Resolver(function.args).visit(function.body)
+
+
+def own_names(function):
+    """
+        the names a function frame binds itself rather than reads from
+        the calling frames: its arguments, definitions and reads
+    """
+    return list(Resolver(function.args, references=False).visit(function.body))
+
+
+def binds_names(exprs):
+    """
+        tells if evaluating exprs may bind a name in the current frame
+    """
+    resolver = Resolver(references=False)
+    for expr in exprs:
+        expr.access(resolver)
+    return bool(resolver.slots)
+
+
+def lookup(slots, name):
+    """
+        maps a name to a (depth, slot) pair. yat scoping is dynamic, so
+        only the current frame (depth 0) is known statically: a slot of a
+        name the frame does not bind itself is filled on the first read
+        from the calling frames and then serves as a cache for this frame
+        and the ones it calls. Outside of a function body every name is
+        (None, None) and is looked up through the scope chain.
+    """
+    if slots is not None and name in slots:
+        return 0, slots[name]
+    return None, None
+
+
+def tail_parent(frame, own, names):
+    """
+        a call in tail position of frame may hang its frame on the parent
+        of frame when every name frame binds (own, as (slot, name) pairs)
+        is rebound by the call arguments: nothing can read frame through
+        the new one then
+    """
+    if frame.extra is not None:
+        return frame
+    values = frame.values
+    for slot, name in own:
+        if values[slot] is not _UNBOUND and name not in names:
+            return frame
+    return frame.parent
@@ -0,0 +1,269 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from yat.model import *
+from yat.folder import ConstantFolder
+
+
+MAGIC = b'YAT\0'
+VERSION = 1
+
+# header: magic, version, number of strings, number of records, then the
+# string table padded to 4 bytes and the records as signed 32-bit words
+_header = struct.Struct('<4sHxxII')
+_size = struct.Struct('<I')
+
+NUMBER, BIG_NUMBER, REFERENCE, READ, PRINT, UNARY, BINARY, EXPRLIST, \
+    NO_EXPRLIST, FUNCTION, DEFINITION, CONDITIONAL, CALL, SHARED = range(14)
+
+_binary_ops = ['+', '-', '*', '/', '%', '==', '!=',
+               '<', '>', '<=', '>=', '&&', '||']
+_unary_ops = ['!', '-']
+
+
+class Encoder:
+    """
+        describes a node as (kind, payload, children); the payload is
+        a tuple of 32-bit ints (values, string indices, counts, op codes)
+    """
+    def __init__(self):
+        self.strings = dict()
+
+    def string(self, text):
+        if text not in self.strings:
+            self.strings[text] = len(self.strings)
+        return self.strings[text]
+
+    def visit_number(self, num):
+        if -2 ** 31 <= num.value < 2 ** 31:
+            return NUMBER, (num.value,), []
+        return BIG_NUMBER, (self.string(str(num.value)),), []
+
+    def visit_reference(self, ref):
+        return REFERENCE, (self.string(ref.name),), []
+
+    def visit_read(self, rd):
+        return READ, (self.string(rd.name),), []
+
+    def visit_print(self, prnt):
+        return PRINT, (), [prnt.expr]
+
+    def visit_unary(self, un_op):
+        return UNARY, (_unary_ops.index(un_op.op),), [un_op.expr]
+
+    def visit_binary(self, bin_op):
+        return BINARY, (_binary_ops.index(bin_op.op),), [bin_op.lhs, bin_op.rhs]
+
+    def visit_exprlist(self, expr_list):
+        if expr_list.exprs is None:
+            return NO_EXPRLIST, (), []
+        return EXPRLIST, (len(expr_list.exprs),), list(expr_list.exprs)
+
+    def visit_function(self, function):
+        args = [self.string(arg) for arg in function.args]
+        return FUNCTION, (len(args),) + tuple(args), [function.body]
+
+    def visit_definition(self, f_def):
+        return DEFINITION, (self.string(f_def.name),), [f_def.function]
+
+    def visit_conditional(self, cond):
+        return CONDITIONAL, (), [cond.condition, cond.if_true, cond.if_false]
+
+    def visit_call(self, call):
+        return CALL, (len(call.args),), [call.fun_expr] + list(call.args)
+
+
+def dumps(node):
+    """
+        serializes a tree to bytes: a header, a string table and the
+        nodes in post-order, so that loading needs no recursion. A node
+        reachable twice (a Function shared by several definitions) is
+        written once and then referred to by its post-order index.
+    """
+    encoder = Encoder()
+    words = array('i')
+    emitted = dict()
+    todo = [(node, None)]
+    while todo:
+        obj, described = todo.pop()
+        if described is not None:
+            emitted[id(obj)] = (len(emitted), obj)
+            words.append(described[0])
+            words.extend(described[1])
+            continue
+        seen = emitted.get(id(obj))
+        if seen is not None and seen[1] is obj:
+            words.extend((SHARED, seen[0]))
+            continue
+        kind, payload, children = obj.access(encoder)
+        todo.append((obj, (kind, payload)))
+        for child in reversed(children):
+            todo.append((child, None))
+    if sys.byteorder != 'little':
+        words.byteswap()
+    strings = []
+    for text in encoder.strings:
+        data = text.encode('utf-8')
+        strings.append(_size.pack(len(data)) + data)
+    table = b''.join(strings)
+    table += bytes(-len(table) % 4)
+    return b''.join([_header.pack(MAGIC, VERSION, len(encoder.strings), len(emitted)),
+                     table, words.tobytes()])
+
+
+def loads(data):
+    """
+        rebuilds a tree from anything supporting the buffer protocol,
+        an mmap included; raises ValueError on a foreign or stale format
+    """
+    if len(data) < _header.size:
+        raise ValueError("not a serialized yat program")
+    magic, version, n_strings, n_nodes = _header.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a serialized yat program")
+    if version != VERSION:
+        raise ValueError("serialized with format version {}, expected {}".format(
+            version, VERSION))
+    offset = _header.size
+    strings = []
+    with memoryview(data) as view:
+        for _ in range(n_strings):
+            size, = _size.unpack_from(data, offset)
+            offset += 4
+            strings.append(str(view[offset:offset + size], 'utf-8'))
+            offset += size
+        offset += -offset % 4
+        if (len(data) - offset) % 4:
+            raise ValueError("truncated serialized yat program")
+        try:
+            if sys.byteorder == 'little':
+                with view[offset:].cast('i') as words:
+                    return _build(words, strings, n_nodes)
+            words = array('i', view[offset:])
+            words.byteswap()
+            return _build(words, strings, n_nodes)
+        except IndexError:
+            raise ValueError("truncated serialized yat program")
+
+
+def _build(words, strings, n_nodes):
+    nodes = []
+    stack = []
+    pos = 0
+    end = len(words)
+    while pos < end:
+        kind = words[pos]
+        if kind == SHARED:
+            stack.append(nodes[words[pos + 1]])
+            pos += 2
+            continue
+        if kind == NUMBER:
+            node = Number(words[pos + 1])
+            pos += 2
+        elif kind == REFERENCE:
+            node = Reference(strings[words[pos + 1]])
+            pos += 2
+        elif kind == BINARY:
+            rhs = stack.pop()
+            node = BinaryOperation(stack.pop(), _binary_ops[words[pos + 1]], rhs)
+            pos += 2
+        elif kind == CALL:
+            count = words[pos + 1]
+            args = stack[len(stack) - count:]
+            del stack[len(stack) - count:]
+            node = FunctionCall(stack.pop(), args)
+            pos += 2
+        elif kind == EXPRLIST:
+            count = words[pos + 1]
+            exprs = stack[len(stack) - count:]
+            del stack[len(stack) - count:]
+            node = ExprList(exprs)
+            pos += 2
+        elif kind == CONDITIONAL:
+            if_false = stack.pop()
+            if_true = stack.pop()
+            node = Conditional(stack.pop(), if_true.exprs, if_false.exprs)
+            pos += 1
+        elif kind == UNARY:
+            node = UnaryOperation(_unary_ops[words[pos + 1]], stack.pop())
+            pos += 2
+        elif kind == NO_EXPRLIST:
+            node = ExprList(None)
+            pos += 1
+        elif kind == PRINT:
+            node = Print(stack.pop())
+            pos += 1
+        elif kind == READ:
+            node = Read(strings[words[pos + 1]])
+            pos += 2
+        elif kind == FUNCTION:
+            count = words[pos + 1]
+            args = [strings[i] for i in words[pos + 2:pos + 2 + count]]
+            node = Function(args, stack.pop().exprs)
+            pos += 2 + count
+        elif kind == DEFINITION:
+            node = FunctionDefinition(strings[words[pos + 1]], stack.pop())
+            pos += 2
+        elif kind == BIG_NUMBER:
+            node = Number(int(strings[words[pos + 1]]))
+            pos += 2
+        else:
+            raise ValueError("unknown record kind {} at word {}".format(kind, pos))
+        nodes.append(node)
+        stack.append(node)
+    if len(stack) != 1 or len(nodes) != n_nodes:
+        raise ValueError("truncated serialized yat program")
+    return stack[0]
+
+
+def dump(node, path):
+    data = dumps(node)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return loads(data)
+
+
+class ProgramCache:
+    """
+        keeps prepared programs on disk under a hash of their content,
+        so a process start loads them instead of rebuilding and folding
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        digest = hashlib.sha256(key).hexdigest()
+        return os.path.join(self.directory,
+                            "{}.v{}.yatc".format(digest, VERSION))
+
+    def get(self, key, build):
+        """
+            the program stored under key (bytes, such as the source text),
+            calling build() and storing its result on a miss
+        """
+        path = self.path(key)
+        try:
+            return load(path)
+        except (OSError, ValueError):
+            pass
+        node = build()
+        dump(node, path)
+        return node
+
+    def fold(self, node):
+        """
+            node simplified by ConstantFolder, cached by its serialized form
+        """
+        return self.get(dumps(node), lambda: ConstantFolder().visit(node))
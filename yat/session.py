@@ -0,0 +1,90 @@
+import asyncio
+import io
+import time
+
+from yat.model import *
+from yat.stackeval import StackEvaluator
+from yat.streams import BufferedIO
+
+
+class Interpreter:
+    """
+        a session running yat programs on its own: it owns the root scope
+        the programs bind their names in, the streams Print and Read go
+        through and the evaluator with its stacks, so sessions share
+        nothing but the trees they run. Evaluation never changes a tree,
+        a definition only binds the Function node in the session scope,
+        so one parsed program may be run by any number of sessions at once.
+
+            session = Interpreter(io.StringIO('5'), steps=10 ** 6)
+            session.evaluate(parse("read n; print n * 2;"))
+            session.output.getvalue()  # '10\\n'
+
+        Streams default to in-memory ones. A run gets at most `steps`
+        evaluator steps and `seconds` of time when they are given, and
+        raises BudgetExceeded otherwise; budgets are checked every
+        `every` steps, which is also how often evaluate_async() gives
+        the event loop to other tasks. The session stays usable after
+        a run fails, with whatever the run bound before.
+    """
+    def __init__(self, input=None, output=None, steps=None, seconds=None, every=1000):
+        self.input = input if input is not None else io.StringIO()
+        self.output = output if output is not None else io.StringIO()
+        self.io = BufferedIO(self.input, self.output)
+        self.scope = Scope()
+        self.steps = steps
+        self.seconds = seconds
+        self.every = every
+        self.evaluator = StackEvaluator()
+
+    def run(self, program):
+        """
+            a generator evaluating program in the session scope, stopping
+            every `every` steps; the value of the program is the value of
+            StopIteration
+        """
+        chunks = self.evaluator.steps(program, self.scope, self.every)
+        deadline = None if self.seconds is None else time.monotonic() + self.seconds
+        done = 0
+        previous = set_io(self.io)
+        try:
+            while True:
+                try:
+                    next(chunks)
+                except StopIteration as stop:
+                    return stop.value
+                done += self.every
+                if self.steps is not None and done >= self.steps:
+                    raise BudgetExceeded("run took more than {} steps".format(self.steps))
+                if deadline is not None and time.monotonic() > deadline:
+                    raise BudgetExceeded("run took more than {} seconds".format(self.seconds))
+                set_io(previous)
+                yield
+                previous = set_io(self.io)
+        finally:
+            chunks.close()
+            try:
+                self.io.flush()
+            finally:
+                set_io(previous)
+
+    def evaluate(self, program):
+        chunks = self.run(program)
+        while True:
+            try:
+                next(chunks)
+            except StopIteration as stop:
+                return stop.value
+
+    async def evaluate_async(self, program):
+        """
+            evaluate() for asyncio: awaits between chunks of steps so
+            other tasks of the loop run in the meantime
+        """
+        chunks = self.run(program)
+        while True:
+            try:
+                next(chunks)
+            except StopIteration as stop:
+                return stop.value
+            await asyncio.sleep(0)
@@ -0,0 +1,176 @@
+from yat.model import *
+from yat.compiler import BINARY_OPS, EAGER_LOGIC, UNARY_OPS
+from yat.resolver import resolve
+
+
+class StackEvaluator:
+    """
+        evaluates a tree without recursing in Python: pending work is kept
+        on an explicit stack of (task, node, scope) triples and results on
+        a value stack, so the depth of yat recursion is bounded by memory
+        and not by the Python recursion limit
+    """
+    def __init__(self):
+        self.layouts = dict()
+        self.todo = []
+        self.values = []
+        self.scope = None
+
+    def evaluate(self, node, scope):
+        todo, values = self.todo, self.values
+        base = len(values)
+        todo.append((self.eval, node, scope))
+        while todo:
+            task, node, scope = todo.pop()
+            task(node, scope)
+        return values.pop() if len(values) > base else None
+
+    def steps(self, node, scope, every):
+        """
+            evaluates a tree like evaluate, but as a generator that
+            stops after every `every` tasks; the value of the tree is the
+            value of StopIteration. A run that is dropped or fails
+            leaves the stacks as it found them.
+        """
+        todo, values = self.todo, self.values
+        depth, base = len(todo), len(values)
+        todo.append((self.eval, node, scope))
+        try:
+            while len(todo) > depth:
+                for _ in range(every):
+                    if len(todo) == depth:
+                        break
+                    task, node, scope = todo.pop()
+                    task(node, scope)
+                else:
+                    yield
+        except BaseException:
+            del todo[depth:]
+            del values[base:]
+            raise
+        return values.pop() if len(values) > base else None
+
+    def layout(self, function):
+        cached = self.layouts.get(id(function))
+        if cached is None or cached[0] is not function:
+            slots = resolve(function)
+            cached = (function, slots, [slots[arg] for arg in function.args])
+            self.layouts[id(function)] = cached
+        return cached[1], cached[2]
+
+    def eval(self, node, scope):
+        self.scope = scope
+        node.access(self)
+
+    def visit_number(self, num):
+        self.values.append(num)
+
+    def visit_reference(self, ref):
+        self.values.append(self.scope[ref.name])
+
+    def visit_function(self, function):
+        self.todo.append((self.eval, function.body, self.scope))
+
+    def visit_exprlist(self, expr_list):
+        fuel = current_fuel()
+        if fuel is not None:
+            fuel.left -= 1
+            if fuel.left < 0:
+                fuel.refill()
+        if not expr_list.exprs:
+            self.values.append(None)
+            return
+        todo, scope = self.todo, self.scope
+        todo.append((self.eval, expr_list.exprs[-1], scope))
+        for expr in reversed(expr_list.exprs[:-1]):
+            todo.append((self.discard, None, None))
+            todo.append((self.eval, expr, scope))
+
+    def discard(self, node, scope):
+        self.values.pop()
+
+    def visit_definition(self, f_def):
+        self.scope[f_def.name] = f_def.function
+        self.values.append(f_def.function)
+
+    def visit_read(self, rd):
+        obj = box(current_io().read())
+        self.scope[rd.name] = obj
+        self.values.append(obj)
+
+    def visit_print(self, prnt):
+        self.todo.append((self.show, prnt, None))
+        self.todo.append((self.eval, prnt.expr, self.scope))
+
+    def show(self, prnt, scope):
+        current_io().write(self.values[-1].value)
+
+    def visit_conditional(self, cond):
+        self.todo.append((self.branch, cond, self.scope))
+        self.todo.append((self.eval, cond.condition, self.scope))
+
+    def branch(self, cond, scope):
+        if self.values.pop().value:
+            self.todo.append((self.eval, cond.if_true, scope))
+        else:
+            self.todo.append((self.eval, cond.if_false, scope))
+
+    def visit_binary(self, bin_op):
+        if (bin_op.op == '&&' or bin_op.op == '||') and short_circuit():
+            self.todo.append((self.logical, bin_op, self.scope))
+            self.todo.append((self.eval, bin_op.lhs, self.scope))
+            return
+        self.todo.append((self.binary, bin_op, None))
+        self.todo.append((self.eval, bin_op.rhs, self.scope))
+        self.todo.append((self.eval, bin_op.lhs, self.scope))
+
+    def binary(self, bin_op, scope):
+        values = self.values
+        rhs = values.pop()
+        if bin_op.op in EAGER_LOGIC:
+            values[-1] = box(EAGER_LOGIC[bin_op.op](values[-1].value, rhs))
+        else:
+            values[-1] = box(BINARY_OPS[bin_op.op](values[-1].value, rhs.value))
+
+    def logical(self, bin_op, scope):
+        # the left operand stays the result unless the right one is needed
+        values = self.values
+        if bool(values[-1].value) != (bin_op.op == '||'):
+            values.pop()
+            self.todo.append((self.eval, bin_op.rhs, scope))
+
+    def visit_unary(self, un_op):
+        self.todo.append((self.unary, un_op, None))
+        self.todo.append((self.eval, un_op.expr, self.scope))
+
+    def unary(self, un_op, scope):
+        values = self.values
+        values[-1] = box(UNARY_OPS[un_op.op](values[-1].value))
+
+    def visit_call(self, call):
+        self.todo.append((self.call, call, self.scope))
+        self.todo.append((self.eval, call.fun_expr, self.scope))
+
+    def call(self, call, scope):
+        slots, arg_slots = self.layout(self.values[-1])
+        frame = Frame(scope, slots)
+        todo = self.todo
+        todo.append((self.enter, call, frame))
+        for arg in reversed(call.args):
+            todo.append((self.eval, arg, frame))
+
+    def enter(self, call, frame):
+        fuel = current_fuel()
+        if fuel is not None:
+            fuel.left -= 1
+            if fuel.left < 0:
+                fuel.refill()
+        values = self.values
+        count = len(call.args)
+        args = values[len(values) - count:]
+        del values[len(values) - count:]
+        func = values.pop()
+        slots, arg_slots = self.layout(func)
+        for slot, val in zip(arg_slots, args):
+            frame.values[slot] = val
+        self.todo.append((self.eval, func.body, frame))
@@ -0,0 +1,104 @@
+import io
+import sys
+
+from yat.model import set_io
+
+
+class BufferedIO:
+    """
+        Print and Read through buffers instead of a print() and an input()
+        per value. Output is collected and written in blocks; input is
+        read in blocks and split into whitespace separated numbers, so
+        several numbers may share a line. Output is flushed before
+        waiting for more input, on flush() and when leaving the context:
+
+            with BufferedIO():
+                program.evaluate(scope)
+
+        Streams default to the binary buffers of sys.stdin and sys.stdout;
+        any binary or text file object, in memory or on disk, will do.
+    """
+    def __init__(self, input=None, output=None, buffer_size=1 << 16):
+        self.input = input
+        self.output = output
+        self.buffer_size = buffer_size
+        self.parts = []
+        self.pending = 0
+        self.tokens = []
+        self.position = 0
+        self.partial = None
+        self.previous = None
+
+    @staticmethod
+    def binary(stream):
+        if isinstance(stream, io.TextIOBase) and hasattr(stream, 'buffer'):
+            return stream.buffer
+        return stream
+
+    def __enter__(self):
+        self.previous = set_io(self)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.flush()
+        finally:
+            set_io(self.previous)
+        return False
+
+    def write(self, value):
+        text = str(value)
+        self.parts.append(text)
+        self.pending += len(text) + 1
+        if self.pending >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.parts:
+            return
+        stream = self.binary(self.output if self.output is not None else sys.stdout)
+        data = '\n'.join(self.parts) + '\n'
+        self.parts = []
+        self.pending = 0
+        if isinstance(stream, io.TextIOBase):
+            stream.write(data)
+        else:
+            stream.write(data.encode('ascii'))
+        stream.flush()
+
+    def fill(self):
+        """
+            reads the next block of input into tokens,
+            returns False at the end of input
+        """
+        self.flush()
+        stream = self.binary(self.input if self.input is not None else sys.stdin)
+        read = getattr(stream, 'read1', stream.read)
+        while True:
+            chunk = read(self.buffer_size)
+            if not chunk:
+                if self.partial is None:
+                    return False
+                self.tokens, self.position, self.partial = [self.partial], 0, None
+                return True
+            tokens = chunk.split()
+            if self.partial is not None:
+                if chunk[:1].isspace():
+                    tokens.insert(0, self.partial)
+                elif tokens:
+                    tokens[0] = self.partial + tokens[0]
+                else:
+                    tokens = [self.partial]
+                self.partial = None
+            if tokens and not chunk[-1:].isspace():
+                self.partial = tokens.pop()
+            if tokens:
+                self.tokens, self.position = tokens, 0
+                return True
+
+    def read(self):
+        if self.position == len(self.tokens) and not self.fill():
+            raise EOFError("no more numbers to read")
+        token = self.tokens[self.position]
+        self.position += 1
+        return int(token)
@@ -0,0 +1,249 @@
+import re
+
+from yat.model import *
+
+
+TOKEN = re.compile(r'\s*(\d+|[A-Za-z_]\w*|==|!=|<=|>=|&&|\|\||[-+*/%<>!(){},;]|\S)')
+
+PRECEDENCE = {'||': 1, '&&': 2, '==': 3, '!=': 3,
+              '<': 4, '>': 4, '<=': 4, '>=': 4,
+              '+': 5, '-': 5, '*': 6, '/': 6, '%': 6}
+
+KEYWORDS = {'def', 'if', 'else', 'print', 'read'}
+
+END = ''
+
+
+def tokenize(text):
+    """
+        the tokens of text as strings, END-terminated; anything
+        that is not a token comes out as a single character
+    """
+    tokens = TOKEN.findall(text)
+    tokens.append(END)
+    return tokens
+
+
+def is_name(token):
+    return (token[:1].isalpha() or token[:1] == '_') and token not in KEYWORDS
+
+
+class Parser:
+    """
+        reads the syntax PrettyPrinter writes:
+
+            def name(arg, ...) { statement ... };
+            if (expression) { statement ... } else { statement ... };
+            expression;
+
+        Expressions are parsed by precedence climbing with C priorities,
+        || lowest, then &&, equalities, comparisons, sums, products and
+        the prefix - and !; print takes a whole expression, calls follow
+        their function. A minus written right before a number is part
+        of it, so -3 is Number(-3) and -(3) is UnaryOperation.
+
+        Nested statements and expressions are kept on stacks of their
+        own, so neither depth is limited by Python recursion.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def error(self, message):
+        offset = len(self.text)
+        for index, match in enumerate(TOKEN.finditer(self.text)):
+            if index == self.pos:
+                offset = match.start(1)
+                break
+        line = self.text.count('\n', 0, offset) + 1
+        column = offset - (self.text.rfind('\n', 0, offset) + 1) + 1
+        found = self.tokens[self.pos] or 'end of input'
+        return SyntaxError("{}, found {!r} at line {}, column {}".format(
+            message, found, line, column))
+
+    def expect(self, token):
+        if self.tokens[self.pos] != token:
+            raise self.error("expected {!r}".format(token))
+        self.pos += 1
+
+    def name(self):
+        token = self.tokens[self.pos]
+        if not is_name(token):
+            raise self.error("expected a name")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        """
+            the statements of the whole text as an ExprList
+        """
+        tokens = self.tokens
+        # open blocks: [kind, header, statements of the first branch or None]
+        blocks = []
+        statements = []
+        while True:
+            token = tokens[self.pos]
+            if token == END:
+                if blocks:
+                    raise self.error("expected '}'")
+                return ExprList(statements)
+            if token == 'def':
+                self.pos += 1
+                name = self.name()
+                self.expect('(')
+                args = []
+                if tokens[self.pos] != ')':
+                    args.append(self.name())
+                    while tokens[self.pos] == ',':
+                        self.pos += 1
+                        args.append(self.name())
+                self.expect(')')
+                self.expect('{')
+                blocks.append(['def', (name, args), statements])
+                statements = []
+            elif token == 'if':
+                self.pos += 1
+                self.expect('(')
+                condition = self.expression()
+                self.expect(')')
+                self.expect('{')
+                blocks.append(['if', condition, statements, None])
+                statements = []
+            elif token == '}':
+                if not blocks:
+                    raise self.error("unexpected '}'")
+                self.pos += 1
+                block = blocks[-1]
+                if block[0] == 'if' and block[3] is None and tokens[self.pos] == 'else':
+                    self.pos += 1
+                    self.expect('{')
+                    block[3] = statements
+                    statements = []
+                    continue
+                self.expect(';')
+                blocks.pop()
+                if block[0] == 'def':
+                    name, args = block[1]
+                    node = FunctionDefinition(name, Function(args, statements))
+                elif block[3] is None:
+                    node = Conditional(block[1], statements)
+                else:
+                    node = Conditional(block[1], block[3], statements)
+                statements = block[2]
+                statements.append(node)
+            else:
+                statements.append(self.expression())
+                self.expect(';')
+
+    def expression(self):
+        """
+            an expression, up to the first token that cannot continue it.
+
+            Operators waiting for their right side are kept on a stack
+            instead of the Python one, so expressions nest as deep as
+            memory allows: a binary operator with its left operand and
+            precedence, a prefix - or ! (binding tighter than any binary
+            operator), a print (binding looser than all of them), an
+            open parenthesis, or a call with its arguments so far.
+        """
+        tokens = self.tokens
+        pending = []
+        while True:
+            expr = self.operand(pending)
+            while True:
+                op = tokens[self.pos]
+                precedence = PRECEDENCE.get(op)
+                while pending:
+                    top = pending[-1]
+                    kind = top[0]
+                    if kind == 'unary':
+                        expr = UnaryOperation(top[1], expr)
+                    elif kind == 'binary' and (precedence is None or precedence <= top[3]):
+                        expr = BinaryOperation(top[2], top[1], expr)
+                    elif kind == 'print' and precedence is None:
+                        expr = Print(expr)
+                    else:
+                        break
+                    pending.pop()
+                if precedence is not None:
+                    self.pos += 1
+                    pending.append(('binary', op, expr, precedence))
+                    break
+                if not pending:
+                    return expr
+                top = pending.pop()
+                if top[0] == 'group':
+                    self.expect(')')
+                    expr = self.postfix(expr, pending)
+                else:
+                    top[2].append(expr)
+                    if tokens[self.pos] == ',':
+                        self.pos += 1
+                        pending.append(top)
+                        break
+                    self.expect(')')
+                    expr = self.postfix(FunctionCall(top[1], top[2]), pending)
+                if expr is None:
+                    break
+
+    def operand(self, pending):
+        """
+            the operand starting at the current token, with the prefix
+            operators and open parentheses before it pushed on pending;
+            None when it ends with an open call still waiting for its
+            first argument
+        """
+        tokens = self.tokens
+        while True:
+            token = tokens[self.pos]
+            if token == '-' or token == '!':
+                self.pos += 1
+                following = tokens[self.pos]
+                if token == '-' and following.isdigit():
+                    self.pos += 1
+                    expr = self.postfix(Number(-int(following)), pending)
+                    if expr is not None:
+                        return expr
+                else:
+                    pending.append(('unary', token))
+            elif token == 'print':
+                self.pos += 1
+                pending.append(('print',))
+            elif token == 'read':
+                self.pos += 1
+                return Read(self.name())
+            elif token == '(':
+                self.pos += 1
+                pending.append(('group',))
+            elif token.isdigit() or is_name(token):
+                self.pos += 1
+                expr = Number(int(token)) if token.isdigit() else Reference(token)
+                expr = self.postfix(expr, pending)
+                if expr is not None:
+                    return expr
+            else:
+                raise self.error("expected an expression")
+
+    def postfix(self, expr, pending):
+        """
+            expr followed by the calls with no arguments made of it;
+            a call with arguments is pushed on pending and gives None
+        """
+        tokens = self.tokens
+        while tokens[self.pos] == '(':
+            self.pos += 1
+            if tokens[self.pos] != ')':
+                pending.append(('call', expr, []))
+                return None
+            self.pos += 1
+            expr = FunctionCall(expr, [])
+        return expr
+
+
+def parse(text):
+    """
+        the program in text as an ExprList of its statements;
+        raises SyntaxError with the line and column of the first error
+    """
+    return Parser(text).parse()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import io
+import pickle
+import unittest
+
+from yat.model import Scope, Number, Function, FunctionDefinition, Conditional, Print, \
+    FunctionCall, Reference, BinaryOperation, ExprList
+from yat.arena import Arena
+from yat.folder import ConstantFolder
+from yat.printer import PrettyPrinter
+from yat.benchmark import split_program, helper_program, wide_program, generated_program, \
+    chain_program
+
+
+def text(node):
+    out = io.StringIO()
+    PrettyPrinter(out).visit(node)
+    return out.getvalue()
+
+
+class ArenaTest(unittest.TestCase):
+    def programs(self):
+        return [split_program(10), helper_program(5), wide_program(20)] + \
+            [generated_program(seed) for seed in range(5)]
+
+    def test_print_and_fold(self):
+        for program in self.programs():
+            view = Arena().load(program)
+            self.assertEqual(text(view), text(program))
+            self.assertEqual(text(ConstantFolder().visit(view)),
+                             text(ConstantFolder().visit(program)))
+
+    def test_evaluate(self):
+        view = Arena().load(split_program(10))
+        self.assertEqual(view.evaluate(Scope()).value, 55)
+
+    def test_fields(self):
+        arena = Arena()
+        big = 10 ** 30
+        cond = arena.view(arena.conditional(arena.number(big), [arena.number(-1)]))
+        self.assertIsInstance(cond, Conditional)
+        self.assertEqual(cond.condition.value, big)
+        self.assertEqual(cond.if_true.exprs[0].value, -1)
+        self.assertIsNone(cond.if_false.exprs)
+        self.assertEqual(arena.view(arena.exprlist([])).exprs, [])
+        self.assertIs(cond.condition, cond.condition)
+
+    def test_shared_function(self):
+        function = Function(['a'], [Print(Reference('a'))])
+        program = ExprList([FunctionDefinition('f', function), FunctionDefinition('g', function),
+                            FunctionCall(Reference('g'), [Number(1)])])
+        view = Arena().load(program)
+        self.assertIs(view.exprs[0].function, view.exprs[1].function)
+        self.assertEqual(len(view.arena), 10)
+
+    def test_unchanged(self):
+        view = Arena().load(split_program(3))
+        self.assertIs(ConstantFolder().visit(view), view)
+
+    def test_pickle(self):
+        program = helper_program(3)
+        copy = pickle.loads(pickle.dumps(Arena().load(program)))
+        self.assertIs(type(copy), ExprList)
+        self.assertEqual(text(copy), text(program))
+
+    def test_deep(self):
+        program = chain_program(20000)
+        arena = Arena()
+        view = arena.load(program)
+        self.assertIsInstance(view.exprs[0], BinaryOperation)
+        self.assertEqual(text(arena.tree(view.index)), text(program))
+        arena.release()
+        self.assertEqual(text(arena.view(view.index)), text(program))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import random
+import unittest
+
+from yat.model import Scope, Number, Function, FunctionCall, Conditional, \
+    Reference, BinaryOperation, UnaryOperation, box
+from yat.batch import compile_batch, evaluate_batch, ListColumns, NumpyColumns, np
+
+
+OPS = ['+', '-', '*', '/', '%', '==', '!=', '<', '>', '<=', '>=', '&&', '||']
+
+
+def random_expr(rnd, depth):
+    if depth == 0:
+        return rnd.choice([Reference('x'), Reference('y'), Reference('k'),
+                           Number(rnd.randint(-3, 3))])
+    kind = rnd.random()
+    if kind < 0.15:
+        return UnaryOperation(rnd.choice('!-'), random_expr(rnd, depth - 1))
+    if kind < 0.3:
+        return Conditional(random_expr(rnd, depth - 1),
+                           [random_expr(rnd, depth - 1)], [random_expr(rnd, depth - 1)])
+    op = rnd.choice(OPS)
+    rhs = random_expr(rnd, depth - 1)
+    if op in ('/', '%'):
+        # keep divisors away from zero
+        rhs = BinaryOperation(BinaryOperation(rhs, '*', rhs), '+', Number(1))
+    return BinaryOperation(random_expr(rnd, depth - 1), op, rhs)
+
+
+def per_row(expr, columns, scope):
+    values = []
+    for x, y in zip(columns['x'], columns['y']):
+        row = Scope(scope)
+        row['x'] = box(x)
+        row['y'] = box(y)
+        values.append(expr.evaluate(row).value)
+    return values
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.scope = Scope()
+        self.scope['k'] = Number(5)
+        self.scope['twice'] = Function(['a'], [BinaryOperation(Reference('a'), '*', Number(2))])
+        rnd = random.Random(7)
+        self.columns = {'x': [rnd.randint(-50, 50) for _ in range(200)],
+                        'y': [rnd.randint(-50, 50) for _ in range(200)]}
+
+    def check(self, columns):
+        rnd = random.Random(3)
+        for _ in range(200):
+            expr = random_expr(rnd, 3)
+            result = compile_batch(expr, self.scope, columns)(self.columns)
+            self.assertEqual(list(result), per_row(expr, self.columns, self.scope))
+
+    def test_lists(self):
+        self.check(ListColumns())
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_numpy(self):
+        self.check(NumpyColumns())
+        result = evaluate_batch(BinaryOperation(Reference('x'), '/', Number(7)), self.columns)
+        self.assertEqual(result.dtype, np.int64)
+
+    def test_calls(self):
+        expr = BinaryOperation(FunctionCall(Reference('twice'), [Reference('x')]), '+',
+                               Reference('y'))
+        self.assertEqual(list(evaluate_batch(expr, self.columns, self.scope)),
+                         per_row(expr, self.columns, self.scope))
+
+    def test_division_by_zero(self):
+        guarded = Conditional(Reference('y'), [BinaryOperation(Reference('x'), '/', Reference('y'))],
+                              [Number(0)])
+        self.assertEqual(list(evaluate_batch(guarded, self.columns)),
+                         per_row(guarded, self.columns, Scope()))
+        with self.assertRaises(ZeroDivisionError):
+            evaluate_batch(BinaryOperation(Reference('x'), '%', Reference('y')),
+                           {'x': [1, 2], 'y': [1, 0]})
+
+    def test_lengths(self):
+        with self.assertRaises(ValueError):
+            evaluate_batch(Reference('x'), {'x': [1, 2], 'y': [1]})
+        with self.assertRaises(ValueError):
+            evaluate_batch(Conditional(Reference('x'), [], []), {'x': [1]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import unittest
+import io
+import sys
+
+from yat.model import Scope, Frame, Number, ExprList, Function, \
+    FunctionDefinition, FunctionCall, Conditional, Print, Read, \
+    Reference, BinaryOperation, UnaryOperation, box, set_small_int_range
+from yat.resolver import resolve
+from yat.compiler import Compiler, compile_tree
+from yat.stackeval import StackEvaluator
+from yat.vm import VM
+from yat.syntax import parse
+from yat.benchmark import fib_program, loop_program, sum_program
+
+
+class CompilerTest(unittest.TestCase):
+    def setUp(self):
+        self.scope = Scope()
+        self.scope["a"] = Number(42)
+        self.scope["b"] = Number(-39)
+        self.backup_out = sys.stdout
+        self.backup_in = sys.stdin
+        sys.stdout = io.StringIO()
+        sys.stdin = io.StringIO("7\n")
+
+    def tearDown(self):
+        sys.stdout = self.backup_out
+        sys.stdin = self.backup_in
+
+    def assertSame(self, node):
+        expected = node.evaluate(Scope(self.scope))
+        got = compile_tree(node)(Scope(self.scope))
+        if expected is None:
+            self.assertIsNone(got)
+        else:
+            self.assertEqual(got.value, expected.value)
+
+    def test_binary(self):
+        for op in ['+', '-', '*', '/', '%', '==', '!=',
+                   '<', '>', '<=', '>=', '&&', '||']:
+            self.assertSame(BinaryOperation(Reference("a"), op, Reference("b")))
+
+    def test_unary(self):
+        for op in ['-', '!']:
+            self.assertSame(UnaryOperation(op, Reference("b")))
+
+    def test_conditional(self):
+        self.assertSame(Conditional(Number(0), [Number(1)], None))
+        self.assertSame(Conditional(Number(0), [Number(1)], [Number(2)]))
+        self.assertSame(Conditional(Reference("a"), [Number(1), Number(3)]))
+
+    def test_programs(self):
+        self.assertSame(fib_program(10))
+        self.assertSame(loop_program(50))
+
+    def test_print_read(self):
+        compile_tree(ExprList([Read("x"),
+                               Print(BinaryOperation(Reference("x"), '*',
+                                                     Reference("a")))]))(self.scope)
+        self.assertEqual(sys.stdout.getvalue(), "294\n")
+        self.assertEqual(self.scope["x"].value, 7)
+
+    def test_function_cache(self):
+        compiler = Compiler()
+        program = fib_program(5)
+        compiler.visit(program)(self.scope)
+        self.assertEqual(len(compiler.functions), 1)
+        self.assertIs(compiler.function_body(self.scope["fib"])[0],
+                      compiler.function_body(self.scope["fib"])[0])
+
+
+class NumberTest(unittest.TestCase):
+    def tearDown(self):
+        set_small_int_range(-5, 256)
+
+    def test_box(self):
+        self.assertIs(box(7), box(7))
+        self.assertIs(box(True), box(1))
+        self.assertEqual(box(False).value, 0)
+        self.assertIsNot(box(1000), box(1000))
+        set_small_int_range(0, 1000)
+        self.assertIs(box(1000), box(1000))
+
+    def test_bool_results_are_ints(self):
+        for node in [BinaryOperation(Number(2), '<', Number(3)),
+                     BinaryOperation(BinaryOperation(Number(2), '<', Number(3)),
+                                     '&&', BinaryOperation(Number(1), '==', Number(1))),
+                     UnaryOperation('!', Number(0))]:
+            self.assertIs(type(compile_tree(node)(Scope()).value), int)
+            self.assertIs(type(node.evaluate(Scope()).value), int)
+
+
+class FrameTest(unittest.TestCase):
+    def test_resolve(self):
+        function = Function(['x', 'y'],
+                            [Read('z'),
+                             FunctionCall(Reference('f'), [Read('w')]),
+                             Conditional(Reference('x'),
+                                         [FunctionDefinition('g', Function(['v'], [Read('u')]))])])
+        self.assertEqual(resolve(function), {'x': 0, 'y': 1, 'z': 2, 'f': 3, 'g': 4})
+
+    def test_dict_interface(self):
+        parent = Scope()
+        parent["x"] = Number(1)
+        frame = Frame(parent, {'y': 0})
+        self.assertIs(frame["x"], parent["x"])
+        frame["y"] = Number(2)
+        frame["x"] = Number(3)
+        self.assertEqual(frame.values[0].value, 2)
+        self.assertEqual(frame["x"].value, 3)
+        self.assertEqual(parent["x"].value, 1)
+
+    def test_dynamic_scope(self):
+        scope = Scope()
+        scope["x"] = Number(5)
+        inner = Function([], [Reference('x')])
+        outer = Function(['x'], [FunctionCall(Reference('inner'), [])])
+        program = ExprList([FunctionDefinition('inner', inner),
+                            FunctionDefinition('outer', outer),
+                            FunctionCall(Reference('outer'), [Number(8)])])
+        self.assertEqual(compile_tree(program)(scope).value, 8)
+        self.assertEqual(compile_tree(Reference('x'))(scope).value, 5)
+
+    def test_none_argument(self):
+        # an empty else branch gives None, which is a value like any other
+        none = Function([], [Conditional(Number(0), [Number(1)], [])])
+        program = ExprList([FunctionDefinition('none', none),
+                            FunctionDefinition('f', Function(['a'], [Reference('a')])),
+                            FunctionCall(Reference('f'), [FunctionCall(Reference('none'), [])])])
+        scope = Scope()
+        scope["a"] = Number(3)
+        self.assertIsNone(program.evaluate(Scope(scope)))
+        self.assertIsNone(compile_tree(program)(Scope(scope)))
+        self.assertIsNone(StackEvaluator().evaluate(program, Scope(scope)))
+        self.assertIsNone(VM().evaluate(program, Scope(scope)))
+
+    def test_read_in_arguments(self):
+        backup = sys.stdin
+        sys.stdin = io.StringIO("3\n3\n")
+        try:
+            function = Function(['a'], [BinaryOperation(Reference('a'), '+',
+                                                         Reference('r'))])
+            call = FunctionCall(Reference('f'), [Read('r')])
+            scope = Scope()
+            scope['f'] = function
+            scope['r'] = Number(100)
+            expected = call.evaluate(scope).value
+            self.assertEqual(compile_tree(call)(scope).value, expected)
+        finally:
+            sys.stdin = backup
+
+
+class DeepRecursionTest(unittest.TestCase):
+    def test_function_node_runs_body(self):
+        scope = Scope()
+        node = ExprList([Function([], [Read('x')]), Reference('x')])
+        backup = sys.stdin
+        try:
+            sys.stdin = io.StringIO("5\n")
+            self.assertEqual(compile_tree(node)(scope).value, 5)
+            sys.stdin = io.StringIO("6\n")
+            self.assertEqual(StackEvaluator().evaluate(node, scope).value, 6)
+        finally:
+            sys.stdin = backup
+
+    def test_tail_calls(self):
+        n = 10 ** 5
+        self.assertEqual(compile_tree(loop_program(n))(Scope()).value,
+                         n * (n + 1) // 2)
+
+    def test_tail_call_keeps_bindings(self):
+        # g reads y from the frame of f, which must not be skipped
+        f = Function(['x'], [FunctionDefinition('y', Function([], [])),
+                             FunctionCall(Reference('g'), [Reference('x')])])
+        g = Function(['x'], [BinaryOperation(Reference('x'), '+',
+                                             UnaryOperation('!', Reference('y')))])
+        program = ExprList([FunctionDefinition('f', f),
+                            FunctionDefinition('g', g),
+                            FunctionCall(Reference('f'), [Number(1)])])
+        scope = Scope()
+        scope['y'] = Number(0)
+        self.assertRaises(AttributeError, program.evaluate, scope)
+        self.assertRaises(AttributeError, compile_tree(program), scope)
+
+    def test_tail_call_keeps_none(self):
+        # x is bound to None in the frame of f, so g must not see the outer x
+        program = parse("def empty() {}; def g(y) { x; }; def f(x) { g(1); }; f(empty());")
+        results = []
+        for run in [program.evaluate, compile_tree(program),
+                    lambda scope: VM().evaluate(program, scope)]:
+            scope = Scope()
+            scope['x'] = Number(7)
+            results.append(run(scope))
+        self.assertEqual(results, [None, None, None])
+
+    def test_stack_evaluator(self):
+        for program in [fib_program(12), loop_program(100), sum_program(100)]:
+            self.assertEqual(StackEvaluator().evaluate(program, Scope()).value,
+                             program.evaluate(Scope()).value)
+
+    def test_stack_evaluator_deep(self):
+        n = 3 * 10 ** 4
+        self.assertEqual(StackEvaluator().evaluate(sum_program(n), Scope()).value,
+                         n * (n + 1) // 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import sys
+import unittest
+
+from yat.model import Scope, Number, ExprList, Function, FunctionDefinition, \
+    FunctionCall, Conditional, Print, Read, Reference, BinaryOperation
+from yat.cse import CommonSubexpressions, Names, Binds, eliminate
+from yat.compiler import compile_tree
+from yat.benchmark import generated_program, chain_program
+
+
+def product():
+    return BinaryOperation(BinaryOperation(Reference('a'), '*', Reference('b')), '+',
+                           BinaryOperation(Reference('c'), '-', Number(1)))
+
+
+def run(program, text=''):
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(text)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            value = program(Scope())
+    finally:
+        sys.stdin = stdin
+    return out.getvalue(), value.value
+
+
+class CSETest(unittest.TestCase):
+    def check(self, program, text=''):
+        optimized = CommonSubexpressions().visit(program)
+        expected = run(program.evaluate, text)
+        self.assertEqual(run(optimized.evaluate, text), expected)
+        self.assertEqual(run(compile_tree(optimized), text), expected)
+        return optimized
+
+    def test_hoists(self):
+        f = Function(['a', 'b', 'c'], [BinaryOperation(product(), '*', product())])
+        cse = CommonSubexpressions()
+        body = cse.visit(FunctionDefinition('f', f)).function.body.exprs
+        self.assertIsInstance(body[0], FunctionDefinition)
+        self.assertEqual(body[1].args[0].op, '+')
+        self.assertGreater(cse.evaluations, 0)
+
+    def test_barriers(self):
+        f = Function(['a', 'b', 'c'], [Print(product()), product(),
+                                       Read('a'), product(),
+                                       FunctionCall(Reference('g'), []), product()])
+        optimized = CommonSubexpressions().visit(FunctionDefinition('f', f))
+        self.assertIs(optimized.function, f)
+        f = Function(['a', 'b', 'c'], [Print(BinaryOperation(product(), '-', product())),
+                                       Read('a'),
+                                       BinaryOperation(product(), '+', product())])
+        self.check(ExprList([FunctionDefinition('f', f),
+                             FunctionCall(Reference('f'), [Number(2), Number(3), Number(4)])]),
+                   '7\n')
+
+    def test_top_level(self):
+        scope_bound = ExprList([BinaryOperation(product(), '*', product()), Read('z')])
+        self.assertIs(CommonSubexpressions().visit(scope_bound), scope_bound)
+        branch = Conditional(Number(1), [Print(BinaryOperation(product(), '*', product()))])
+        optimized = CommonSubexpressions().visit(branch)
+        self.assertIsInstance(optimized.if_true.exprs[0], FunctionDefinition)
+
+    def test_fresh_names(self):
+        f = Function(['__t0', '__cse1'], [BinaryOperation(product(), '*', product())])
+        body = CommonSubexpressions().visit(FunctionDefinition('f', f)).function.body.exprs
+        self.assertNotIn(body[0].name, ['__t0', '__cse1'])
+        self.assertNotIn(body[0].function.args[0], ['__t0', '__cse1'])
+
+    def test_generated(self):
+        for seed in range(10):
+            self.check(generated_program(seed))
+
+    def test_deep(self):
+        program = chain_program(50000)
+        self.assertEqual(Names().visit(program), {'x'})
+        self.assertFalse(Binds().visit(program))
+        program = chain_program(5000)
+        optimized = eliminate(program)
+        self.assertIsNot(optimized, program)
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        scope = Scope()
+        scope['x'] = Number(1)
+        self.assertEqual(optimized.evaluate(scope).value, program.evaluate(scope).value)
+
+
+if __name__ == "__main__":
+    unittest.main()
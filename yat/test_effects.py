@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import unittest
+import io
+import sys
+
+from yat.model import Scope, Number, ExprList, Function, FunctionDefinition, \
+    FunctionCall, Conditional, Print, Read, Reference, BinaryOperation
+from yat.compiler import compile_tree
+from yat.effects import MemoCache
+from yat.benchmark import fib_program
+
+
+class EffectsTest(unittest.TestCase):
+    def test_purity(self):
+        memo = MemoCache()
+        pure = Function(['n'], [Conditional(Reference('n'),
+                                            [FunctionCall(Reference('g'), [Reference('n')])],
+                                            [Reference('k')])])
+        self.assertTrue(memo.is_pure(pure))
+        self.assertEqual(memo.summary(pure).free, ['g', 'k'])
+        for body in [[Print(Reference('n'))],
+                     [Read('n')],
+                     [FunctionDefinition('h', pure)],
+                     [FunctionCall(Reference('n'), [])],
+                     [FunctionCall(FunctionDefinition('h', pure), [])]]:
+            self.assertFalse(memo.is_pure(Function(['n'], body)))
+
+    def test_fib(self):
+        memo = MemoCache()
+        self.assertEqual(compile_tree(fib_program(40), memo)(Scope()).value,
+                         102334155)
+        self.assertEqual(memo.misses, 41)
+
+    def test_depends_on_scope(self):
+        memo = MemoCache()
+        f = Function(['x'], [BinaryOperation(Reference('x'), '+', Reference('k'))])
+        call = compile_tree(FunctionCall(Reference('f'), [Number(1)]), memo)
+        for k in [1, 2, 1]:
+            scope = Scope()
+            scope['f'] = f
+            scope['k'] = Number(k)
+            self.assertEqual(call(scope).value, 1 + k)
+        self.assertEqual((memo.hits, memo.misses), (1, 2))
+
+    def test_none_result(self):
+        # a conditional without an else branch gives None, which is cached too
+        memo = MemoCache()
+        f = Function(['x'], [Conditional(BinaryOperation(Reference('x'), '<', Number(0)),
+                                         [Number(1)])])
+        program = ExprList([FunctionDefinition('f', f),
+                            FunctionCall(Reference('f'), [Number(3)]),
+                            FunctionCall(Reference('f'), [Number(3)])])
+        computed = []
+        put = memo.put
+        memo.put = lambda key, value: computed.append(key) or put(key, value)
+        self.assertIsNone(compile_tree(program, memo)(Scope()))
+        self.assertEqual(len(computed), 1)
+        self.assertEqual((memo.hits, memo.misses), (1, 1))
+
+    def test_impure_callee(self):
+        backup = sys.stdout
+        sys.stdout = io.StringIO()
+        try:
+            memo = MemoCache()
+            f = Function(['x'], [FunctionCall(Reference('g'), [Reference('x')])])
+            g = Function(['y'], [Print(Reference('y'))])
+            program = ExprList([FunctionDefinition('f', f),
+                                FunctionDefinition('g', g),
+                                FunctionCall(Reference('f'), [Number(3)]),
+                                FunctionCall(Reference('f'), [Number(3)])])
+            compile_tree(program, memo)(Scope())
+            self.assertEqual(sys.stdout.getvalue(), "3\n3\n")
+            self.assertEqual(memo.hits, 0)
+        finally:
+            sys.stdout = backup
+
+    def test_lru(self):
+        memo = MemoCache(maxsize=2)
+        for key in ['a', 'b', 'a', 'c']:
+            if memo.get(key) is None:
+                memo.put(key, Number(1))
+        self.assertEqual(list(memo.entries), ['a', 'c'])
+        self.assertEqual((memo.hits, memo.misses), (1, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from yat.model import Scope, Number, ExprList, Function, FunctionDefinition, \
+    FunctionCall, Conditional, Print, Read, Reference, BinaryOperation, \
+    UnaryOperation, set_short_circuit
+from yat.folder import ConstantFolder
+from yat.benchmark import helper_program
+
+
+def binary(lhs, op, rhs):
+    return BinaryOperation(lhs, op, rhs)
+
+
+class FolderTest(unittest.TestCase):
+    def test_identities(self):
+        x = Reference('x')
+        for node in [binary(x, '+', Number(0)), binary(Number(0), '+', x),
+                     binary(x, '-', Number(0)), binary(x, '*', Number(1)),
+                     binary(Number(1), '*', x), binary(x, '/', Number(1)),
+                     binary(Number(0), '||', x), binary(Number(3), '&&', x),
+                     UnaryOperation('-', UnaryOperation('-', x)),
+                     binary(binary(x, '*', binary(Number(2), '-', Number(1))), '+',
+                            binary(Number(5), '%', Number(5)))]:
+            self.assertIs(ConstantFolder().visit(node), x)
+
+    def test_keeps_effects(self):
+        read = binary(Read('x'), '*', Number(0))
+        self.assertIs(ConstantFolder().visit(read), read)
+        zero = binary(Number(0), '&&', Print(Number(1)))
+        eager = set_short_circuit(False)
+        try:
+            self.assertIs(ConstantFolder().visit(zero), zero)
+        finally:
+            set_short_circuit(eager)
+        self.assertEqual(ConstantFolder().visit(zero).value, 0)
+        div = binary(Number(1), '/', Number(0))
+        self.assertIs(ConstantFolder().visit(div), div)
+
+    def test_dead_branches(self):
+        program = ExprList([Conditional(binary(Number(1), '<', Number(2)),
+                                        [Print(Number(1)), Print(Number(2))],
+                                        [Print(Number(3))]),
+                            Conditional(Number(0), [Print(Number(4))], [])])
+        folded = ConstantFolder().visit(program)
+        self.assertEqual(len(folded.exprs), 3)
+        self.assertEqual([expr.expr.value for expr in folded.exprs[:2]], [1, 2])
+        self.assertIsInstance(folded.exprs[2], Conditional)
+        inner = Print(Conditional(Number(1), [Reference('y')], []))
+        self.assertIsInstance(ConstantFolder().visit(inner).expr, Reference)
+
+    def test_propagation(self):
+        scope = Scope()
+        scope['k'] = Number(4)
+        node = binary(Reference('k'), '+', Reference('m'))
+        self.assertEqual(ConstantFolder(scope).visit(node).lhs.value, 4)
+        rebound = ExprList([Read('k'), node])
+        self.assertIs(ConstantFolder(scope).visit(rebound), rebound)
+        self.assertIs(ConstantFolder().visit(node), node)
+
+    def test_inlining(self):
+        sq = Function(['a'], [binary(Reference('a'), '*', Reference('a'))])
+        program = ExprList([FunctionDefinition('sq', sq),
+                            FunctionCall(Reference('sq'), [Reference('y')]),
+                            FunctionCall(Reference('sq'), [Number(3)]),
+                            FunctionCall(Reference('sq'), [binary(Reference('y'), '+', Number(1))])])
+        folded = ConstantFolder().visit(program)
+        self.assertEqual(folded.exprs[1].lhs.name, 'y')
+        self.assertEqual(folded.exprs[2].value, 9)
+        # the argument would be evaluated twice
+        self.assertIsInstance(folded.exprs[3], FunctionCall)
+        redefined = ExprList([FunctionDefinition('sq', sq), FunctionDefinition('sq', sq),
+                              FunctionCall(Reference('sq'), [Number(3)])])
+        self.assertIsInstance(ConstantFolder().visit(redefined).exprs[2], FunctionCall)
+
+    def test_sharing(self):
+        f = Function(['x'], [binary(Reference('x'), '+', binary(Number(1), '+', Number(1)))])
+        program = ExprList([FunctionDefinition('f', f), FunctionDefinition('g', f),
+                            Print(Reference('z'))])
+        folded = ConstantFolder().visit(program)
+        self.assertIs(folded.exprs[0].function, folded.exprs[1].function)
+        self.assertIs(folded.exprs[2], program.exprs[2])
+        self.assertIs(ConstantFolder().visit(folded), folded)
+
+    def test_same_result(self):
+        scope = Scope()
+        scope['debug'] = Number(0)
+        program = helper_program(50)
+        folded = ConstantFolder(scope).visit(program)
+        self.assertEqual(folded.evaluate(Scope(scope)).value,
+                         program.evaluate(Scope(scope)).value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import sys
+import threading
+import unittest
+
+from yat.model import Scope, Fuel, BudgetExceeded, current_fuel
+from yat.syntax import parse
+from yat.compiler import compile_tree
+from yat.lexical import compile_lexical
+from yat.stackeval import StackEvaluator
+from yat.vm import VM
+from yat.benchmark import fib_program, loop_program
+
+
+SPIN = parse("def spin(n) { spin(n + 1); }; spin(0);")
+
+BACKENDS = [('evaluate', lambda node: node.evaluate),
+            ('compiled', compile_tree),
+            ('lexical', compile_lexical)]
+
+# backends that run a tree without compiling it to a function first
+EVALUATORS = [('stackeval', StackEvaluator), ('vm', VM)]
+
+
+class FuelTest(unittest.TestCase):
+    def test_runaway(self):
+        for name, backend in [('compiled', compile_tree), ('lexical', compile_lexical)]:
+            run = backend(SPIN)
+            with self.assertRaises(BudgetExceeded, msg=name):
+                with Fuel(10 ** 5):
+                    run(Scope())
+        with self.assertRaises(BudgetExceeded):
+            with Fuel(200):
+                SPIN.evaluate(Scope())
+        self.assertIsNone(current_fuel())
+
+    def test_exact_limit(self):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        program = fib_program(10)
+        for name, backend in BACKENDS:
+            run = backend(program)
+            with Fuel() as fuel:
+                self.assertEqual(run(Scope()).value, 55, name)
+            steps = fuel.spent()
+            self.assertGreater(steps, 177, name)
+            with Fuel(steps):
+                self.assertEqual(run(Scope()).value, 55, name)
+            with self.assertRaises(BudgetExceeded, msg=name):
+                with Fuel(steps - 1, every=7):
+                    run(Scope())
+
+    def test_evaluators(self):
+        program = fib_program(10)
+        with Fuel() as fuel:
+            program.evaluate(Scope())
+        for name, evaluator in EVALUATORS:
+            with self.assertRaises(BudgetExceeded, msg=name):
+                with Fuel(10 ** 5):
+                    evaluator().evaluate(SPIN, Scope())
+            with Fuel() as used:
+                self.assertEqual(evaluator().evaluate(program, Scope()).value, 55, name)
+            steps = used.spent()
+            with Fuel(steps):
+                self.assertEqual(evaluator().evaluate(program, Scope()).value, 55, name)
+            with self.assertRaises(BudgetExceeded, msg=name):
+                with Fuel(steps - 1, every=7):
+                    evaluator().evaluate(program, Scope())
+        # one step per call and per list, as in evaluate(); the VM burns one per call
+        self.assertEqual(steps, 177)
+        with Fuel() as used:
+            StackEvaluator().evaluate(program, Scope())
+        self.assertEqual(used.spent(), fuel.spent())
+
+    def test_checkpoints(self):
+        seen = []
+        with Fuel(checkpoint=lambda fuel: seen.append(fuel.spent()), every=10) as fuel:
+            compile_tree(loop_program(100))(Scope())
+        self.assertEqual(seen, list(range(10, fuel.spent(), 10)))
+
+    def test_cancel(self):
+        class Cancelled(Exception):
+            pass
+
+        def checkpoint(fuel):
+            if fuel.spent() >= 50:
+                raise Cancelled()
+
+        with self.assertRaises(Cancelled):
+            with Fuel(checkpoint=checkpoint, every=25):
+                compile_tree(SPIN)(Scope())
+
+    def test_suspend(self):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        paused, resume = threading.Event(), threading.Event()
+        results = []
+
+        def checkpoint(fuel):
+            if not resume.is_set():
+                paused.set()
+                resume.wait()
+
+        def run():
+            with Fuel(checkpoint=checkpoint, every=100):
+                results.append(loop_program(1000).evaluate(Scope()).value)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.assertTrue(paused.wait(10))
+        self.assertEqual(results, [])
+        self.assertIsNone(current_fuel())
+        resume.set()
+        thread.join()
+        self.assertEqual(results, [500500])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import gc
+import unittest
+
+from yat.model import Scope, Number, ExprList, Function, FunctionDefinition, \
+    FunctionCall, Conditional, Print, Read, Reference, BinaryOperation
+from yat.hashcons import NodeFactory
+from yat.compiler import compile_tree
+from yat.folder import ConstantFolder
+from yat.stackeval import StackEvaluator
+from yat.benchmark import fib_program, chain_program
+
+
+class HashConsTest(unittest.TestCase):
+    def test_sharing(self):
+        factory = NodeFactory()
+        lhs = factory.binary(Reference('a'), '*', factory.reference('b'))
+        rhs = factory.binary(factory.reference('a'), '*', Reference('b'))
+        self.assertIs(lhs, rhs)
+        self.assertIs(lhs.lhs, factory.reference('a'))
+        self.assertIsNot(lhs, factory.binary(Reference('a'), '+', Reference('b')))
+        self.assertIsNot(factory.read('a'), factory.reference('a'))
+        self.assertIsNot(factory.exprlist(None), factory.exprlist([]))
+        self.assertIs(factory.conditional(Number(1), [Print(Number(2))]),
+                      factory.conditional(Number(1), [Print(Number(2))], None))
+
+    def test_trees(self):
+        factory = NodeFactory()
+        program = factory.visit(fib_program(10))
+        self.assertIs(program, factory.visit(fib_program(10)))
+        self.assertIs(factory.visit(program), program)
+        self.assertIsInstance(program, ExprList)
+        self.assertIsInstance(program.exprs[0].function, Function)
+        self.assertEqual(program.evaluate(Scope()).value, 55)
+        self.assertEqual(compile_tree(program)(Scope()).value, 55)
+        self.assertIs(ConstantFolder().visit(program), program)
+        functions = factory.visit(ExprList([
+            FunctionDefinition('f', Function(['x'], [Read('x')])),
+            FunctionDefinition('g', Function(['x'], [Read('x')])),
+            FunctionCall(Reference('g'), [Number(1)])]))
+        self.assertIs(functions.exprs[0].function, functions.exprs[1].function)
+
+    def test_immutable(self):
+        node = NodeFactory().binary(Number(1), '+', Number(2))
+        with self.assertRaises(AttributeError):
+            node.op = '-'
+        with self.assertRaises(AttributeError):
+            del node.lhs
+        self.assertEqual(node.evaluate().value, 3)
+
+    def test_deep(self):
+        factory = NodeFactory()
+        program = factory.visit(chain_program(50000))
+        self.assertIs(factory.visit(chain_program(50000)), program)
+        scope = Scope()
+        scope['x'] = Number(1)
+        self.assertEqual(StackEvaluator().evaluate(program, scope).value, 25001)
+
+    def test_released(self):
+        factory = NodeFactory()
+        factory.visit(BinaryOperation(Conditional(Number(1), [Number(2)]), '+', Number(3)))
+        gc.collect()
+        self.assertEqual(len(factory.table), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+
+from yat.model import Scope, Number, Function, FunctionDefinition, FunctionCall, \
+    Reference, BinaryOperation, ExprList, Print, Read
+from yat.incremental import IncrementalEvaluator, ReactiveScope
+from yat.streams import BufferedIO
+from yat.benchmark import report_program
+
+
+class IncrementalTest(unittest.TestCase):
+    def setUp(self):
+        self.scope = ReactiveScope()
+        for i in range(10):
+            self.scope['k_{}'.format(i)] = Number(i)
+        self.program = report_program(10)
+        self.evaluator = IncrementalEvaluator()
+
+    def test_same_result(self):
+        value = self.evaluator.evaluate(self.program, self.scope).value
+        self.assertEqual(value, self.program.evaluate(self.scope).value)
+
+    def test_unchanged(self):
+        self.evaluator.evaluate(self.program, self.scope)
+        misses = self.evaluator.misses
+        self.evaluator.evaluate(self.program, self.scope)
+        self.assertEqual(self.evaluator.misses, misses)
+        self.assertEqual(self.evaluator.hits, 1)
+
+    def test_one_binding(self):
+        self.evaluator.evaluate(self.program, self.scope)
+        self.scope['k_9'] = Number(100)
+        misses = self.evaluator.misses
+        value = self.evaluator.evaluate(self.program, self.scope).value
+        self.assertEqual(value, (101 * 101) * 3 - 100)
+        # the list, the last statement and its two operations
+        self.assertEqual(self.evaluator.misses - misses, 4)
+        self.scope['k_9'] = Number(100)
+        misses = self.evaluator.misses
+        self.evaluator.evaluate(self.program, self.scope)
+        self.assertEqual(self.evaluator.misses, misses)
+
+    def test_shadowed(self):
+        expr = BinaryOperation(Reference('k_1'), '+', Number(1))
+        parent = Scope()
+        parent['k_1'] = Number(1)
+        child = Scope(parent)
+        self.assertEqual(self.evaluator.evaluate(expr, child).value, 2)
+        child['k_1'] = Number(5)
+        self.assertEqual(self.evaluator.evaluate(expr, child).value, 6)
+        parent['k_1'] = Number(7)
+        self.assertEqual(self.evaluator.evaluate(expr, child).value, 6)
+        child = ReactiveScope(self.scope)
+        self.assertEqual(self.evaluator.evaluate(expr, child).value, 2)
+        self.scope['k_1'] = Number(3)
+        self.assertEqual(self.evaluator.evaluate(expr, child).value, 4)
+
+    def test_redefinition(self):
+        call = FunctionCall(Reference('f'), [Reference('k_2')])
+        self.scope['f'] = Function(['x'], [BinaryOperation(Reference('x'), '*', Number(2))])
+        self.assertEqual(self.evaluator.evaluate(call, self.scope).value, 4)
+        self.scope['f'] = Function(['x'], [BinaryOperation(Reference('x'), '-', Number(2))])
+        self.assertEqual(self.evaluator.evaluate(call, self.scope).value, 0)
+
+    def test_rebinds_what_it_read(self):
+        node = BinaryOperation(FunctionCall(Reference('f'), []), '+',
+                               FunctionCall(FunctionDefinition('f', Function([], [Number(10)])), []))
+        self.scope['f'] = Function([], [Number(1)])
+        self.assertEqual(self.evaluator.evaluate(node, self.scope).value, 11)
+        self.assertEqual(self.evaluator.evaluate(node, self.scope).value, 20)
+        self.assertEqual(node.evaluate(self.scope).value, 20)
+
+    def test_definitions_replayed(self):
+        self.evaluator.evaluate(self.program, self.scope)
+        self.scope['sq'] = Number(0)
+        self.evaluator.evaluate(self.program, self.scope)
+        self.assertIsInstance(self.scope['sq'], Function)
+
+    def test_effects(self):
+        program = ExprList([Read('k_0'), Print(BinaryOperation(Reference('k_0'), '*', Number(2)))])
+        output = io.StringIO()
+        with BufferedIO(io.StringIO('3 4'), output):
+            self.evaluator.evaluate(program, self.scope)
+            self.evaluator.evaluate(program, self.scope)
+        self.assertEqual(output.getvalue().split(), ['6', '8'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import io
+import sys
+import unittest
+
+from yat.model import Scope, Number, Function, Reference, BinaryOperation
+from yat.streams import BufferedIO
+from yat.syntax import parse
+from yat.lexical import compile_lexical, Closure
+from yat.benchmark import fib_program, loop_program, split_program, compose_program, \
+    global_program
+
+
+def run(source, scope=None):
+    return compile_lexical(parse(source))(scope or Scope())
+
+
+class LexicalTest(unittest.TestCase):
+    def test_closures(self):
+        self.assertEqual(run("def adder(n) { def add(x) { x + n; }; add; }; adder(2)(3);").value, 5)
+        self.assertEqual(run("def outer(a) { def mid(b) { def inner(c) { a + b + c; }; inner; };"
+                             " mid; }; outer(1)(10)(100);").value, 111)
+        self.assertIsInstance(run("def f() { }; f;"), Closure)
+
+    def test_lexical_not_dynamic(self):
+        scope = Scope()
+        scope['y'] = Number(7)
+        self.assertEqual(run("def g(x) { y; }; def h(y) { g(1); }; h(5);", scope).value, 7)
+        self.assertEqual(run("def k(y) { def g(x) { y; }; g; }; def h(y, f) { f(1); };"
+                             " h(5, k(3));").value, 3)
+
+    def test_late_binding(self):
+        self.assertEqual(run("def f(n) { def fact(k) { if (k < 2) { 1; }"
+                             " else { k * fact(k - 1); }; }; fact(n); }; f(10);").value, 3628800)
+
+    def test_read(self):
+        with BufferedIO(io.StringIO('4'), io.StringIO()):
+            self.assertEqual(run("def f() { def get() { x * 2; }; read x; get(); }; f();").value, 8)
+
+    def test_unbound(self):
+        with self.assertRaises(NameError):
+            run("def f() { def g() { x; }; g(); read x; }; f();")
+
+    def test_none_argument(self):
+        self.assertIsNone(run("def none() { if (0) { 1; }; }; def f(a) { def g() { a; }; g(); };"
+                              " f(none());"))
+
+    def test_plain_function(self):
+        scope = Scope()
+        scope['k'] = Number(3)
+        scope['foo'] = Function(['a'], [BinaryOperation(Reference('a'), '*', Reference('k'))])
+        self.assertEqual(run("foo(4);", scope).value, 12)
+
+    def test_programs(self):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        for program in [fib_program(12), loop_program(100), split_program(10), global_program(50)]:
+            scope = Scope()
+            scope['step'] = Number(2)
+            self.assertEqual(compile_lexical(program)(Scope(scope)).value,
+                             program.evaluate(Scope(scope)).value)
+        self.assertEqual(compile_lexical(compose_program(1000))(Scope()).value, 4000)
+        self.assertEqual(compile_lexical(loop_program(10 ** 5))(Scope()).value, 5000050000)
+
+
+if __name__ == '__main__':
+    unittest.main()
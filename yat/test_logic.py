@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import io
+import sys
+import unittest
+
+from yat.model import Scope, Number, Print, Reference, BinaryOperation, Function, \
+    FunctionDefinition, set_short_circuit
+from yat.compiler import compile_tree
+from yat.lexical import compile_lexical
+from yat.stackeval import StackEvaluator
+from yat.vm import VM
+from yat.incremental import IncrementalEvaluator
+from yat.parallel import ParallelEvaluator
+from yat.batch import compile_batch, ListColumns
+from yat.streams import BufferedIO
+from yat.benchmark import guard_program
+
+
+BACKENDS = [('evaluate', lambda node, scope: node.evaluate(scope)),
+            ('compiled', lambda node, scope: compile_tree(node)(scope)),
+            ('lexical', lambda node, scope: compile_lexical(node)(scope)),
+            ('stackeval', lambda node, scope: StackEvaluator().evaluate(node, scope)),
+            ('vm', lambda node, scope: VM().evaluate(node, scope)),
+            ('incremental', lambda node, scope: IncrementalEvaluator().evaluate(node, scope)),
+            ('parallel', lambda node, scope: ParallelEvaluator(workers=1).evaluate(node, scope))]
+
+
+def run(backend, node, scope=None):
+    """
+        (value, printed lines) of node on a backend
+    """
+    output = io.StringIO()
+    with BufferedIO(io.StringIO(), output):
+        value = backend(node, scope if scope is not None else Scope())
+    return value.value, output.getvalue().split()
+
+
+class LogicTest(unittest.TestCase):
+    def tearDown(self):
+        set_short_circuit(True)
+
+    def test_values(self):
+        for enabled in [True, False]:
+            set_short_circuit(enabled)
+            for lhs in [0, 3, -2]:
+                for rhs in [0, 5]:
+                    for op in ['&&', '||']:
+                        node = BinaryOperation(Number(lhs), op, Print(Number(rhs)))
+                        expected = (lhs and rhs) if op == '&&' else (lhs or rhs)
+                        for name, backend in BACKENDS:
+                            self.assertEqual(run(backend, node)[0], expected, name)
+
+    def test_skips_right(self):
+        node = BinaryOperation(BinaryOperation(Number(0), '&&', Print(Number(1))), '+',
+                               BinaryOperation(Number(2), '||', Print(Number(3))))
+        for name, backend in BACKENDS:
+            self.assertEqual(run(backend, node), (2, []), name)
+        set_short_circuit(False)
+        for name, backend in BACKENDS:
+            self.assertEqual(run(backend, node), (2, ['1', '3']), name)
+
+    def test_eager_right_value(self):
+        # the right operand runs, but only its effects count
+        set_short_circuit(False)
+        for lhs, op in [(0, '&&'), (3, '||')]:
+            node = BinaryOperation(Number(lhs), op,
+                                   FunctionDefinition('f', Function([], [Print(Number(1))])))
+            for name, backend in BACKENDS:
+                scope = Scope()
+                self.assertEqual(run(backend, node, scope), (lhs, []), name)
+                self.assertIsNotNone(scope['f'], name)
+
+    def test_guards(self):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        program = guard_program(100)
+        for name, backend in BACKENDS:
+            self.assertEqual(run(backend, program)[0], 112, name)
+
+    def test_batch(self):
+        expr = BinaryOperation(BinaryOperation(Reference('x'), '>', Number(0)), '&&',
+                               Print(Reference('x')))
+        output = io.StringIO()
+        with BufferedIO(io.StringIO(), output):
+            values = compile_batch(expr, columns=ListColumns())({'x': [-1, 2, 0, 5]})
+        self.assertEqual(list(values), [0, 2, 0, 5])
+        self.assertEqual(output.getvalue().split(), ['2', '5'])
+
+
+if __name__ == '__main__':
+    unittest.main()
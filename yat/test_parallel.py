@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import pickle
+import sys
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from yat.model import Scope, Number, ExprList, Function, FunctionDefinition, \
+    FunctionCall, Print, Read, Reference, BinaryOperation
+from yat.parallel import ParallelEvaluator
+from yat.hashcons import NodeFactory
+from yat.syntax import parse
+from yat.benchmark import split_program, fib_program
+
+
+class ParallelTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ProcessPoolExecutor(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def evaluator(self, **kwargs):
+        return ParallelEvaluator(workers=2, executor=self.executor, **kwargs)
+
+    def test_split(self):
+        evaluator = self.evaluator()
+        self.assertEqual(evaluator.evaluate(split_program(12), Scope()).value, 144)
+        self.assertEqual(evaluator.dispatched, 4)
+        self.assertEqual(self.evaluator(depth=0).evaluate(split_program(10), Scope()).value, 55)
+
+    def test_cheap_and_impure(self):
+        evaluator = self.evaluator()
+        self.assertEqual(evaluator.evaluate(fib_program(10), Scope()).value, 55)
+        self.assertEqual(evaluator.dispatched, 0)
+        noisy = Function(['n'], [Print(Reference('n')),
+                                 FunctionCall(Reference('noisy'), [Reference('n')])])
+        program = ExprList([FunctionDefinition('noisy', noisy),
+                            FunctionDefinition('two', Function(['x', 'y'], [Number(2)])),
+                            FunctionCall(Reference('two'),
+                                         [Print(Number(1)), BinaryOperation(Number(1), '+', Number(2))])])
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(evaluator.evaluate(program, Scope()).value, 2)
+        self.assertEqual(out.getvalue(), '1\n')
+        self.assertEqual(evaluator.dispatched, 0)
+
+    def test_none_argument(self):
+        evaluator = self.evaluator(threshold=0)
+        program = parse("def h() {}; def k(a) { 0; }; k(h());")
+        self.assertEqual(evaluator.evaluate(program, Scope()).value, 0)
+        self.assertEqual(evaluator.dispatched, 1)
+
+    def test_binding_arguments(self):
+        program = split_program(8)
+        fib = program.exprs[1].function
+        call = FunctionCall(Reference('add'), [Read('k'), FunctionCall(Reference('fib'), [Reference('k')])])
+        evaluator = self.evaluator()
+        scope = Scope()
+        evaluator.evaluate(ExprList(program.exprs[:2]), scope)
+        stdin, sys.stdin = sys.stdin, io.StringIO('9\n')
+        try:
+            self.assertEqual(evaluator.evaluate(call, scope).value, 9 + 34)
+        finally:
+            sys.stdin = stdin
+        self.assertIs(fib, scope['fib'])
+
+    def test_pickle(self):
+        program = NodeFactory().visit(split_program(6))
+        copy = pickle.loads(pickle.dumps(program))
+        self.assertEqual(copy.evaluate(Scope()).value, 8)
+        with self.assertRaises(AttributeError):
+            copy.exprs = None
+        scope = Scope()
+        scope['x'] = Number(4)
+        self.assertEqual(pickle.loads(pickle.dumps(scope))['x'].value, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
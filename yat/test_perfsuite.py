@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import contextlib
+import copy
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from yat.model import Scope, Number, ExprList, Print, BinaryOperation
+from yat.compiler import compile_tree
+from yat.serialize import dumps
+from yat.streams import BufferedIO
+from yat.folder import count_nodes
+from yat.perfsuite import generate, evaluate, fold, run_suite, record, load, compare, main, \
+    count_tree_nodes
+
+
+class PerfSuiteTest(unittest.TestCase):
+    def test_seeded(self):
+        first, again, other = generate(1), generate(1), generate(2)
+        self.assertEqual(sorted(first), ['arithmetic', 'conditionals', 'recursion', 'scopes'])
+        for shape in first:
+            self.assertEqual(dumps(first[shape]), dumps(again[shape]), shape)
+            self.assertNotEqual(dumps(first[shape]), dumps(other[shape]), shape)
+
+    def test_programs_run(self):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        for seed in range(5):
+            for shape, program in generate(seed).items():
+                value = evaluate(program).value
+                self.assertEqual(evaluate(fold(program)).value, value, (seed, shape))
+                with BufferedIO(io.StringIO(), io.StringIO()):
+                    self.assertEqual(compile_tree(program)(Scope()).value, value, (seed, shape))
+
+    def test_count_tree_nodes(self):
+        program = ExprList([Print(BinaryOperation(Number(1), '+', Number(2)))])
+        self.assertEqual(count_tree_nodes(program), 5)
+        self.assertEqual(count_nodes(program), 1)
+        self.assertEqual(count_tree_nodes(program.exprs[0].expr), 3)
+
+    def test_history(self):
+        report = run_suite(seed=3, repeat=1, number=1)
+        self.assertEqual(len(report['results']), 12)
+        self.assertGreater(report['results']['fold/arithmetic']['throughput'], 0)
+        slower = copy.deepcopy(report)
+        slower['results']['print/scopes']['throughput'] /= 2
+        self.assertEqual(compare(report, report), [])
+        self.assertEqual([name for name, old, new in compare(report, slower)], ['print/scopes'])
+        with self.assertRaises(ValueError):
+            compare(report, run_suite(seed=4, repeat=1, number=1))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'history.json')
+            record(report, path)
+            record(slower, path)
+            self.assertEqual(load(path), json.loads(json.dumps([report, slower])))
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'history.json')
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                self.assertEqual(main(['--repeat', '1', '--number', '1', '--history', path]), 0)
+                self.assertEqual(main(['--repeat', '1', '--number', '1', '--compare', path,
+                                       '--tolerance', '0.99']), 0)
+            self.assertEqual(len(load(path)), 1)
+            self.assertIn('evaluate/recursion', out.getvalue())
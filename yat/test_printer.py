@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import unittest
+
+from yat.model import Number, Function, FunctionDefinition, Conditional, Print, \
+    Read, FunctionCall, Reference, BinaryOperation, UnaryOperation, ExprList
+from yat.printer import ExpressionTerm, PrettyPrinter
+from yat.benchmark import nested_program
+
+
+class PrinterTest(unittest.TestCase):
+    def text(self, node):
+        out = io.StringIO()
+        PrettyPrinter(out).visit(node)
+        return out.getvalue()
+
+    def test_terms(self):
+        term = ExpressionTerm()
+        self.assertEqual(term.visit(UnaryOperation('-', Number(-3))), "(-(-3))")
+        self.assertEqual(term.visit(UnaryOperation('!', Reference('x'))), "!x")
+        self.assertEqual(term.visit(BinaryOperation(
+            FunctionCall(Reference('f'), [Number(1), Reference('y')]), '*', Number(-2))),
+            "(f(1, y)) * (-2)")
+        self.assertEqual(term.visit(Print(Read('x'))), "print read x")
+
+    def test_layout(self):
+        cond = Conditional(Reference('x'), [Print(Reference('x'))], [])
+        defin = FunctionDefinition('f', Function(['a', 'b'], [cond, Number(1)]))
+        self.assertEqual(self.text(defin),
+                         "def f(a, b) {\n"
+                         "\tif (x) {\n"
+                         "\t\tprint x;\n"
+                         "\t} else {\n"
+                         "\t};\n"
+                         "\t1;\n"
+                         "};\n")
+        self.assertEqual(self.text(Conditional(Number(0), [Read('y')])),
+                         "if (0) {\n\tread y;\n};\n")
+        self.assertEqual(self.text(ExprList([Number(1), Number(2)])), "\t1;\n\t2;\n")
+
+    def test_stdout(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            PrettyPrinter().visit(Reference('x'))
+        self.assertEqual(out.getvalue(), "x;\n")
+
+    def test_deep(self):
+        lines = self.text(nested_program(2000, 1)).splitlines()
+        self.assertEqual(len(lines), 2000 * 5)
+        self.assertEqual(lines[-1], "\t};")
+        self.assertEqual(lines[2 * 1999], "\t" * 2000 + "if (c) {")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+
+from yat.model import Scope, Number, BinaryOperation, Reference
+from yat.profiler import Profiler, NODE_CLASSES
+from yat.benchmark import split_program
+
+
+class ProfilerTest(unittest.TestCase):
+    def profile(self, program):
+        with Profiler() as profiler:
+            result = program.evaluate(Scope())
+        return profiler, result
+
+    def test_restores(self):
+        originals = [cls.evaluate for cls in NODE_CLASSES]
+        init = Number.__init__
+        profiler, result = self.profile(split_program(8))
+        self.assertEqual(result.value, 21)
+        self.assertEqual([cls.evaluate for cls in NODE_CLASSES], originals)
+        self.assertIs(Number.__init__, init)
+        with profiler:
+            with self.assertRaises(RuntimeError):
+                Profiler().enable()
+        self.assertEqual([cls.evaluate for cls in NODE_CLASSES], originals)
+
+    def test_counts(self):
+        program = split_program(8)
+        profiler, _ = self.profile(program)
+        self.assertEqual(profiler.functions['fib'].calls, 67)
+        self.assertEqual(profiler.functions['add'].calls, 33)
+        self.assertEqual(profiler.functions['yat'].calls, 1)
+        fib = profiler.functions['fib']
+        self.assertLessEqual(fib.time, profiler.functions['yat'].time)
+        self.assertLessEqual(fib.self_time, fib.time)
+        body = program.exprs[1].function.body.exprs[0]
+        self.assertEqual(profiler.nodes[id(body)].calls, 67)
+
+    def test_allocations(self):
+        big = BinaryOperation(Number(10 ** 6), '*', Reference('x'))
+        scope = Scope()
+        scope['x'] = Number(3)
+        with Profiler() as profiler:
+            big.evaluate(scope)
+            big.evaluate(scope)
+        self.assertEqual(profiler.nodes[id(big)].allocations, 2)
+
+    def test_outputs(self):
+        program = split_program(6)
+        profiler, _ = self.profile(program)
+        out = io.StringIO()
+        profiler.write_collapsed(out)
+        stacks = [line.rsplit(' ', 1) for line in out.getvalue().splitlines()]
+        for stack, micros in stacks:
+            self.assertTrue(stack.startswith('yat'))
+            self.assertGreater(int(micros), 0)
+        # arguments belong to the caller, add never calls fib
+        self.assertFalse(any('add;fib' in stack for stack, _ in stacks))
+        lines = profiler.annotate(program)
+        self.assertEqual(len(lines), 11)
+        self.assertIn('>', lines[-1])
+        self.assertTrue(lines[-1].endswith('fib(6);'))
+        self.assertEqual(profiler.report()[1].split()[0], 'yat')
+
+
+if __name__ == "__main__":
+    unittest.main()
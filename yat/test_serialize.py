@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from yat.model import Scope, Number, ExprList, Function, FunctionDefinition, \
+    FunctionCall, Conditional, Print, Read, Reference, BinaryOperation, \
+    UnaryOperation
+from yat.serialize import dumps, loads, dump, load, ProgramCache, VERSION
+from yat.benchmark import fib_program, wide_program
+
+
+class SerializeTest(unittest.TestCase):
+    def program(self):
+        f = Function(['a', 'b'], [Print(UnaryOperation('-', Reference('a'))),
+                                  Read('c'),
+                                  Conditional(BinaryOperation(Reference('c'), '>', Number(-7)),
+                                              None, [Number(2 ** 80)])])
+        return ExprList([FunctionDefinition('f', f),
+                         FunctionDefinition('g', f),
+                         FunctionCall(Reference('f'), []),
+                         Conditional(Number(0), [], None)])
+
+    def test_round_trip(self):
+        for program in [self.program(), fib_program(3), wide_program(10)]:
+            data = dumps(program)
+            self.assertEqual(dumps(loads(data)), data)
+
+    def test_shapes(self):
+        program = loads(dumps(self.program()))
+        self.assertIs(program.exprs[0].function, program.exprs[1].function)
+        body = program.exprs[0].function.body.exprs
+        self.assertIsNone(body[2].if_true.exprs)
+        self.assertEqual(body[2].if_false.exprs[0].value, 2 ** 80)
+        self.assertEqual(program.exprs[3].if_true.exprs, [])
+        self.assertEqual(program.exprs[2].args, [])
+
+    def test_evaluate(self):
+        program = loads(dumps(fib_program(10)))
+        self.assertEqual(program.evaluate(Scope()).value, 55)
+
+    def test_deep(self):
+        node = Number(0)
+        for i in range(50000):
+            node = BinaryOperation(node, '+', Number(1))
+        data = dumps(node)
+        self.assertEqual(dumps(loads(data)), data)
+
+    def test_bad_data(self):
+        data = dumps(Number(1))
+        self.assertRaises(ValueError, loads, b'nope' + data[4:])
+        stale = bytearray(data)
+        stale[4] = VERSION + 1
+        self.assertRaises(ValueError, loads, bytes(stale))
+        self.assertRaises(ValueError, loads, data[:-4])
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'program.yatc')
+            dump(fib_program(5), path)
+            self.assertEqual(dumps(load(path)), dumps(fib_program(5)))
+
+    def test_cache(self):
+        built = []
+
+        def build():
+            built.append(1)
+            return wide_program(3)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ProgramCache(directory)
+            first = cache.get(b'wide 3', build)
+            second = ProgramCache(directory).get(b'wide 3', build)
+            self.assertEqual(len(built), 1)
+            self.assertEqual(dumps(first), dumps(second))
+            folded = cache.fold(fib_program(4))
+            self.assertEqual(dumps(cache.fold(fib_program(4))), dumps(folded))
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import asyncio
+import io
+import threading
+import unittest
+
+from yat.model import current_io
+from yat.syntax import parse
+from yat.session import Interpreter, BudgetExceeded
+from yat.benchmark import fib_program, loop_program
+
+
+ECHO = parse("read n; def twice(x) { x * 2; }; print twice(n); twice(n) + 1;")
+
+
+class SessionTest(unittest.TestCase):
+    def test_evaluate(self):
+        session = Interpreter(io.StringIO('5'))
+        self.assertEqual(session.evaluate(ECHO).value, 11)
+        self.assertEqual(session.output.getvalue(), '10\n')
+        self.assertEqual(session.evaluate(parse("twice(n + 1);")).value, 12)
+        self.assertEqual(session.evaluate(fib_program(10)).value, 55)
+
+    def test_io_restored(self):
+        before = current_io()
+        session = Interpreter()
+        session.evaluate(parse("print 1;"))
+        self.assertIs(current_io(), before)
+        with self.assertRaises(ZeroDivisionError):
+            session.evaluate(parse("print 2; 1 / 0;"))
+        self.assertIs(current_io(), before)
+        self.assertEqual(session.output.getvalue(), '1\n2\n')
+
+    def test_steps(self):
+        session = Interpreter(steps=10 ** 4, every=100)
+        with self.assertRaises(BudgetExceeded):
+            session.evaluate(parse("def spin() { spin(); }; spin();"))
+        self.assertEqual(session.evaluator.todo, [])
+        self.assertEqual(session.evaluator.values, [])
+        self.assertEqual(session.evaluate(loop_program(10)).value, 55)
+
+    def test_seconds(self):
+        session = Interpreter(seconds=0.05)
+        with self.assertRaises(BudgetExceeded):
+            session.evaluate(parse("def spin() { spin(); }; spin();"))
+
+    def test_async(self):
+        async def main(count):
+            sessions = [Interpreter(io.StringIO(str(i)), every=50) for i in range(count)]
+            results = await asyncio.gather(*[session.evaluate_async(ECHO) for session in sessions])
+            return sessions, results
+
+        sessions, results = asyncio.run(main(1000))
+        for i, (session, result) in enumerate(zip(sessions, results)):
+            self.assertEqual(result.value, 2 * i + 1)
+            self.assertEqual(session.output.getvalue(), '{}\n'.format(2 * i))
+            self.assertEqual(session.scope['n'].value, i)
+
+    def test_threads(self):
+        sessions = [Interpreter(io.StringIO(str(i)), every=10) for i in range(8)]
+        results = [None] * len(sessions)
+
+        def run(index):
+            results[index] = sessions[index].evaluate(ECHO).value
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(sessions))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [2 * i + 1 for i in range(len(sessions))])
+        for i, session in enumerate(sessions):
+            self.assertEqual(session.output.getvalue(), '{}\n'.format(2 * i))
+
+    def test_shared_program(self):
+        program = loop_program(50)
+        first, second = Interpreter(every=7), Interpreter(every=3)
+        runs = [first.run(program), second.run(program)]
+        results = [None, None]
+        while None in results:
+            for index, chunks in enumerate(runs):
+                if results[index] is None:
+                    try:
+                        next(chunks)
+                    except StopIteration as stop:
+                        results[index] = stop.value
+        self.assertEqual([result.value for result in results], [1275, 1275])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+from yat.model import Scope, Number, ExprList, Print, Read, Reference, \
+    BinaryOperation, UnaryOperation, current_io
+from yat.compiler import compile_tree
+from yat.stackeval import StackEvaluator
+from yat.vm import VM
+from yat.streams import BufferedIO
+from yat.benchmark import echo_program
+
+
+NUMBERS = [0, 5, -17, 12345678901234567890, 3]
+
+
+def console(run, text):
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(text)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            run()
+    finally:
+        sys.stdin = stdin
+    return out.getvalue().encode('ascii')
+
+
+def buffered(run, data, buffer_size=1 << 16):
+    output = io.BytesIO()
+    with BufferedIO(io.BytesIO(data), output, buffer_size):
+        run()
+    return output.getvalue()
+
+
+class StreamsTest(unittest.TestCase):
+    def test_same_output(self):
+        program = echo_program(len(NUMBERS))
+        text = ''.join('{}\n'.format(number) for number in NUMBERS)
+        expected = console(lambda: program.evaluate(Scope()), text)
+        self.assertEqual(expected, text.encode('ascii'))
+        compiled = compile_tree(program)
+        for run in [lambda: program.evaluate(Scope()),
+                    lambda: compiled(Scope()),
+                    lambda: StackEvaluator().evaluate(program, Scope()),
+                    lambda: VM().evaluate(program, Scope())]:
+            for size in [1, 3, 1 << 16]:
+                self.assertEqual(buffered(run, text.encode('ascii'), size), expected)
+
+    def test_comparisons(self):
+        program = ExprList([Print(BinaryOperation(Number(1), '<', Number(2))),
+                            Print(UnaryOperation('!', Number(0))),
+                            Print(BinaryOperation(Number(3), '&&', Number(0)))])
+        self.assertEqual(buffered(lambda: program.evaluate(Scope()), b''),
+                         console(lambda: program.evaluate(Scope()), ''))
+
+    def test_tokens(self):
+        stream = BufferedIO(io.BytesIO(b'  1 22\n\n-3\t4'), io.BytesIO(), 2)
+        self.assertEqual([stream.read() for _ in range(4)], [1, 22, -3, 4])
+        with self.assertRaises(EOFError):
+            stream.read()
+        text = BufferedIO(io.StringIO('7 8'), io.StringIO())
+        self.assertEqual([text.read(), text.read()], [7, 8])
+
+    def test_flush_before_read(self):
+        output = io.BytesIO()
+        with BufferedIO(io.BytesIO(b'2'), output):
+            Print(Number(1)).evaluate(Scope())
+            self.assertEqual(output.getvalue(), b'')
+            Read('x').evaluate(Scope())
+            self.assertEqual(output.getvalue(), b'1\n')
+        self.assertIsNot(type(current_io()), BufferedIO)
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'in')
+            target = os.path.join(directory, 'out')
+            with open(source, 'w') as f:
+                f.write('4\n5\n')
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                with BufferedIO(src, dst):
+                    compile_tree(echo_program(2))(Scope())
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), b'4\n5\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
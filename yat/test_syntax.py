@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+
+from yat.model import Scope, Number, ExprList, Conditional, FunctionDefinition, FunctionCall, \
+    UnaryOperation, Print, Read
+from yat.printer import PrettyPrinter
+from yat.syntax import parse, tokenize
+from yat.benchmark import split_program, helper_program, generated_program, nested_program, \
+    chain_program
+
+
+def text(node):
+    out = io.StringIO()
+    PrettyPrinter(out).visit(node)
+    return out.getvalue()
+
+
+class SyntaxTest(unittest.TestCase):
+    def expr(self, source):
+        return parse(source + ';').exprs[0]
+
+    def test_tokens(self):
+        self.assertEqual(tokenize("if(x>=10){print -x;};"),
+                         ['if', '(', 'x', '>=', '10', ')', '{', 'print', '-', 'x', ';',
+                          '}', ';', ''])
+
+    def test_precedence(self):
+        expr = self.expr("1 + 2 * 3 == 7 && !0 || x - 1 - 1")
+        self.assertEqual(expr.op, '||')
+        self.assertEqual(expr.lhs.op, '&&')
+        self.assertEqual(expr.lhs.lhs.lhs.rhs.op, '*')
+        self.assertEqual(expr.rhs.lhs.op, '-')
+        scope = Scope()
+        scope['x'] = Number(5)
+        self.assertEqual(expr.evaluate(scope).value, True)
+
+    def test_unary(self):
+        self.assertEqual(self.expr("-3").value, -3)
+        self.assertIsInstance(self.expr("-(3)"), UnaryOperation)
+        minus = self.expr("(-(-3))")
+        self.assertIsInstance(minus, UnaryOperation)
+        self.assertEqual(minus.expr.value, -3)
+        self.assertEqual(self.expr("!a * b").lhs.op, '!')
+
+    def test_statements(self):
+        program = parse("def f(a, b) { if (a) { print b; } else { }; read c; }; f(1)(2);")
+        defin, call = program.exprs
+        self.assertIsInstance(defin, FunctionDefinition)
+        self.assertEqual(defin.function.args, ['a', 'b'])
+        cond, rd = defin.function.body.exprs
+        self.assertIsInstance(cond, Conditional)
+        self.assertIsInstance(cond.if_true.exprs[0], Print)
+        self.assertEqual(cond.if_false.exprs, [])
+        self.assertIsInstance(rd, Read)
+        self.assertIsInstance(call.fun_expr, FunctionCall)
+        self.assertIsNone(parse("if (1) { 2; };").exprs[0].if_false.exprs)
+
+    def test_round_trip(self):
+        programs = [split_program(10), helper_program(3), nested_program(3000, 1)]
+        programs += [generated_program(seed) for seed in range(20)]
+        programs += [ExprList([UnaryOperation('-', Number(3)), UnaryOperation('-', Number(-3)),
+                               UnaryOperation('-', UnaryOperation('-', Number(3))), Number(-3)])]
+        for program in programs:
+            source = text(program)
+            self.assertEqual(text(parse(source)), source)
+        self.assertIsInstance(parse(text(ExprList([UnaryOperation('-', Number(3))]))).exprs[0],
+                              UnaryOperation)
+        scope = Scope()
+        self.assertEqual(parse(text(split_program(10))).evaluate(scope).value, 55)
+
+    def test_deep_round_trip(self):
+        for program in [chain_program(50000),
+                        parse("f(" * 20000 + "-(!x)" + ")" * 20000 + ";"),
+                        parse("print " * 20000 + "1 + 2;")]:
+            source = text(program)
+            self.assertEqual(text(parse(source)), source)
+
+    def test_errors(self):
+        for source, where in [("1 +;", "line 1, column 4"),
+                              ("def f(1) {};", "line 1, column 7"),
+                              ("if (x) {\n  1;\n", "line 3, column 1"),
+                              ("x;\n};", "line 2, column 1"),
+                              ("x $ y;", "line 1, column 3")]:
+            with self.assertRaises(SyntaxError) as caught:
+                parse(source)
+            self.assertIn(where, str(caught.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+from unittest import mock
+
+from yat.model import Number, Function, FunctionDefinition, Conditional, Print, Read, \
+    FunctionCall, Reference, BinaryOperation, UnaryOperation, ExprList
+from yat import traversal
+from yat.traversal import postorder, DESCEND
+from yat.folder import ConstantFolder
+from yat.printer import PrettyPrinter, ExpressionTerm
+from yat.hashcons import NodeFactory
+from yat.benchmark import split_program
+
+
+class Trace:
+    """
+        the order nodes are left in, and the tree rebuilt from results
+    """
+    def __init__(self):
+        self.order = []
+
+    def leaf(self, node):
+        self.order.append(type(node).__name__)
+        return node
+
+    visit_number = leaf
+    visit_reference = leaf
+    visit_read = leaf
+
+    def visit_binary(self, bin_op, lhs, rhs):
+        self.order.append(bin_op.op)
+        return BinaryOperation(lhs, bin_op.op, rhs)
+
+    def visit_unary(self, un_op, expr):
+        self.order.append(un_op.op)
+        return UnaryOperation(un_op.op, expr)
+
+    def visit_print(self, prnt, expr):
+        self.order.append('print')
+        return Print(expr)
+
+    def visit_function(self, function, body):
+        return Function(function.args, body.exprs)
+
+    def visit_definition(self, f_def, function):
+        self.order.append(f_def.name)
+        return FunctionDefinition(f_def.name, function)
+
+    def visit_conditional(self, cond, condition, if_true, if_false):
+        self.order.append('if')
+        return Conditional(condition, if_true.exprs, if_false.exprs)
+
+    def visit_call(self, call, fun_expr, args):
+        self.order.append('call')
+        return FunctionCall(fun_expr, args)
+
+    def visit_exprlist(self, expr_list, exprs):
+        return ExprList(exprs if expr_list.list_exists() else None)
+
+
+def text(node):
+    out = io.StringIO()
+    PrettyPrinter(out).visit(node)
+    return out.getvalue()
+
+
+def chain(n):
+    expr = Reference('x')
+    for i in range(n):
+        expr = BinaryOperation(expr, '+', BinaryOperation(Number(i % 3), '*', Number(i % 2)))
+    return expr
+
+
+class TraversalTest(unittest.TestCase):
+    def program(self):
+        return ExprList([
+            FunctionDefinition('f', Function(['a'], [Print(UnaryOperation('-', Reference('a')))])),
+            Conditional(BinaryOperation(Read('y'), '<', Number(1)),
+                        [FunctionCall(Reference('f'), [Number(2), Reference('y')])])])
+
+    def test_order(self):
+        program = self.program()
+        trace = Trace()
+        rebuilt = postorder(trace, program)
+        self.assertEqual(trace.order, ['Reference', '-', 'print', 'f', 'Read', 'Number', '<',
+                                       'Reference', 'Number', 'Reference', 'call', 'if'])
+        self.assertEqual(text(rebuilt), text(program))
+
+    def test_explicit_stack(self):
+        program = self.program()
+        expected = Trace()
+        postorder(expected, program)
+        for depth in range(4):
+            with mock.patch.object(traversal, 'RECURSION', depth):
+                trace = Trace()
+                self.assertEqual(text(postorder(trace, program)), text(program))
+                self.assertEqual(trace.order, expected.order)
+
+    def test_enter(self):
+        trace = Trace()
+        trace.enter_function = lambda function: Function(['skipped'], [])
+        trace.enter_number = lambda num: Number(7) if num.value == 2 else DESCEND
+        rebuilt = postorder(trace, self.program())
+        self.assertEqual(rebuilt.exprs[0].function.args, ['skipped'])
+        self.assertEqual(rebuilt.exprs[1].if_true.exprs[0].args[0].value, 7)
+        self.assertNotIn('print', trace.order)
+
+    def test_interned(self):
+        program = NodeFactory().visit(split_program(5))
+        self.assertEqual(text(postorder(Trace(), program)), text(program))
+
+    def test_access(self):
+        # visitors made children first still work through access()
+        expr = BinaryOperation(Number(2), '*', BinaryOperation(Reference('x'), '+', Number(0)))
+        folded = expr.access(ConstantFolder())
+        self.assertEqual(text(folded), text(BinaryOperation(Number(2), '*', Reference('x'))))
+        self.assertEqual(UnaryOperation('-', expr).access(ExpressionTerm()), "(-(2 * (x + 0)))")
+        first, second = PrettyPrinter(), PrettyPrinter()
+        self.assertIsNot(first.expTrm, second.expTrm)
+
+    def test_deep(self):
+        expr = chain(50000)
+        folded = ConstantFolder().visit(ExprList([expr]))
+        self.assertEqual(text(folded).count('+'), 16667)
+        self.assertEqual(len(text(expr)), 600001)
+
+
+if __name__ == '__main__':
+    unittest.main()
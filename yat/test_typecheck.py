@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import io
+import sys
+import unittest
+
+from yat.model import Scope, Number, Function, FunctionDefinition, Reference, BinaryOperation
+from yat.syntax import parse
+from yat.streams import BufferedIO
+from yat.compiler import compile_tree
+from yat.typecheck import check, NUMBER, NOTHING, FunctionType
+from yat.benchmark import fib_program, loop_program, split_program, helper_program, \
+    guard_program, echo_program, generated_program
+
+
+class TypeCheckTest(unittest.TestCase):
+    def assertRejected(self, source, message, scope=None):
+        with self.assertRaises(TypeError) as caught:
+            check(parse(source), scope)
+        self.assertIn(message, str(caught.exception))
+
+    def test_types(self):
+        self.assertEqual(check(fib_program(5)).result, NUMBER)
+        self.assertEqual(check(echo_program(5)).result, NOTHING)
+        self.assertIsInstance(check(parse("def f(a, b) { a + b; }; f;")).result, FunctionType)
+
+    def test_errors(self):
+        self.assertRejected("def f(a) { a; }; f(1, 2);", "'f' takes 1 argument, called with 2")
+        self.assertRejected("def f(a) { a; }; f(1)(2);", "called value is a number")
+        self.assertRejected("def f(a) { a + 1; }; f(f);", "argument 1 of 'f' is a function")
+        self.assertRejected("def f(a) { a(a); }; f(f);", "contain its own type")
+        self.assertRejected("def f(a) { if (a) { 1; }; }; f(1) + 1;",
+                            "one branch of a conditional is nothing")
+        self.assertRejected("def f(a) { 1; }; def f(a, b) { 2; };",
+                            "'f' is a function of 1 argument, expected a function of 2")
+        self.assertRejected("def f(a) { 1; }; f(read x);", "arguments of a call of 'f' bind")
+        self.assertRejected("read x; def f(a) { a; }; f(read x); print x;",
+                            "arguments of a call of 'f' bind")
+        program = parse("def g() { 1; }; def f(a) { a; }; f(g);")
+        program.exprs[-1].args = [FunctionDefinition('g', Function([], [Number(2)]))]
+        with self.assertRaises(TypeError):
+            check(program)
+
+    def test_bound(self):
+        self.assertRejected("x + 1;", "'x' may be read before it is bound")
+        self.assertRejected("if (1) { read x; }; x;", "'x' may be read")
+        self.assertRejected("def f(a) { y; }; f(1); def y() { };", "'y' is read by a function")
+        check(parse("def f(a) { y; }; def y() { }; f(1);"))
+        scope = Scope()
+        scope['x'] = Number(2)
+        self.assertEqual(check(parse("x + 1;"), scope).inputs, {'x': scope['x']})
+
+    def test_unboxed(self):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+        scope = Scope()
+        scope['debug'] = Number(0)
+        programs = [fib_program(12), loop_program(300), split_program(10), helper_program(100),
+                    guard_program(100)] + [generated_program(seed) for seed in range(10)]
+        for program in programs:
+            expected, got = io.StringIO(), io.StringIO()
+            with BufferedIO(io.StringIO(), expected):
+                value = compile_tree(program)(Scope(scope)).value
+            with BufferedIO(io.StringIO(), got):
+                self.assertEqual(check(program, scope).compile()(Scope(scope)).value, value)
+            self.assertEqual(got.getvalue(), expected.getvalue())
+
+    def test_scope(self):
+        scope = Scope()
+        scope['k'] = Number(3)
+        scope['g'] = Function(['a'], [BinaryOperation(Reference('a'), '*', Reference('k'))])
+        run = check(parse("def f(a) { a < 5; }; read x; g(x) + f(x);"), scope).compile()
+        with BufferedIO(io.StringIO('4'), io.StringIO()):
+            self.assertEqual(run(scope).value, 13)
+        self.assertEqual(scope['x'].value, 4)
+        self.assertIsInstance(scope['f'], Function)
+        scope['k'] = Function([], [])
+        with self.assertRaises(TypeError):
+            run(scope)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import unittest
+import io
+import sys
+
+from yat.model import Scope, Number, ExprList, Function, FunctionDefinition, \
+    FunctionCall, Conditional, Print, Read, Reference, BinaryOperation, \
+    UnaryOperation
+from yat.vm import VM, CodeGenerator, disassemble
+from yat.benchmark import fib_program, loop_program, sum_program
+
+
+class VMTest(unittest.TestCase):
+    def setUp(self):
+        self.backup_out = sys.stdout
+        self.backup_in = sys.stdin
+        sys.stdout = io.StringIO()
+        sys.stdin = io.StringIO("7\n8\n")
+
+    def tearDown(self):
+        sys.stdout = self.backup_out
+        sys.stdin = self.backup_in
+
+    def test_operations(self):
+        scope = Scope()
+        scope["a"] = Number(42)
+        scope["b"] = Number(-39)
+        for op in ['+', '-', '*', '/', '%', '==', '!=',
+                   '<', '>', '<=', '>=', '&&', '||']:
+            node = BinaryOperation(Reference("a"), op, UnaryOperation('-', Reference("b")))
+            self.assertEqual(VM().evaluate(node, scope).value,
+                             node.evaluate(scope).value)
+
+    def test_programs(self):
+        for program in [fib_program(10), loop_program(50), sum_program(50)]:
+            self.assertEqual(VM().evaluate(program, Scope()).value,
+                             program.evaluate(Scope()).value)
+
+    def test_empty(self):
+        self.assertIsNone(VM().evaluate(Conditional(Number(0), [Number(1)]), Scope()))
+        self.assertIsNone(VM().evaluate(ExprList([]), Scope()))
+
+    def test_io(self):
+        scope = Scope()
+        f = Function(['x'], [Print(BinaryOperation(Reference('x'), '+', Reference('y')))])
+        VM().evaluate(ExprList([Read('y'),
+                                FunctionDefinition('f', f),
+                                FunctionCall(Reference('f'), [Read('y')])]), scope)
+        self.assertEqual(sys.stdout.getvalue(), "16\n")
+        self.assertEqual(scope['y'].value, 7)
+
+    def test_deep(self):
+        n = 10 ** 5
+        self.assertEqual(VM().evaluate(sum_program(n), Scope()).value,
+                         n * (n + 1) // 2)
+        self.assertEqual(VM().evaluate(loop_program(n), Scope()).value,
+                         n * (n + 1) // 2)
+
+    def test_disassemble(self):
+        vm = VM()
+        scope = Scope()
+        vm.evaluate(loop_program(1), scope)
+        lines = disassemble(vm.function_code(scope['loop']))
+        self.assertIn('TAIL_CALL', lines[-2])
+        self.assertEqual(lines[-1].split(), ['28', 'RETURN'])
+        lines = disassemble(CodeGenerator().code(Number(5)))
+        self.assertEqual(lines[0].split(), ['0', 'CONST', '0', '5'])
+
+
+if __name__ == "__main__":
+    unittest.main()
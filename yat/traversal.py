@@ -0,0 +1,313 @@
+import functools
+
+from yat.model import *
+
+
+DESCEND = object()
+
+RECURSION = 100
+
+LEAF, BINARY, UNARY, PRINT, FUNCTION, DEFINITION, CONDITIONAL, CALL, LIST = range(9)
+
+SHAPES = {
+    Number: ('number', LEAF),
+    Reference: ('reference', LEAF),
+    Read: ('read', LEAF),
+    BinaryOperation: ('binary', BINARY),
+    UnaryOperation: ('unary', UNARY),
+    Print: ('print', PRINT),
+    Function: ('function', FUNCTION),
+    FunctionDefinition: ('definition', DEFINITION),
+    Conditional: ('conditional', CONDITIONAL),
+    FunctionCall: ('call', CALL),
+    ExprList: ('exprlist', LIST),
+}
+
+
+def shape(cls):
+    """
+        (method suffix, kind) of a node class or of the
+        model class it derives from
+    """
+    found = SHAPES.get(cls)
+    if found is None:
+        for base in cls.__mro__:
+            if base in SHAPES:
+                found = SHAPES[cls] = SHAPES[base]
+                break
+        else:
+            raise TypeError("not a yat node: {}".format(cls.__name__))
+    return found
+
+
+def children(node):
+    """
+        the nodes directly below node, in evaluation order
+    """
+    kind = shape(type(node))[1]
+    if kind == BINARY:
+        return [node.lhs, node.rhs]
+    if kind == UNARY or kind == PRINT:
+        return [node.expr]
+    if kind == FUNCTION:
+        return [node.body]
+    if kind == DEFINITION:
+        return [node.function]
+    if kind == CONDITIONAL:
+        return [node.condition, node.if_true, node.if_false]
+    if kind == CALL:
+        return [node.fun_expr] + list(node.args)
+    if kind == LIST:
+        return list(node.exprs or [])
+    return []
+
+
+def children_first(method):
+    """
+        marks a visit_* method that postorder calls with the results for
+        the children of its node. Called through access() with the node
+        alone, the way visitors were called before postorder, it gives
+        what the visitor's visit() gives for the node.
+    """
+    @functools.wraps(method)
+    def visit(self, node, *results):
+        if not results:
+            return self.visit(node)
+        return method(self, node, *results)
+    return visit
+
+
+def visit_method(visitor, name):
+    """
+        the visit_* method of visitor that postorder calls, None if
+        it has none
+    """
+    method = getattr(visitor, 'visit_' + name, None)
+    wrapped = getattr(method, '__wrapped__', None)
+    if wrapped is not None:
+        return wrapped.__get__(visitor)
+    return method
+
+
+def dispatcher(visitor):
+    """
+        per node class (visit method, kind, enter method or None)
+    """
+    table = dict()
+
+    def lookup(cls):
+        entry = table.get(cls)
+        if entry is None:
+            name, kind = shape(cls)
+            entry = table[cls] = (visit_method(visitor, name), kind,
+                                  getattr(visitor, 'enter_' + name, None))
+        return entry
+    return lookup
+
+
+def iterate(lookup, root):
+    """
+        postorder with an explicit stack
+    """
+    values = []
+    push = values.append
+    take = values.pop
+    todo = [root]
+    later = todo.append
+    pop = todo.pop
+    while todo:
+        item = pop()
+        if type(item) is tuple:
+            node, method, kind, count = item
+            if kind == BINARY:
+                rhs = take()
+                push(method(node, take(), rhs))
+            elif kind == CONDITIONAL:
+                if_false = take()
+                if_true = take()
+                push(method(node, take(), if_true, if_false))
+            elif kind == LIST or kind == CALL:
+                results = values[len(values) - count:]
+                del values[len(values) - count:]
+                if kind == LIST:
+                    push(method(node, results))
+                else:
+                    push(method(node, results[0], results[1:]))
+            else:
+                push(method(node, take()))
+            continue
+        method, kind, enter = lookup(type(item))
+        if enter is not None:
+            entered = enter(item)
+            if entered is not DESCEND:
+                push(entered)
+                continue
+        if kind == LEAF:
+            push(method(item))
+        elif kind == BINARY:
+            later((item, method, kind, 2))
+            later(item.rhs)
+            later(item.lhs)
+        elif kind == UNARY or kind == PRINT:
+            later((item, method, kind, 1))
+            later(item.expr)
+        elif kind == LIST:
+            exprs = item.exprs or []
+            later((item, method, kind, len(exprs)))
+            todo.extend(reversed(exprs))
+        else:
+            kids = children(item)
+            later((item, method, kind, len(kids)))
+            todo.extend(reversed(kids))
+    return values[0]
+
+
+class Postorder:
+    """
+        postorder by plain recursion through access(), the fastest walk
+        in Python, handing subtrees deeper than RECURSION to iterate.
+        Made once for a visitor, it walks any number of trees.
+    """
+    def __init__(self, visitor):
+        self.visitor = visitor
+        self.lookup = dispatcher(visitor)
+        self.depth = 0
+        for name, kind in set(SHAPES.values()):
+            method = visit_method(visitor, name)
+            if method is None:
+                continue
+            # leaves go straight to the visitor, the others through
+            # the methods below, which find the visitor's under name
+            if kind == LEAF:
+                setattr(self, 'visit_' + name, method)
+            else:
+                setattr(self, name, method)
+            enter = getattr(visitor, 'enter_' + name, None)
+            if enter is not None:
+                setattr(self, 'visit_' + name, self.entering(enter, getattr(self, 'visit_' + name)))
+
+    def visit(self, root):
+        self.depth = 0
+        return root.access(self)
+
+    @staticmethod
+    def entering(enter, walk):
+        def visit(node):
+            entered = enter(node)
+            if entered is not DESCEND:
+                return entered
+            return walk(node)
+        return visit
+
+    def visit_binary(self, bin_op):
+        if self.depth >= RECURSION:
+            return iterate(self.lookup, bin_op)
+        self.depth += 1
+        lhs = bin_op.lhs.access(self)
+        rhs = bin_op.rhs.access(self)
+        self.depth -= 1
+        return self.binary(bin_op, lhs, rhs)
+
+    def visit_unary(self, un_op):
+        if self.depth >= RECURSION:
+            return iterate(self.lookup, un_op)
+        self.depth += 1
+        expr = un_op.expr.access(self)
+        self.depth -= 1
+        return self.unary(un_op, expr)
+
+    def visit_print(self, prnt):
+        if self.depth >= RECURSION:
+            return iterate(self.lookup, prnt)
+        self.depth += 1
+        expr = prnt.expr.access(self)
+        self.depth -= 1
+        return self.print(prnt, expr)
+
+    def visit_function(self, function):
+        if self.depth >= RECURSION:
+            return iterate(self.lookup, function)
+        self.depth += 1
+        body = function.body.access(self)
+        self.depth -= 1
+        return self.function(function, body)
+
+    def visit_definition(self, f_def):
+        if self.depth >= RECURSION:
+            return iterate(self.lookup, f_def)
+        self.depth += 1
+        function = f_def.function.access(self)
+        self.depth -= 1
+        return self.definition(f_def, function)
+
+    def visit_conditional(self, cond):
+        if self.depth >= RECURSION:
+            return iterate(self.lookup, cond)
+        self.depth += 1
+        condition = cond.condition.access(self)
+        if_true = cond.if_true.access(self)
+        if_false = cond.if_false.access(self)
+        self.depth -= 1
+        return self.conditional(cond, condition, if_true, if_false)
+
+    def visit_call(self, call):
+        if self.depth >= RECURSION:
+            return iterate(self.lookup, call)
+        self.depth += 1
+        fun_expr = call.fun_expr.access(self)
+        args = [arg.access(self) for arg in call.args]
+        self.depth -= 1
+        return self.call(call, fun_expr, args)
+
+    def visit_exprlist(self, expr_list):
+        if self.depth >= RECURSION:
+            return iterate(self.lookup, expr_list)
+        self.depth += 1
+        exprs = [expr.access(self) for expr in expr_list.exprs or []]
+        self.depth -= 1
+        return self.exprlist(expr_list, exprs)
+
+
+def postorder(visitor, root):
+    """
+        calls the visit_* method of visitor for every node of root,
+        children first, with the node and what was returned for its
+        children, and returns what was returned for root:
+
+            visit_number(num), visit_reference(ref), visit_read(rd)
+            visit_binary(bin_op, lhs, rhs), visit_unary(un_op, expr)
+            visit_print(prnt, expr), visit_function(function, body)
+            visit_definition(f_def, function)
+            visit_conditional(cond, condition, if_true, if_false)
+            visit_call(call, fun_expr, [arg, ...])
+            visit_exprlist(expr_list, [expr, ...])
+
+        Where the visitor has an enter_* method of the same suffix, it
+        is called with the node first; returning anything but DESCEND
+        uses that for the node and skips its subtree.
+
+        The first RECURSION levels are walked by recursion, the subtrees
+        below them with an explicit stack, so the depth of root does not
+        matter.
+    """
+    return Postorder(visitor).visit(root)
+
+
+def flatten(rope):
+    """
+        the text of a rope, a string or a tuple of ropes
+    """
+    if type(rope) is str:
+        return rope
+    parts = []
+    append = parts.append
+    todo = [rope]
+    pop = todo.pop
+    extend = todo.extend
+    while todo:
+        rope = pop()
+        if type(rope) is str:
+            append(rope)
+        else:
+            extend(rope[::-1])
+    return "".join(parts)
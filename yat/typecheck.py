@@ -0,0 +1,545 @@
+from yat.model import *
+from yat.resolver import binds_names
+
+
+NUMBER = 'a number'
+NOTHING = 'nothing'
+
+
+class Var:
+    """
+        a type not known yet, bound to one once it is
+    """
+    __slots__ = ('type',)
+
+    def __init__(self):
+        self.type = None
+
+
+class FunctionType:
+    __slots__ = ('params', 'result')
+
+    def __init__(self, params, result):
+        self.params = params
+        self.result = result
+
+
+def prune(t):
+    while isinstance(t, Var) and t.type is not None:
+        t = t.type
+    return t
+
+
+def occurs(var, t):
+    todo = [t]
+    while todo:
+        t = prune(todo.pop())
+        if t is var:
+            return True
+        if isinstance(t, FunctionType):
+            todo.extend(t.params)
+            todo.append(t.result)
+    return False
+
+
+def unify(a, b):
+    """
+        makes a and b the same type, tells if they can be
+    """
+    a, b = prune(a), prune(b)
+    if a is b:
+        return True
+    if isinstance(b, Var):
+        a, b = b, a
+    if isinstance(a, Var):
+        if occurs(a, b):
+            return False
+        a.type = b
+        return True
+    if isinstance(a, FunctionType) and isinstance(b, FunctionType):
+        return len(a.params) == len(b.params) and \
+            all(unify(x, y) for x, y in zip(a.params, b.params)) and \
+            unify(a.result, b.result)
+    return a == b
+
+
+def describe(t):
+    t = prune(t)
+    if isinstance(t, FunctionType):
+        count = len(t.params)
+        return "a function of {} argument{}".format(count, "" if count == 1 else "s")
+    if isinstance(t, Var):
+        return "anything"
+    return t
+
+
+class Checker:
+    """
+        infers a type for every name of a program: a number, nothing
+        or a function of some arguments returning one. yat scoping is
+        dynamic, so a name read anywhere may see a binding made anywhere
+        else, and every binding of a name must have the same type.
+
+        Also checks that a name is bound before it is read: at top level
+        and inside a function body by what was bound before, on every
+        path. A name a function body reads without binding it first is
+        left to the calling frames, so it has to be bound at top level
+        before any statement that calls a function. Names the program
+        does not bind are taken from scope, if it has them.
+
+        Calls must pass exactly the arguments their function takes, and
+        must not bind names in their arguments. Function nodes may only
+        appear in definitions.
+    """
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.names = dict()
+        self.inputs = dict()
+        self.functions = dict()
+        self.free = set()
+        self.bound = set()
+        self.depth = 0
+        self.calls = 0
+
+    def name(self, name):
+        var = self.names.get(name)
+        if var is None:
+            var = self.names[name] = Var()
+        return var
+
+    def fail(self, message, *args):
+        raise TypeError(message.format(*args))
+
+    def expect(self, t, expected, what):
+        if not unify(t, expected):
+            if isinstance(prune(t), Var) or isinstance(prune(expected), Var):
+                self.fail("{} would have to contain its own type", what)
+            self.fail("{} is {}, expected {}", what, describe(t), describe(expected))
+
+    def input(self, name):
+        """
+            binds name from scope for the whole program, tells if it could
+        """
+        if name in self.inputs:
+            return True
+        if self.scope is None:
+            return False
+        try:
+            value = self.scope[name]
+        except (KeyError, TypeError):
+            return False
+        if isinstance(value, Number):
+            self.inputs[name] = value
+            self.expect(self.name(name), NUMBER, "'{}'".format(name))
+        elif isinstance(value, Function):
+            self.inputs[name] = value
+            self.expect(self.name(name), self.function(value), "'{}'".format(name))
+        else:
+            return False
+        return True
+
+    def check(self, node):
+        """
+            the type of the value of program node
+        """
+        statements = node.exprs or [] if isinstance(node, ExprList) else [node]
+        # top-level statements that call, with the names bound before them
+        calling = []
+        result = NOTHING
+        for i, statement in enumerate(statements):
+            bound = set(self.bound)
+            calls = self.calls
+            result = self.infer(statement, i == len(statements) - 1)
+            if self.calls != calls:
+                calling.append(bound)
+        for bound in calling:
+            for name in sorted(self.free):
+                if name not in bound and not self.input(name):
+                    self.fail("'{}' is read by a function before it is bound", name)
+        return result
+
+    def infer(self, node, used=True):
+        """
+            the type of node's value; when the value is not used,
+            conditionals are not required to give one
+        """
+        self.used = used
+        return node.access(self)
+
+    def function(self, function):
+        cached = self.functions.get(id(function))
+        if cached is not None and cached[0] is function:
+            return cached[1]
+        params = [self.name(arg) for arg in function.args]
+        t = FunctionType(params, Var())
+        self.functions[id(function)] = (function, t)
+        outer = self.bound, self.depth
+        self.bound, self.depth = set(function.args), self.depth + 1
+        try:
+            self.expect(self.infer(function.body), t.result, "result of a function")
+        finally:
+            self.bound, self.depth = outer
+        return t
+
+    def visit_number(self, num):
+        return NUMBER
+
+    def visit_reference(self, ref):
+        name = ref.name
+        if name not in self.bound:
+            if self.depth:
+                self.free.add(name)
+            elif not self.input(name):
+                self.fail("'{}' may be read before it is bound", name)
+        return self.name(name)
+
+    def visit_read(self, rd):
+        self.bound.add(rd.name)
+        self.expect(self.name(rd.name), NUMBER, "'{}'".format(rd.name))
+        return NUMBER
+
+    def visit_print(self, prnt):
+        self.expect(self.infer(prnt.expr), NUMBER, "printed value")
+        return NUMBER
+
+    def visit_unary(self, un_op):
+        self.expect(self.infer(un_op.expr), NUMBER, "operand of '{}'".format(un_op.op))
+        return NUMBER
+
+    def visit_binary(self, bin_op):
+        what = "operand of '{}'".format(bin_op.op)
+        self.expect(self.infer(bin_op.lhs), NUMBER, what)
+        self.expect(self.infer(bin_op.rhs), NUMBER, what)
+        return NUMBER
+
+    def visit_exprlist(self, expr_list):
+        used = self.used
+        exprs = expr_list.exprs or []
+        result = NOTHING
+        for i, expr in enumerate(exprs):
+            result = self.infer(expr, used and i == len(exprs) - 1)
+        return result
+
+    def visit_conditional(self, cond):
+        used = self.used
+        self.expect(self.infer(cond.condition), NUMBER, "condition")
+        before = self.bound
+        self.bound = set(before)
+        if_true = self.infer(cond.if_true, used)
+        after_true, self.bound = self.bound, set(before)
+        if_false = self.infer(cond.if_false, used)
+        self.bound &= after_true
+        if used:
+            self.expect(if_false, if_true, "one branch of a conditional")
+        return if_true
+
+    def visit_function(self, function):
+        self.fail("{} is evaluated outside a definition", describe(FunctionType(function.args, None)))
+
+    def visit_definition(self, f_def):
+        t = self.function(f_def.function)
+        self.bound.add(f_def.name)
+        self.expect(self.name(f_def.name), t, "'{}'".format(f_def.name))
+        return t
+
+    def visit_call(self, call):
+        if not self.depth:
+            self.calls += 1
+        fun = prune(self.infer(call.fun_expr))
+        callee = "'{}'".format(call.fun_expr.name) if isinstance(call.fun_expr, Reference) \
+            else "called value"
+        if isinstance(fun, FunctionType) and len(fun.params) != len(call.args):
+            self.fail("{} takes {}, called with {}", callee,
+                      describe(fun)[len("a function of "):], len(call.args))
+        # the compiled call evaluates them in the caller's frame, not in
+        # the callee's as evaluate() does, whether the names are new or not
+        if binds_names(call.args):
+            self.fail("arguments of a call of {} bind names", callee)
+        args = [self.infer(arg) for arg in call.args]
+        if isinstance(fun, FunctionType):
+            for i, (arg, param) in enumerate(zip(args, fun.params), 1):
+                self.expect(arg, param, "argument {} of {}".format(i, callee))
+            return fun.result
+        result = Var()
+        self.expect(fun, FunctionType(args, result), callee)
+        return result
+
+
+class Verified:
+    """
+        a program that passed the checker: its tree, the type of its
+        value and the values it takes from the scope it was checked with
+    """
+    def __init__(self, program, result, inputs, names):
+        self.program = program
+        self.result = result
+        self.inputs = inputs
+        self.names = names
+
+    def compile(self):
+        return UnboxedCompiler(self).compile()
+
+
+def check(program, scope=None):
+    """
+        checks program against the names of scope, returns it Verified;
+        raises TypeError telling the first problem found
+    """
+    checker = Checker(scope)
+    result = checker.check(program)
+    return Verified(program, prune(result), checker.inputs, list(checker.names))
+
+
+UNBOXED_BINARY = {'+': lambda lhs, rhs: lambda: lhs() + rhs(),
+                  '-': lambda lhs, rhs: lambda: lhs() - rhs(),
+                  '*': lambda lhs, rhs: lambda: lhs() * rhs(),
+                  '/': lambda lhs, rhs: lambda: lhs() // rhs(),
+                  '%': lambda lhs, rhs: lambda: lhs() % rhs(),
+                  '==': lambda lhs, rhs: lambda: lhs() == rhs(),
+                  '!=': lambda lhs, rhs: lambda: lhs() != rhs(),
+                  '<': lambda lhs, rhs: lambda: lhs() < rhs(),
+                  '>': lambda lhs, rhs: lambda: lhs() > rhs(),
+                  '<=': lambda lhs, rhs: lambda: lhs() <= rhs(),
+                  '>=': lambda lhs, rhs: lambda: lhs() >= rhs(),
+                  '&&': lambda lhs, rhs: lambda: lhs() and rhs(),
+                  '||': lambda lhs, rhs: lambda: lhs() or rhs(),
+                  }
+
+EAGER_BINARY = {'&&': lambda lhs, rhs: lambda: (lambda x, y: x and y)(lhs(), rhs()),
+                '||': lambda lhs, rhs: lambda: (lambda x, y: x or y)(lhs(), rhs()),
+                }
+
+
+class UnboxedCompiler:
+    """
+        compiles a Verified program into closures that need no checks:
+        numbers are plain ints (or bools, which act as ints), functions
+        are Python functions, and every name has one slot in a list.
+        Dynamic scoping is kept by shallow binding: a call saves the
+        slots of the names its function binds, and puts them back when
+        it returns. Calls recurse in Python.
+    """
+    def __init__(self, verified):
+        self.verified = verified
+        self.slots = {name: slot for slot, name in enumerate(verified.names)}
+        self.values = [None] * len(self.slots)
+        self.binary = dict(UNBOXED_BINARY)
+        if not short_circuit():
+            self.binary.update(EAGER_BINARY)
+        self.functions = dict()
+
+    def compile(self):
+        """
+            a function of a scope running the program in it like
+            evaluate(): inputs are read from the scope, top-level
+            bindings are written back
+        """
+        verified = self.verified
+        values = self.values
+        slots = self.slots
+        program = verified.program.access(self)
+        inputs = [(slots[name], name, value) for name, value in verified.inputs.items()]
+        compiled = {name: self.function(value) for name, value in verified.inputs.items()
+                    if isinstance(value, Function)}
+        outputs = Outputs().visit(verified.program)
+
+        def run(scope):
+            values[:] = [None] * len(values)
+            for slot, name, expected in inputs:
+                value = scope[name]
+                if isinstance(expected, Function):
+                    if value is not expected:
+                        raise TypeError("'{}' changed since it was checked".format(name))
+                    values[slot] = compiled[name]
+                elif isinstance(value, Number):
+                    values[slot] = value.value
+                else:
+                    raise TypeError("'{}' is not a number any more".format(name))
+            result = program()
+            for name in outputs:
+                value = values[slots[name]]
+                if value is not None:
+                    scope[name] = boxed(value)
+            return boxed(result)
+        return run
+
+    def function(self, function):
+        """
+            the Python function for a yat one, made once
+        """
+        cached = self.functions.get(id(function))
+        if cached is not None and cached[0] is function:
+            return cached[1]
+        values = self.values
+        params = [self.slots[arg] for arg in function.args]
+        own = [self.slots[name] for name in Outputs(function.args).visit(function.body)]
+        body = None
+        # the usual functions, binding nothing but their arguments, get
+        # calls without argument lists
+        if own == params and len(params) == 1:
+            slot, = params
+
+            def call(arg):
+                saved = values[slot]
+                values[slot] = arg
+                result = body()
+                values[slot] = saved
+                return result
+        elif own == params and len(params) == 2:
+            first, second = params
+
+            def call(x, y):
+                saved_x, saved_y = values[first], values[second]
+                values[first], values[second] = x, y
+                result = body()
+                values[first], values[second] = saved_x, saved_y
+                return result
+        else:
+            def call(*args):
+                saved = [values[slot] for slot in own]
+                for slot, arg in zip(params, args):
+                    values[slot] = arg
+                result = body()
+                for slot, value in zip(own, saved):
+                    values[slot] = value
+                return result
+        call.function = function
+        self.functions[id(function)] = (function, call)
+        body = function.body.access(self)
+        return call
+
+    def visit_number(self, num):
+        value = num.value
+        return lambda: value
+
+    def visit_reference(self, ref):
+        values = self.values
+        slot = self.slots[ref.name]
+        return lambda: values[slot]
+
+    def visit_read(self, rd):
+        values = self.values
+        slot = self.slots[rd.name]
+
+        def run():
+            value = values[slot] = current_io().read()
+            return value
+        return run
+
+    def visit_print(self, prnt):
+        expr = prnt.expr.access(self)
+
+        def run():
+            value = expr()
+            current_io().write(int(value))
+            return value
+        return run
+
+    def visit_unary(self, un_op):
+        expr = un_op.expr.access(self)
+        if un_op.op == '-':
+            return lambda: -expr()
+        return lambda: not expr()
+
+    def visit_binary(self, bin_op):
+        return self.binary[bin_op.op](bin_op.lhs.access(self), bin_op.rhs.access(self))
+
+    def visit_exprlist(self, expr_list):
+        if not expr_list.exprs:
+            return lambda: None
+        exprs = [expr.access(self) for expr in expr_list.exprs]
+        if len(exprs) == 1:
+            return exprs[0]
+        last = exprs.pop()
+
+        def run():
+            for expr in exprs:
+                expr()
+            return last()
+        return run
+
+    def visit_conditional(self, cond):
+        condition = cond.condition.access(self)
+        if_true = cond.if_true.access(self)
+        if_false = cond.if_false.access(self)
+        return lambda: if_true() if condition() else if_false()
+
+    def visit_definition(self, f_def):
+        values = self.values
+        slot = self.slots[f_def.name]
+        call = self.function(f_def.function)
+
+        def run():
+            values[slot] = call
+            return call
+        return run
+
+    def visit_call(self, call):
+        fun_expr = call.fun_expr.access(self)
+        args = [arg.access(self) for arg in call.args]
+        if not args:
+            return lambda: fun_expr()()
+        if len(args) == 1:
+            arg, = args
+            return lambda: fun_expr()(arg())
+        if len(args) == 2:
+            first, second = args
+            return lambda: fun_expr()(first(), second())
+        return lambda: fun_expr()(*[arg() for arg in args])
+
+
+def boxed(value):
+    if value is None:
+        return None
+    if callable(value):
+        return value.function
+    return box(value)
+
+
+class Outputs:
+    """
+        the names a tree binds in the frame it runs in, outside of the
+        bodies of the functions it defines
+    """
+    def __init__(self, names=()):
+        self.names = dict.fromkeys(names)
+
+    def visit(self, obj):
+        obj.access(self)
+        return list(self.names)
+
+    def visit_number(self, num):
+        pass
+
+    visit_reference = visit_number
+    visit_function = visit_number
+
+    def visit_read(self, rd):
+        self.names.setdefault(rd.name)
+
+    def visit_definition(self, f_def):
+        self.names.setdefault(f_def.name)
+
+    def visit_print(self, prnt):
+        prnt.expr.access(self)
+
+    def visit_unary(self, un_op):
+        un_op.expr.access(self)
+
+    def visit_binary(self, bin_op):
+        bin_op.lhs.access(self)
+        bin_op.rhs.access(self)
+
+    def visit_exprlist(self, expr_list):
+        for expr in expr_list.exprs or []:
+            expr.access(self)
+
+    def visit_conditional(self, cond):
+        cond.condition.access(self)
+        cond.if_true.access(self)
+        cond.if_false.access(self)
+
+    def visit_call(self, call):
+        call.fun_expr.access(self)
+        for arg in call.args:
+            arg.access(self)
@@ -0,0 +1,339 @@
+from array import array
+
+from yat.model import *
+from yat.model import _UNBOUND
+from yat.compiler import BINARY_OPS, EAGER_LOGIC, UNARY_OPS
+from yat.resolver import resolve, own_names, binds_names, lookup, tail_parent
+
+
+OPNAMES = ['CONST', 'NONE', 'LOAD_SLOT', 'LOAD_NAME', 'STORE_SLOT',
+           'STORE_NAME', 'POP', 'BINARY', 'UNARY', 'JUMP', 'JUMP_IF_FALSE',
+           'PRINT', 'READ', 'CALL', 'TAIL_CALL', 'FRAME', 'CALL_IN', 'RETURN',
+           'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP', 'LOGICAL']
+CONST, NONE, LOAD_SLOT, LOAD_NAME, STORE_SLOT, STORE_NAME, POP, BINARY, \
+    UNARY, JUMP, JUMP_IF_FALSE, PRINT, READ, CALL, TAIL_CALL, FRAME, \
+    CALL_IN, RETURN, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP, \
+    LOGICAL = range(len(OPNAMES))
+
+BINARY_NAMES = list(BINARY_OPS)
+UNARY_NAMES = list(UNARY_OPS)
+
+
+class Code:
+    """
+        compiled body: instructions are (opcode, argument) pairs of ints
+        in one array, arguments index consts, names or the operator lists
+    """
+    def __init__(self, ops, consts, names, slots=None, function=None):
+        self.ops = ops
+        self.consts = consts
+        self.names = names
+        self.slots = slots
+        self.slot_names = list(slots) if slots is not None else []
+        if function is not None:
+            self.arg_slots = [slots[arg] for arg in function.args]
+            self.arg_names = frozenset(function.args)
+            self.own = [(slots[name], name) for name in own_names(function)]
+
+
+class CodeGenerator:
+    """
+        emits the instructions of a tree; function bodies get a slot
+        layout from the resolver, everything else is looked up by name
+    """
+    def __init__(self, slots=None):
+        self.ops = []
+        self.consts = []
+        self.names = []
+        self.slots = slots
+
+    def emit(self, op, arg=0):
+        self.ops += [op, arg]
+        return len(self.ops) - 1
+
+    def const(self, obj):
+        for i, known in enumerate(self.consts):
+            if known is obj:
+                return i
+        self.consts.append(obj)
+        return len(self.consts) - 1
+
+    def name(self, name):
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def code(self, node, function=None):
+        node.access(self)
+        self.emit(RETURN)
+        ops = self.ops
+        if function is not None:
+            self.tail_calls(ops)
+        return Code(array('i', ops), self.consts, self.names,
+                    self.slots, function)
+
+    @staticmethod
+    def tail_calls(ops):
+        """
+            a CALL followed by RETURN, directly or through jumps,
+            becomes a TAIL_CALL
+        """
+        for pc in range(0, len(ops), 2):
+            if ops[pc] != CALL:
+                continue
+            target = pc + 2
+            while ops[target] == JUMP:
+                target = ops[target + 1]
+            if ops[target] == RETURN:
+                ops[pc] = TAIL_CALL
+
+    def visit_number(self, num):
+        self.emit(CONST, self.const(num))
+
+    def visit_reference(self, ref):
+        depth, slot = lookup(self.slots, ref.name)
+        if depth is None:
+            self.emit(LOAD_NAME, self.name(ref.name))
+        else:
+            self.emit(LOAD_SLOT, slot)
+
+    def store(self, name):
+        depth, slot = lookup(self.slots, name)
+        if depth is None:
+            self.emit(STORE_NAME, self.name(name))
+        else:
+            self.emit(STORE_SLOT, slot)
+
+    def visit_function(self, function):
+        # evaluating a Function node runs its body in the current scope
+        function.body.access(self)
+
+    def visit_exprlist(self, expr_list):
+        if not expr_list.exprs:
+            self.emit(NONE)
+            return
+        for expr in expr_list.exprs[:-1]:
+            expr.access(self)
+            self.emit(POP)
+        expr_list.exprs[-1].access(self)
+
+    def visit_definition(self, f_def):
+        self.emit(CONST, self.const(f_def.function))
+        self.store(f_def.name)
+
+    def visit_read(self, rd):
+        self.emit(READ)
+        self.store(rd.name)
+
+    def visit_print(self, prnt):
+        prnt.expr.access(self)
+        self.emit(PRINT)
+
+    def visit_conditional(self, cond):
+        cond.condition.access(self)
+        to_else = self.emit(JUMP_IF_FALSE)
+        cond.if_true.access(self)
+        to_end = self.emit(JUMP)
+        self.ops[to_else] = len(self.ops)
+        cond.if_false.access(self)
+        self.ops[to_end] = len(self.ops)
+
+    def visit_binary(self, bin_op):
+        bin_op.lhs.access(self)
+        if bin_op.op in ('&&', '||') and short_circuit():
+            # the left operand is the result when it decides it,
+            # otherwise it is dropped for the right one
+            skip = self.emit(JUMP_IF_FALSE_OR_POP if bin_op.op == '&&' else JUMP_IF_TRUE_OR_POP)
+            bin_op.rhs.access(self)
+            self.ops[skip] = len(self.ops)
+            return
+        bin_op.rhs.access(self)
+        if bin_op.op in EAGER_LOGIC:
+            # both operands ran, the right one's value may not be read
+            self.emit(LOGICAL, BINARY_NAMES.index(bin_op.op))
+        else:
+            self.emit(BINARY, BINARY_NAMES.index(bin_op.op))
+
+    def visit_unary(self, un_op):
+        un_op.expr.access(self)
+        self.emit(UNARY, UNARY_NAMES.index(un_op.op))
+
+    def visit_call(self, call):
+        call.fun_expr.access(self)
+        if binds_names(call.args):
+            # a Read among the arguments binds into the callee frame,
+            # so they run in it and look names up dynamically
+            self.emit(FRAME)
+            outer, self.slots = self.slots, None
+            for arg in call.args:
+                arg.access(self)
+            self.slots = outer
+            self.emit(CALL_IN, len(call.args))
+        else:
+            for arg in call.args:
+                arg.access(self)
+            self.emit(CALL, len(call.args))
+
+
+class VM:
+    """
+        runs Code with one dispatch per instruction; yat calls push a
+        record on a list instead of recursing, tail calls replace the
+        current one
+    """
+    def __init__(self):
+        self.functions = dict()
+
+    def function_code(self, function):
+        cached = self.functions.get(id(function))
+        if cached is None or cached[0] is not function:
+            slots = resolve(function)
+            cached = (function,
+                      CodeGenerator(slots).code(function.body, function))
+            self.functions[id(function)] = cached
+        return cached[1]
+
+    def evaluate(self, node, scope):
+        return self.execute(CodeGenerator().code(node), scope)
+
+    def execute(self, code, scope):
+        binary = [BINARY_OPS[name] for name in BINARY_NAMES]
+        logical = [EAGER_LOGIC.get(name) for name in BINARY_NAMES]
+        unary = [UNARY_OPS[name] for name in UNARY_NAMES]
+        function_code = self.function_code
+        fuel = current_fuel()
+        stream = current_io()
+        stack = []
+        calls = []
+        pending = []
+        ops, consts, names = code.ops, code.consts, code.names
+        pc = 0
+        while True:
+            op = ops[pc]
+            arg = ops[pc + 1]
+            pc += 2
+            if op == LOAD_SLOT:
+                value = scope.values[arg]
+                if value is _UNBOUND:
+                    value = scope.values[arg] = scope.parent[code.slot_names[arg]]
+                stack.append(value)
+            elif op == CONST:
+                stack.append(consts[arg])
+            elif op == BINARY:
+                rhs = stack.pop()
+                stack[-1] = box(binary[arg](stack[-1].value, rhs.value))
+            elif op == JUMP_IF_FALSE:
+                if not stack.pop().value:
+                    pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == JUMP_IF_FALSE_OR_POP:
+                if stack[-1].value:
+                    stack.pop()
+                else:
+                    pc = arg
+            elif op == JUMP_IF_TRUE_OR_POP:
+                if stack[-1].value:
+                    pc = arg
+                else:
+                    stack.pop()
+            elif op == LOGICAL:
+                rhs = stack.pop()
+                stack[-1] = box(logical[arg](stack[-1].value, rhs))
+            elif op == CALL or op == TAIL_CALL:
+                if fuel is not None:
+                    fuel.left -= 1
+                    if fuel.left < 0:
+                        fuel.refill()
+                func = stack[-arg - 1]
+                callee = function_code(func)
+                if op == TAIL_CALL and arg >= len(callee.arg_slots):
+                    frame = Frame(tail_parent(scope, code.own, callee.arg_names),
+                                  callee.slots)
+                else:
+                    frame = Frame(scope, callee.slots)
+                values = frame.values
+                if arg:
+                    for slot, val in zip(callee.arg_slots, stack[-arg:]):
+                        values[slot] = val
+                    del stack[-arg:]
+                stack.pop()
+                if op == CALL:
+                    calls.append((code, pc, scope))
+                code, scope, pc = callee, frame, 0
+                ops, consts, names = code.ops, code.consts, code.names
+            elif op == RETURN:
+                if not calls:
+                    return stack.pop()
+                code, pc, scope = calls.pop()
+                ops, consts, names = code.ops, code.consts, code.names
+            elif op == LOAD_NAME:
+                stack.append(scope[names[arg]])
+            elif op == POP:
+                stack.pop()
+            elif op == UNARY:
+                stack[-1] = box(unary[arg](stack[-1].value))
+            elif op == NONE:
+                stack.append(None)
+            elif op == STORE_SLOT:
+                scope.values[arg] = stack[-1]
+            elif op == STORE_NAME:
+                scope[names[arg]] = stack[-1]
+            elif op == PRINT:
+                stream.write(stack[-1].value)
+            elif op == READ:
+                stack.append(box(stream.read()))
+            elif op == FRAME:
+                pending.append(scope)
+                scope = Frame(scope, function_code(stack[-1]).slots)
+            elif op == CALL_IN:
+                if fuel is not None:
+                    fuel.left -= 1
+                    if fuel.left < 0:
+                        fuel.refill()
+                frame, scope = scope, pending.pop()
+                func = stack[-arg - 1]
+                callee = function_code(func)
+                values = frame.values
+                if arg:
+                    for slot, val in zip(callee.arg_slots, stack[-arg:]):
+                        values[slot] = val
+                    del stack[-arg:]
+                stack.pop()
+                calls.append((code, pc, scope))
+                code, scope, pc = callee, frame, 0
+                ops, consts, names = code.ops, code.consts, code.names
+            else:
+                raise ValueError("bad opcode {} at {}".format(op, pc - 2))
+
+
+def disassemble(code):
+    """
+        returns the instructions of code as lines of text
+    """
+    lines = []
+    ops = code.ops
+    for pc in range(0, len(ops), 2):
+        op, arg = ops[pc], ops[pc + 1]
+        name = OPNAMES[op]
+        if op == CONST:
+            obj = code.consts[arg]
+            note = str(obj.value) if isinstance(obj, Number) else \
+                "function({})".format(", ".join(obj.args))
+        elif op in (LOAD_NAME, STORE_NAME):
+            note = code.names[arg]
+        elif op in (LOAD_SLOT, STORE_SLOT):
+            note = code.slot_names[arg]
+        elif op == BINARY or op == LOGICAL:
+            note = BINARY_NAMES[arg]
+        elif op == UNARY:
+            note = UNARY_NAMES[arg]
+        elif op in (JUMP, JUMP_IF_FALSE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP):
+            note = "to {}".format(arg)
+        else:
+            note = ""
+        if op in (NONE, POP, PRINT, READ, FRAME, RETURN):
+            lines.append("{:>5} {}".format(pc, name))
+        else:
+            lines.append("{:>5} {:<14}{:>4} {}".format(pc, name, arg, note).rstrip())
+    return lines